@@ -0,0 +1,69 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Time a 3D gamma calculation across an increasing number of workers.
+
+Wall clock timings depend on the machine and on its load, so this is run by
+hand rather than as a part of the test suite:
+
+    python examples/drafts/gamma_parallel_scaling.py
+"""
+
+import os
+import time
+
+import numpy as np
+
+import pymedphys
+
+NUM_POINTS = 41
+
+
+def get_synthetic_dose_cube(num_points):
+    grid = np.linspace(-40, 40, num_points)
+    coords = (grid, grid, grid)
+
+    mesh_z, mesh_y, mesh_x = np.meshgrid(*coords, indexing="ij")
+    reference = 100 * np.exp(-(mesh_z ** 2 + mesh_y ** 2 + mesh_x ** 2) / 400)
+    evaluation = 102 * np.exp(
+        -((mesh_z - 1) ** 2 + (mesh_y + 0.5) ** 2 + mesh_x ** 2) / 420
+    )
+
+    return coords, reference, evaluation
+
+
+def main():
+    coords, reference, evaluation = get_synthetic_dose_cube(NUM_POINTS)
+
+    cpu_count = os.cpu_count() or 1
+    workers_to_time = sorted({1, min(2, cpu_count), min(4, cpu_count), cpu_count})
+
+    timings = {}
+    for workers in workers_to_time:
+        start = time.perf_counter()
+        pymedphys.gamma(
+            coords, reference, coords, evaluation, 3, 3, quiet=True, workers=workers
+        )
+        timings[workers] = time.perf_counter() - start
+
+        print(
+            "{} worker(s): {:.1f} s, a speed up of {:.2f}".format(
+                workers, timings[workers], timings[1] / timings[workers]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,15 +14,13 @@
 
 
 import functools
+import hashlib
 from collections import namedtuple
 from typing import Dict, List, Tuple, Type, TypeVar, Union
 
 from pymedphys._imports import numpy as np
 
-from pymedphys._utilities.controlpoints import (
-    remove_irrelevant_control_points,
-    to_tuple,
-)
+from pymedphys._utilities.controlpoints import remove_irrelevant_control_points
 
 # https://stackoverflow.com/a/44644576/3912576
 # Create a generic variable that can be 'Parent', or any subclass.
@@ -35,6 +33,14 @@ DeliveryNamedTuple = namedtuple(
 
 
 class DeliveryBase(DeliveryNamedTuple):
+    """The delivery parameters of a treatment, one entry per control point.
+
+    Each field is stored as a read-only ``float`` numpy array. So that the
+    delivery can be used as a key within ``functools.lru_cache``, instances
+    compare equal by the contents of their arrays and are hashed by a
+    digest of those contents, which is calculated once on first use.
+    """
+
     @property
     def mu(self):
         return self.monitor_units
@@ -71,10 +77,58 @@ class DeliveryBase(DeliveryNamedTuple):
         return merged
 
     def __new__(cls, *args, **kwargs):
-        new_args = (to_tuple(arg) for arg in args)
-        new_kwargs = {key: to_tuple(item) for key, item in kwargs.items()}
+        new_args = (_to_read_only_array(arg) for arg in args)
+        new_kwargs = {key: _to_read_only_array(item) for key, item in kwargs.items()}
         return super().__new__(cls, *new_args, **new_kwargs)
 
+    @classmethod
+    def _make(cls, iterable):
+        # The namedtuple implementations of both ``_make`` and ``_replace``
+        # would otherwise skip the conversion within ``__new__``.
+        return cls(*iterable)
+
+    def __eq__(self, other):
+        if not isinstance(other, tuple):
+            return NotImplemented
+
+        if len(self) != len(other):
+            return False
+
+        return all(
+            np.array_equal(item, other_item) for item, other_item in zip(self, other)
+        )
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+
+        return not equal
+
+    def __hash__(self):
+        return int.from_bytes(
+            bytes.fromhex(self._content_digest())[0:8], byteorder="little", signed=True
+        )
+
+    def _content_digest(self):
+        """A hex digest of the delivery's contents, calculated once on first
+        use. Equal deliveries have equal digests."""
+        try:
+            return self.__dict__["_digest"]
+        except KeyError:
+            pass
+
+        content_hash = hashlib.sha1()
+        for item in self:
+            content_hash.update(str(item.shape).encode())
+
+            # Adding zero turns any -0.0 into 0.0, as these compare equal.
+            content_hash.update(np.ascontiguousarray(item + 0.0).data)
+
+        self.__dict__["_digest"] = content_hash.hexdigest()
+
+        return self.__dict__["_digest"]
+
     @classmethod
     def _empty(cls: Type[DeliveryGeneric]) -> DeliveryGeneric:
         return cls(
@@ -215,3 +269,10 @@ class DeliveryBase(DeliveryNamedTuple):
             new_delivery_data.append(np.array(item)[::skip_size])
 
         return cls(*new_delivery_data)
+
+
+def _to_read_only_array(item):
+    array = np.array(item, dtype=float)
+    array.flags.writeable = False
+
+    return array
@@ -15,10 +15,11 @@
 
 import functools
 import json
+import multiprocessing
 import os.path
 import pprint
+import sys
 from copy import deepcopy
-from glob import glob
 from os.path import abspath, basename, dirname, isdir, isfile
 from os.path import join as pjoin
 
@@ -33,6 +34,7 @@ from pymedphys._dicom.constants import (
     get_baseline_keyword_vr_dict,
 )
 from pymedphys._dicom.utilities import remove_file
+from pymedphys._utilities.manifest import ManifestWriter, read_manifest
 
 HERE = dirname(abspath(__file__))
 
@@ -287,7 +289,11 @@ def anonymise_file(
 
     ds.save_as(dicom_anon_filepath)
 
-    if delete_original_file:
+    # Anonymising a file which is already named as anonymised overwrites
+    # it in place, in which case there is no original left to delete.
+    if delete_original_file and not _is_same_filepath(
+        dicom_filepath, dicom_anon_filepath
+    ):
         remove_file(dicom_filepath)
 
     return dicom_anon_filepath
@@ -302,10 +308,17 @@ def anonymise_directory(
     keywords_to_leave_unchanged=(),
     delete_private_tags=True,
     delete_unknown_tags=None,
+    workers=None,
+    manifest_filepath=None,
 ):
     r"""A simple tool to anonymise all DICOM files in a directory and
     its subdirectories.
 
+    DICOM files are anonymised as the directory is scanned. A file which
+    fails to be anonymised does not interrupt the anonymisation of the
+    others, instead each failure is reported once all files have been
+    attempted.
+
     Parameters
     ----------
     dicom_dirpath : ``str`` or ``pathlib.Path``
@@ -356,38 +369,169 @@ def anonymise_directory(
         set to ``False``, these tags are simply ignored. Pass ``False``
         with caution, since unrecognised tags may contain identifying
         information.
+
+    workers : ``int``, optional
+        The number of processes to anonymise the DICOM files across. By
+        default the files are anonymised within this process.
+
+    manifest_filepath : ``str`` or ``pathlib.Path``, optional
+        A file to which the outcome of anonymising each DICOM file is
+        appended, one JSON line per file, as soon as that file is
+        finished. Files recorded as anonymised within an existing manifest
+        are skipped, so that an interrupted anonymisation can be resumed
+        by running it again with the same manifest.
+
+    Returns
+    -------
+    failures : ``dict``
+        The error message of each DICOM file which failed to be
+        anonymised, keyed by its path.
     """
     dicom_dirpath = str(dicom_dirpath)
+    if output_dirpath is not None:
+        output_dirpath = str(output_dirpath)
+
+    # Both the inputs and the outputs of files recorded as anonymised are
+    # skipped, as an in place anonymisation writes its outputs alongside
+    # the inputs where they are found again on resuming.
+    already_anonymised = set()
+    already_written = set()
+    if manifest_filepath is not None:
+        for record in read_manifest(manifest_filepath):
+            if record["output"] is not None:
+                already_anonymised.add(record["input"])
+                already_written.add(_normalise_filepath(record["output"]))
+
+    dicom_filepaths = (
+        dicom_filepath
+        for dicom_filepath in _iter_dicom_filepaths(
+            dicom_dirpath, exclude_dirpath=output_dirpath
+        )
+        if os.path.relpath(dicom_filepath, start=dicom_dirpath)
+        not in already_anonymised
+        and _normalise_filepath(dicom_filepath) not in already_written
+    )
 
-    dicom_filepaths = glob(dicom_dirpath + "/**/*.dcm", recursive=True)
-    failing_filepaths = []
-    # errors = []
+    anonymise_file_in_directory = functools.partial(
+        _anonymise_file_in_directory,
+        dicom_dirpath=dicom_dirpath,
+        output_dirpath=output_dirpath,
+        delete_original_file=delete_original_files,
+        anonymise_filename=anonymise_filenames,
+        replace_values=replace_values,
+        keywords_to_leave_unchanged=keywords_to_leave_unchanged,
+        delete_private_tags=delete_private_tags,
+        delete_unknown_tags=delete_unknown_tags,
+    )
 
-    for dicom_filepath in dicom_filepaths:
-        if output_dirpath is not None:
-            relative_path = os.path.relpath(dicom_filepath, start=dicom_dirpath)
-            output_filepath = os.path.join(output_dirpath, relative_path)
-        else:
-            output_filepath = None
+    if workers is None or workers <= 1:
+        records = map(anonymise_file_in_directory, dicom_filepaths)
+        failures = _record_anonymisations(records, manifest_filepath)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            records = pool.imap_unordered(
+                anonymise_file_in_directory, dicom_filepaths, chunksize=16
+            )
+            failures = _record_anonymisations(records, manifest_filepath)
 
-        anonymise_file(
-            dicom_filepath,
-            output_filepath=output_filepath,
-            delete_original_file=delete_original_files,
-            anonymise_filename=anonymise_filenames,
-            replace_values=replace_values,
-            keywords_to_leave_unchanged=keywords_to_leave_unchanged,
-            delete_private_tags=delete_private_tags,
-            delete_unknown_tags=delete_unknown_tags,
+    if failures:
+        print("\n{} DICOM file(s) could not be anonymised:".format(len(failures)))
+        for dicom_filepath, error in failures.items():
+            print("{}: {}".format(dicom_filepath, error))
+
+    return failures
+
+
+def _normalise_filepath(filepath):
+    return os.path.normcase(os.path.abspath(filepath))
+
+
+def _is_same_filepath(filepath, other_filepath):
+    return _normalise_filepath(filepath) == _normalise_filepath(other_filepath)
+
+
+def _iter_dicom_filepaths(dirpath, exclude_dirpath=None):
+    """Yield the paths of the ``.dcm`` files within a directory and its
+    subdirectories, listing one directory at a time.
+
+    Each directory is listed in full before any of its files are yielded
+    so that anonymised files written alongside the originals are not
+    themselves found. The same hidden files and directories as
+    ``glob(dirpath + "/**/*.dcm", recursive=True)`` are skipped.
+    """
+    if exclude_dirpath is not None:
+        exclude_dirpath = os.path.normcase(os.path.abspath(exclude_dirpath))
+
+    dirpaths = [dirpath]
+    while dirpaths:
+        current_dirpath = dirpaths.pop()
+
+        with os.scandir(current_dirpath) as dir_entries:
+            dir_entries = sorted(dir_entries, key=lambda dir_entry: dir_entry.name)
+
+        subdirpaths = []
+        for dir_entry in dir_entries:
+            if dir_entry.name.startswith("."):
+                continue
+
+            if dir_entry.is_dir():
+                if (
+                    exclude_dirpath is None
+                    or os.path.normcase(os.path.abspath(dir_entry.path))
+                    != exclude_dirpath
+                ):
+                    subdirpaths.append(dir_entry.path)
+            elif dir_entry.name.endswith(".dcm") and dir_entry.is_file():
+                yield dir_entry.path
+
+        dirpaths += reversed(subdirpaths)
+
+
+def _anonymise_file_in_directory(
+    dicom_filepath, dicom_dirpath, output_dirpath, **anonymise_file_kwargs
+):
+    relative_path = os.path.relpath(dicom_filepath, start=dicom_dirpath)
+
+    if output_dirpath is not None:
+        output_filepath = os.path.join(output_dirpath, relative_path)
+    else:
+        output_filepath = None
+
+    try:
+        dicom_anon_filepath = anonymise_file(
+            dicom_filepath, output_filepath=output_filepath, **anonymise_file_kwargs
         )
+    except Exception as e:  # pylint: disable = broad-except
+        return {
+            "input": relative_path,
+            "output": None,
+            "error": "{}: {}".format(type(e).__name__, e),
+        }
+
+    return {"input": relative_path, "output": dicom_anon_filepath, "error": None}
+
 
-    # Separate loop provides the ability to raise Exceptions from the
-    # unsuccessful deletion of the original DICOM files while preventing
-    # these Exceptions from interrupting the batch anonymisation.
-    if delete_original_files:
-        for dicom_filepath in dicom_filepaths:
-            if not dicom_filepath in failing_filepaths:
-                remove_file(dicom_filepath)
+def _record_anonymisations(records, manifest_filepath):
+    """Append each record to the manifest as it arrives, returning the
+    failed anonymisations."""
+    failures = {}
+
+    manifest = None
+    if manifest_filepath is not None:
+        manifest = ManifestWriter(manifest_filepath)
+
+    try:
+        for record in records:
+            if manifest is not None:
+                manifest.write(record)
+
+            if record["error"] is not None:
+                failures[record["input"]] = record["error"]
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+    return failures
 
 
 def anonymise_cli(args):
@@ -416,7 +560,7 @@ def anonymise_cli(args):
         )
 
     elif isdir(args.input_path):
-        anonymise_directory(
+        failures = anonymise_directory(
             dicom_dirpath=args.input_path,
             output_dirpath=args.output_path,
             delete_original_files=args.delete_original_files,
@@ -425,8 +569,13 @@ def anonymise_cli(args):
             keywords_to_leave_unchanged=keywords_to_leave_unchanged,
             delete_private_tags=not args.keep_private_tags,
             delete_unknown_tags=handle_unknown_tags,
+            workers=args.workers,
+            manifest_filepath=args.manifest_path,
         )
 
+        if failures:
+            sys.exit(1)
+
     else:
         raise FileNotFoundError(
             "No file or directory was found at the supplied input path."
@@ -536,9 +685,8 @@ def is_anonymised_directory(dirpath, ignore_private_tags=False):
         been anonymised, ``False`` otherwise.
     """
     is_anonymised = True
-    dicom_filepaths = glob(str(dirpath) + "/**/*.dcm", recursive=True)
 
-    for dicom_filepath in dicom_filepaths:
+    for dicom_filepath in _iter_dicom_filepaths(str(dirpath)):
         if not is_anonymised_file(
             dicom_filepath, ignore_private_tags=ignore_private_tags
         ):
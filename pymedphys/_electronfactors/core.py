@@ -16,9 +16,29 @@
 """Model insert factors and parameterise inserts as equivalent ellipses."""
 
 
+import functools
+import itertools
+import multiprocessing
+
+from pymedphys._imports import matplotlib
 from pymedphys._imports import numpy as np
 from pymedphys._imports import scipy, shapely
 
+# The shift applied to the spline at each test point by the deformability
+# test.
+DEFORMABILITY_DEVIATION = 0.02
+
+# The number of coefficients of a spline of order two in x and one in y
+# without any interior knots, 1, x, x**2, y, x*y, and x**2*y.
+NUM_POLYNOMIAL_COEFFICIENTS = 6
+
+# The tolerance, in cm, of the radius of the largest circle bounded by an
+# insert.
+BOUNDED_CIRCLE_PRECISION = 0.0005
+
+# The number of points measured against the insert boundary at a time.
+SIGNED_DISTANCE_CHUNK_SIZE = 4096
+
 
 def spline_model(
     width_test, ratio_perim_area_test, width_data, ratio_perim_area_data, factor_data
@@ -101,7 +121,7 @@ def _single_calculate_deformability(x_test, y_test, x_data, y_data, z_data):
         question.
 
     """
-    deviation = 0.02
+    deviation = DEFORMABILITY_DEVIATION
 
     adjusted_x_data = np.append(x_data, x_test)
     adjusted_y_data = np.append(y_data, y_test)
@@ -137,18 +157,21 @@ def _single_calculate_deformability(x_test, y_test, x_data, y_data, z_data):
     return deformability
 
 
-def calculate_deformability(x_test, y_test, x_data, y_data, z_data):
+def calculate_deformability(x_test, y_test, x_data, y_data, z_data, workers=None):
     """Return the result of the deformability test.
 
-    This function takes an array of test points and loops over
-    ``_single_calculate_deformability``.
-
     The deformability test applies a shift to the spline to determine whether
     or not sufficient information for modelling is available. For further
     details on the deformability test see the *Methods: Defining valid
     prediction regions of the spline* section within
     <http://dx.doi.org/10.1016/j.ejmp.2015.11.002>.
 
+    Whenever the smoothing spline of the data is its least squares
+    polynomial, as it is for insert factors whose residuals are far smaller
+    than one, every test point is tested at once from a single factorisation
+    of the data. Should it not be, each point is tested by refitting the
+    spline with ``_single_calculate_deformability``.
+
     Parameters
     ----------
     x_test : np.ndarray
@@ -161,6 +184,10 @@ def calculate_deformability(x_test, y_test, x_data, y_data, z_data):
         The y coordinate of the model data to test
     z_data : np.ndarray
         The z coordinate of the model data to test
+    workers : int, optional
+        The number of processes to spread the test points across when each
+        point needs to be tested by refitting the spline. By default the
+        points are tested within this process.
 
     Returns
     -------
@@ -171,41 +198,128 @@ def calculate_deformability(x_test, y_test, x_data, y_data, z_data):
         question.
 
     """
-    dim = np.shape(x_test)
+    x_test = np.asarray(x_test, dtype=float)
+    y_test = np.asarray(y_test, dtype=float)
 
-    if np.size(dim) == 0:
-        deformability = _single_calculate_deformability(
-            x_test, y_test, x_data, y_data, z_data
-        )
+    deformability = _batched_calculate_deformability(
+        np.ravel(x_test), np.ravel(y_test), x_data, y_data, z_data
+    )
 
-    elif np.size(dim) == 1:
-        deformability = np.array(
-            [
-                _single_calculate_deformability(
-                    x_test[i], y_test[i], x_data, y_data, z_data
-                )
-                for i in range(dim[0])
-            ]
+    if deformability is None:
+        deformability = _looped_calculate_deformability(
+            np.ravel(x_test), np.ravel(y_test), x_data, y_data, z_data, workers
         )
 
-    else:
-        deformability = np.array(
-            [
-                [
-                    _single_calculate_deformability(
-                        x_test[i, j], y_test[i, j], x_data, y_data, z_data
-                    )
-                    for j in range(dim[1])
-                ]
-                for i in range(dim[0])
-            ]
+    if np.ndim(x_test) == 0:
+        return deformability[0]
+
+    return np.reshape(deformability, np.shape(x_test))
+
+
+def _polynomial_basis(x, y):
+    return np.stack([np.ones_like(x), x, x ** 2, y, x * y, x ** 2 * y], axis=-1)
+
+
+def _batched_calculate_deformability(x_test, y_test, x_data, y_data, z_data):
+    """The deformability of many test points from a single factorisation.
+
+    With the default smoothing factor a ``SmoothBivariateSpline`` is the
+    least squares polynomial of the data whenever the residual of that
+    polynomial is within the smoothing factor. Adding one more data point,
+    shifted by ``deviation`` from the model at the test point, then shifts
+    the model at the test point by ``h / (1 + h) * deviation``, where ``h``
+    is the leverage of the test point. So the deformability is
+    ``h / (1 + h)`` for both the positive and negative shifts.
+
+    Returns ``None`` should the spline of the data not be its least squares
+    polynomial.
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    z_data = np.asarray(z_data, dtype=float)
+
+    if len(z_data) <= NUM_POLYNOMIAL_COEFFICIENTS:
+        return None
+
+    # Scaled for the conditioning of the factorisation. The span of the
+    # polynomial basis is unchanged by scaling either coordinate.
+    x_offset, x_scale = _offset_and_scale(x_data)
+    y_offset, y_scale = _offset_and_scale(y_data)
+
+    design = _polynomial_basis(
+        (x_data - x_offset) / x_scale, (y_data - y_offset) / y_scale
+    )
+
+    q, r = np.linalg.qr(design)
+    diagonal = np.abs(np.diag(r))
+    if np.min(diagonal) <= np.max(diagonal) * 1e-10:
+        return None
+
+    residual = z_data - q @ (q.T @ z_data)
+    smoothing_factor = len(z_data)
+
+    # The shifted point also adds (deviation ** 2 / (1 + h)) to the
+    # residual, which is always within the one extra allowed by the
+    # smoothing factor of the larger data set.
+    if np.sum(residual ** 2) > smoothing_factor:
+        return None
+
+    test_basis = _polynomial_basis(
+        (x_test - x_offset) / x_scale, (y_test - y_offset) / y_scale
+    )
+    leverage = np.sum(
+        scipy.linalg.solve_triangular(r, test_basis.T, trans="T") ** 2, axis=0
+    )
+
+    return leverage / (1 + leverage)
+
+
+def _offset_and_scale(coords):
+    offset = np.mean(coords)
+    scale = np.ptp(coords)
+    if scale == 0:
+        scale = 1
+
+    return offset, scale
+
+
+def _looped_calculate_deformability(
+    x_test, y_test, x_data, y_data, z_data, workers=None
+):
+    single_calculate_deformability = functools.partial(
+        _single_calculate_deformability_star,
+        x_data=x_data,
+        y_data=y_data,
+        z_data=z_data,
+    )
+    test_points = list(zip(x_test, y_test))
+
+    if workers is None or workers <= 1:
+        return np.array(list(map(single_calculate_deformability, test_points)))
+
+    with multiprocessing.Pool(workers) as pool:
+        return np.array(
+            pool.map(
+                single_calculate_deformability,
+                test_points,
+                chunksize=max(1, len(test_points) // (workers * 4)),
+            )
         )
 
-    return deformability
+
+def _single_calculate_deformability_star(test_point, x_data, y_data, z_data):
+    x_test, y_test = test_point
+
+    return _single_calculate_deformability(x_test, y_test, x_data, y_data, z_data)
 
 
 def spline_model_with_deformability(
-    width_test, ratio_perim_area_test, width_data, ratio_perim_area_data, factor_data
+    width_test,
+    ratio_perim_area_test,
+    width_data,
+    ratio_perim_area_data,
+    factor_data,
+    workers=None,
 ):
     """Return the spline model for points with sufficient deformability.
 
@@ -231,6 +345,8 @@ def spline_model_with_deformability(
     factor_data : np.ndarray
         The insert factor data points for the
         relevant applicator, energy and ssd.
+    workers : int, optional
+        Passed to ``calculate_deformability``.
 
     Returns
     -------
@@ -246,6 +362,7 @@ def spline_model_with_deformability(
         width_data,
         ratio_perim_area_data,
         factor_data,
+        workers=workers,
     )
 
     model_factor = spline_model(
@@ -310,45 +427,151 @@ def shapely_insert(x, y):
     return shapely.geometry.Polygon(np.transpose((x, y)))
 
 
-def search_for_centre_of_largest_bounded_circle(x, y, callback=None):
-    """Find the centre of the largest bounded circle within the insert."""
-    insert = shapely_insert(x, y)
-    boundary = insert.boundary
-    centroid = insert.centroid
+def _signed_distance_to_insert_function(vertices):
+    """Create a function which returns the distance from each of a set of
+    points to the insert boundary, positive for points within the insert
+    and negative for those outside of it.
 
-    furthest_distance = np.hypot(
-        np.diff(insert.bounds[::2]), np.diff(insert.bounds[1::2])
-    )
+    The nearest vertex to each point bounds its distance to the boundary,
+    so only the edges whose midpoints are within that distance plus half
+    the longest edge's length need to be measured. The points are measured
+    in chunks so that memory use remains bounded however many points and
+    vertices there are.
+    """
+    start = vertices
+    edge = np.roll(vertices, -1, axis=0) - start
 
-    def minimising_function(optimiser_input):
-        x, y = optimiser_input
-        point = shapely.geometry.Point(x, y)
+    edge_length = np.hypot(edge[:, 0], edge[:, 1])
+    edge_length_squared = edge_length ** 2
+    edge_length_squared[edge_length_squared == 0] = 1
 
-        if insert.contains(point):
-            edge_distance = point.distance(boundary)
-        else:
-            edge_distance = -point.distance(boundary)
+    vertex_tree = scipy.spatial.cKDTree(vertices)
+    midpoint_tree = scipy.spatial.cKDTree(start + edge / 2)
+    max_half_edge_length = np.max(edge_length) / 2
 
-        return -edge_distance
+    insert_path = matplotlib.path.Path(vertices)
 
-    x0 = np.squeeze(centroid.coords)
-    niter = 200
-    T = furthest_distance / 3
-    stepsize = furthest_distance / 2
-    niter_success = 50
-    output = scipy.optimize.basinhopping(
-        minimising_function,
-        x0,
-        niter=niter,
-        T=T,
-        stepsize=stepsize,
-        niter_success=niter_success,
-        callback=callback,
-    )
+    def signed_distances(points):
+        distances = np.empty(len(points))
+        for chunk_start in range(0, len(points), SIGNED_DISTANCE_CHUNK_SIZE):
+            chunk = slice(chunk_start, chunk_start + SIGNED_DISTANCE_CHUNK_SIZE)
+            distances[chunk] = _distances_to_nearby_edges(points[chunk])
+
+        inside = insert_path.contains_points(points)
+
+        return np.where(inside, distances, -distances)
+
+    def _distances_to_nearby_edges(points):
+        distances, _ = vertex_tree.query(points)
+
+        nearby_edges = midpoint_tree.query_ball_point(
+            points, distances + max_half_edge_length
+        )
+        point_index = np.repeat(
+            np.arange(len(points)), [len(edges) for edges in nearby_edges]
+        )
+        edge_index = np.fromiter(
+            itertools.chain.from_iterable(nearby_edges),
+            dtype=int,
+            count=len(point_index),
+        )
+
+        to_point = points[point_index] - start[edge_index]
+        along_edge = np.clip(
+            np.sum(to_point * edge[edge_index], axis=-1)
+            / edge_length_squared[edge_index],
+            0,
+            1,
+        )
+        np.minimum.at(
+            distances,
+            point_index,
+            np.hypot(
+                to_point[:, 0] - along_edge * edge[edge_index, 0],
+                to_point[:, 1] - along_edge * edge[edge_index, 1],
+            ),
+        )
 
-    circle_centre = output.x
+        return distances
+
+    return signed_distances
+
+
+def search_for_centre_of_largest_bounded_circle(
+    x, y, callback=None, precision=BOUNDED_CIRCLE_PRECISION
+):
+    """Find the centre of the largest bounded circle within the insert.
+
+    The insert is covered by square cells which are repeatedly split into
+    quarters, discarding any cell which could not contain a centre more than
+    ``precision`` further from the insert boundary than the best centre found
+    so far. The radius of the returned circle is within ``precision`` of that
+    of the largest bounded circle.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The x coordinates of the insert outline
+    y : np.ndarray
+        The y coordinates of the insert outline
+    callback : callable, optional
+        Called as ``callback(circle_centre, -radius, True)`` whenever a
+        larger circle is found.
+    precision : float, optional
+        The tolerance of the circle radius, in the units of ``x`` and ``y``.
+
+    Returns
+    -------
+    circle_centre : np.ndarray
+        The x and y coordinates of the centre of the largest bounded circle.
+
+    """
+    vertices = np.transpose((np.asarray(x, dtype=float), np.asarray(y, dtype=float)))
+    if np.array_equal(vertices[0], vertices[-1]):
+        vertices = vertices[:-1]
 
-    return circle_centre
+    minimum = np.min(vertices, axis=0)
+    maximum = np.max(vertices, axis=0)
+
+    half_size = np.max(maximum - minimum) / 2
+    if half_size == 0:
+        return minimum
+
+    signed_distances_to_insert = _signed_distance_to_insert_function(vertices)
+
+    insert = shapely_insert(x, y)
+    best_centre = np.squeeze(insert.centroid.coords)
+    best_distance = signed_distances_to_insert(best_centre[None, :])[0]
+
+    # Every cell of a generation has the same half size. No point within a
+    # cell is further from the boundary than the cell's centre is plus the
+    # cell's half diagonal.
+    centres = np.array([(minimum + maximum) / 2])
+    while len(centres) > 0:
+        distances = signed_distances_to_insert(centres)
+
+        best_index = np.argmax(distances)
+        if distances[best_index] > best_distance:
+            best_distance = distances[best_index]
+            best_centre = centres[best_index]
+            if callback is not None:
+                callback(best_centre, -best_distance, True)
+
+        could_be_better = distances + half_size * np.sqrt(2) > best_distance + precision
+        centres = centres[could_be_better]
+
+        half_size = half_size / 2
+        offsets = np.array(
+            [
+                [-half_size, -half_size],
+                [-half_size, half_size],
+                [half_size, -half_size],
+                [half_size, half_size],
+            ]
+        )
+        centres = np.reshape(centres[:, None, :] + offsets[None, :, :], (-1, 2))
+
+    return np.array(best_centre)
 
 
 def calculate_width(x, y, circle_centre):
@@ -381,6 +604,52 @@ def parameterise_insert(x, y, callback=None):
     return width, length, circle_centre
 
 
+def parameterise_inserts(xs, ys, workers=None):
+    """Return the parameterisation of many inserts.
+
+    Parameters
+    ----------
+    xs : list of np.ndarray
+        The x coordinates of each insert
+    ys : list of np.ndarray
+        The y coordinates of each insert
+    workers : int, optional
+        The number of processes to spread the inserts across. By default the
+        inserts are parameterised within this process.
+
+    Returns
+    -------
+    widths : np.ndarray
+        The equivalent ellipse width of each insert.
+    lengths : np.ndarray
+        The equivalent ellipse length of each insert.
+    circle_centres : np.ndarray
+        The centre of the largest bounded circle of each insert, with shape
+        ``(len(xs), 2)``.
+
+    """
+    inserts = list(zip(xs, ys))
+
+    if workers is None or workers <= 1:
+        parameterisations = list(map(_parameterise_insert_star, inserts))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            parameterisations = pool.map(_parameterise_insert_star, inserts)
+
+    if not parameterisations:
+        return np.array([]), np.array([]), np.empty((0, 2))
+
+    widths, lengths, circle_centres = zip(*parameterisations)
+
+    return np.array(widths), np.array(lengths), np.array(circle_centres)
+
+
+def _parameterise_insert_star(insert):
+    x, y = insert
+
+    return parameterise_insert(x, y)
+
+
 def visual_alignment_of_equivalent_ellipse(x, y, width, length, callback):
     """Visually align the equivalent ellipse to the insert."""
     insert = shapely_insert(x, y)
@@ -0,0 +1,555 @@
+# Copyright (C) 2020 Cancer Care Associates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""A grid indexed gamma engine.
+
+Rather than re-interpolating the evaluation grid on a fresh shell of points
+at every search distance, the evaluation grid is indexed once. Within the
+combined space/dose space, where coordinates are divided by the distance
+threshold and doses by the dose threshold, the global gamma of a reference
+point is the distance to the nearest point on the evaluation dose surface.
+
+A KD-tree over the evaluation grid nodes gives each reference point an
+upper bound on its gamma. A second KD-tree over the evaluation cell centres
+then provides the candidate cells which could contain a closer point, with
+any cell whose bounding box lies further away than that upper bound
+discarded. As the evaluation grid is multilinearly interpolated, a few
+steps of a bounded Gauss-Newton minimisation find a close point within each
+remaining cell. The interpolated dose can have several local minima within
+a cell, so the cells are then halved, branch and bound style, until each
+gamma is known to be within ``GAMMA_TOLERANCE`` of the true minimum.
+"""
+
+import itertools
+import sys
+import weakref
+
+from pymedphys._imports import numpy as np
+from pymedphys._imports import scipy
+
+# Approximate bytes used per candidate cell, per corner of that cell.
+BYTES_PER_CELL_CORNER = 8 * 16
+
+# An estimate of the number of candidate cells for a given reference point.
+EXPECTED_CELLS_PER_REFERENCE_POINT = 16
+
+NUM_MINIMISATION_STEPS = 4
+
+# Halved boxes continue on from where the minimisation within the box they
+# were split from finished.
+NUM_REFINEMENT_STEPS = 1
+
+# Each gamma is found to within this of the smallest gamma within its cells.
+GAMMA_TOLERANCE = 1e-3
+
+# A limit on the number of times the boxes are halved. Far more than is
+# needed to reach GAMMA_TOLERANCE within 3D cells.
+MAX_SUBDIVISIONS = 200
+
+_EVALUATION_GRID_INDEX_CACHE = weakref.WeakKeyDictionary()
+
+
+def gamma_loop_kdtree(options):
+    """Calculate gamma for all of the reference points to be calculated.
+
+    Takes the same ``GammaInternalFixedOptions`` as the shell based
+    ``gamma_loop`` and returns an array of the same shape.
+    """
+    if options.local_gamma:
+        raise ValueError(
+            "The kdtree gamma method only supports global gamma. Use the "
+            "shell method for local gamma."
+        )
+
+    current_gamma = np.inf * np.ones(
+        (
+            len(options.flat_dose_reference),
+            len(options.dose_percent_threshold),
+            len(options.distance_mm_threshold),
+        )
+    )
+
+    to_calc_index = np.where(options.reference_points_to_calc)[0]
+    if len(to_calc_index) == 0:
+        return current_gamma
+
+    reference_points = options.flat_mesh_axes_reference[:, to_calc_index]
+    reference_dose = options.flat_dose_reference[to_calc_index]
+
+    evaluation_grid = get_evaluation_grid_index(options.evaluation_interpolation)
+
+    num_slices = estimate_number_of_slices(options, len(to_calc_index))
+    sliced = np.array_split(np.arange(len(to_calc_index)), num_slices)
+
+    for i, global_dose_threshold in enumerate(options.global_dose_threshold):
+        for j, distance_threshold in enumerate(options.distance_mm_threshold):
+            node_tree = evaluation_grid.node_tree(
+                distance_threshold, global_dose_threshold
+            )
+
+            for k, current_slice in enumerate(sliced):
+                if not options.quiet:
+                    sys.stdout.write(
+                        "\rDose threshold: {0:.2f} | Distance threshold: {1:.2f} | "
+                        "Slice: {2} of {3}".format(
+                            options.dose_percent_threshold[i],
+                            distance_threshold,
+                            k + 1,
+                            num_slices,
+                        )
+                    )
+                    sys.stdout.flush()
+
+                current_gamma[
+                    to_calc_index[current_slice], i, j
+                ] = calculate_gamma_for_slice(
+                    options,
+                    evaluation_grid,
+                    node_tree,
+                    reference_points[:, current_slice],
+                    reference_dose[current_slice],
+                    distance_threshold,
+                    global_dose_threshold,
+                )
+
+    return current_gamma
+
+
+def get_evaluation_grid_index(evaluation_interpolation):
+    """Index the evaluation grid, reusing the index while the interpolation
+    is still alive.
+
+    This allows repeated calls over chunks of the reference points, such as
+    within a parallel worker, to only build the index once.
+    """
+    try:
+        return _EVALUATION_GRID_INDEX_CACHE[evaluation_interpolation]
+    except KeyError:
+        evaluation_grid = EvaluationGridIndex(evaluation_interpolation)
+        _EVALUATION_GRID_INDEX_CACHE[evaluation_interpolation] = evaluation_grid
+
+        return evaluation_grid
+
+
+class EvaluationGridIndex:
+    """The nodes and cells of the evaluation grid, indexed for searching."""
+
+    def __init__(self, evaluation_interpolation):
+        self.axes = [
+            np.array(axis, dtype=float) for axis in evaluation_interpolation.grid
+        ]
+        self.values = np.array(evaluation_interpolation.values, dtype=float)
+        self.num_dimensions = len(self.axes)
+
+        mesh = np.meshgrid(*self.axes, indexing="ij")
+        self.node_points = np.array([np.ravel(item) for item in mesh])
+        self.node_dose = np.ravel(self.values)
+
+        cell_index = np.meshgrid(
+            *[np.arange(len(axis) - 1) for axis in self.axes], indexing="ij"
+        )
+        cell_index = np.array([np.ravel(item) for item in cell_index])
+
+        self.cell_lower = np.array(
+            [axis[index] for axis, index in zip(self.axes, cell_index)]
+        ).T
+        self.cell_upper = np.array(
+            [axis[index + 1] for axis, index in zip(self.axes, cell_index)]
+        ).T
+
+        self.corner_bits = np.array(
+            list(itertools.product([0, 1], repeat=self.num_dimensions))
+        )
+        self.cell_corner_dose = np.array(
+            [
+                self.values[tuple(cell_index + bits[:, None])]
+                for bits in self.corner_bits
+            ]
+        ).T
+
+        self.cell_tree = scipy.spatial.cKDTree((self.cell_lower + self.cell_upper) / 2)
+        self.max_cell_half_diagonal = np.max(
+            np.sqrt(np.sum(((self.cell_upper - self.cell_lower) / 2) ** 2, axis=1))
+        )
+
+        self._node_trees = {}
+
+    def node_tree(self, distance_threshold, global_dose_threshold):
+        key = (distance_threshold, global_dose_threshold)
+        if key not in self._node_trees:
+            self._node_trees[key] = scipy.spatial.cKDTree(
+                np.concatenate(
+                    [
+                        self.node_points / distance_threshold,
+                        self.node_dose[None, :] / global_dose_threshold,
+                    ],
+                    axis=0,
+                ).T
+            )
+
+        return self._node_trees[key]
+
+
+def estimate_number_of_slices(options, num_reference_points):
+    num_dimensions = np.shape(options.flat_mesh_axes_reference)[0]
+
+    estimated_ram_needed = (
+        np.uint64(num_reference_points)
+        * np.uint64(EXPECTED_CELLS_PER_REFERENCE_POINT)
+        * np.uint64(2 ** num_dimensions)
+        * np.uint64(BYTES_PER_CELL_CORNER)
+    )
+
+    num_slices = np.floor(estimated_ram_needed / options.ram_available).astype(int) + 1
+
+    return int(np.min([num_slices, num_reference_points]))
+
+
+def calculate_gamma_for_slice(
+    options,
+    evaluation_grid,
+    node_tree,
+    reference_points,
+    reference_dose,
+    distance_threshold,
+    global_dose_threshold,
+):
+    scaled_reference_points = reference_points.T / distance_threshold
+    scaled_reference_dose = reference_dose / global_dose_threshold
+
+    gamma_bound = np.nextafter(options.max_gamma, np.inf)
+    gamma, _ = node_tree.query(
+        np.concatenate(
+            [scaled_reference_points, scaled_reference_dose[:, None]], axis=1
+        ),
+        distance_upper_bound=gamma_bound,
+    )
+
+    search_gamma = np.min([gamma, np.full_like(gamma, gamma_bound)], axis=0)
+    search_radii = (
+        search_gamma * distance_threshold + evaluation_grid.max_cell_half_diagonal
+    )
+
+    candidate_cells = evaluation_grid.cell_tree.query_ball_point(
+        reference_points.T, search_radii
+    )
+    reference_index = np.repeat(
+        np.arange(len(reference_dose)), [len(cells) for cells in candidate_cells]
+    )
+    cell_index = np.fromiter(
+        itertools.chain.from_iterable(candidate_cells),
+        dtype=int,
+        count=len(reference_index),
+    )
+
+    point = scaled_reference_points[reference_index, :]
+    dose = scaled_reference_dose[reference_index]
+    lower = evaluation_grid.cell_lower[cell_index, :] / distance_threshold
+    upper = evaluation_grid.cell_upper[cell_index, :] / distance_threshold
+    corner_dose = (
+        evaluation_grid.cell_corner_dose[cell_index, :] / global_dose_threshold
+    )
+
+    return search_cells_for_minimum_gamma(
+        evaluation_grid.corner_bits,
+        scaled_reference_points,
+        scaled_reference_dose,
+        gamma,
+        search_gamma,
+        reference_index,
+        lower,
+        upper,
+        corner_dose,
+        skip_once_passed=options.skip_once_passed,
+    )
+
+
+def search_cells_for_minimum_gamma(
+    corner_bits,
+    reference_points,
+    reference_dose,
+    gamma,
+    search_gamma,
+    reference_index,
+    lower,
+    upper,
+    corner_dose,
+    skip_once_passed=False,
+):
+    """Find the smallest gamma of each reference point within its candidate
+    cells by branch and bound.
+
+    Each candidate cell starts out as a single box. A local minimisation
+    within each box gives a gamma that its reference point achieves, and
+    ``lower_bound_gamma`` and ``linearised_lower_bound_gamma`` give a gamma
+    that no point within the box can beat. Boxes which cannot improve upon
+    the smallest gamma found for their reference point by more than
+    ``GAMMA_TOLERANCE`` are discarded, and the remainder are halved. Each
+    gamma is therefore found to within ``GAMMA_TOLERANCE``, even where the
+    interpolated dose has many local minima.
+
+    If ``skip_once_passed`` is ``True`` a reference point is no longer
+    searched once a gamma of less than one has been found for it.
+    """
+    search_bound = np.array(search_gamma)
+    start = None
+    num_steps = NUM_MINIMISATION_STEPS
+
+    for _ in range(MAX_SUBDIVISIONS):
+        point = reference_points[reference_index, :]
+        dose = reference_dose[reference_index]
+
+        box_lower_bound = lower_bound_gamma(point, dose, lower, upper, corner_dose)
+        searching = box_lower_bound < search_bound[reference_index]
+        if skip_once_passed:
+            searching &= gamma[reference_index] >= 1
+
+        reference_index, point, dose, lower, upper, corner_dose, box_lower_bound = [
+            item[searching]
+            for item in (
+                reference_index,
+                point,
+                dose,
+                lower,
+                upper,
+                corner_dose,
+                box_lower_bound,
+            )
+        ]
+        if start is not None:
+            start = start[searching]
+
+        box_gamma, position = minimise_gamma_within_cells(
+            corner_bits, point, dose, lower, upper, corner_dose, start, num_steps
+        )
+        np.minimum.at(gamma, reference_index, box_gamma)
+        search_bound = np.minimum(search_bound, gamma)
+
+        box_lower_bound = np.maximum(
+            box_lower_bound,
+            linearised_lower_bound_gamma(
+                corner_bits, point, dose, lower, upper, corner_dose, position
+            ),
+        )
+        refine = box_lower_bound < gamma[reference_index] - GAMMA_TOLERANCE
+        if skip_once_passed:
+            refine &= gamma[reference_index] >= 1
+
+        if not np.any(refine):
+            break
+
+        reference_index = np.concatenate([reference_index[refine]] * 2)
+        start = np.concatenate([position[refine]] * 2)
+        num_steps = NUM_REFINEMENT_STEPS
+        lower, upper, corner_dose = halve_boxes(
+            corner_bits, lower[refine], upper[refine], corner_dose[refine]
+        )
+
+    return gamma
+
+
+def halve_boxes(corner_bits, lower, upper, corner_dose):
+    """Split each box in two across the middle of its longest side.
+
+    The interpolated dose is linear along each edge of a box, so the doses
+    at the new corners are the means of the doses at either end of the
+    edges which are cut.
+    """
+    num_dimensions = np.shape(corner_bits)[1]
+    corner_index = np.arange(len(corner_bits))
+    flipped_corner = corner_index[None, :] ^ (
+        1 << (num_dimensions - 1 - np.arange(num_dimensions))[:, None]
+    )
+
+    longest = np.argmax(upper - lower, axis=1)
+    rows = np.arange(len(longest))
+    middle = (lower[rows, longest] + upper[rows, longest]) / 2
+
+    cut_dose = (
+        corner_dose + np.take_along_axis(corner_dose, flipped_corner[longest], axis=1)
+    ) / 2
+    is_upper_corner = corner_bits[:, longest].T == 1
+
+    lower_half_upper = upper.copy()
+    lower_half_upper[rows, longest] = middle
+    upper_half_lower = lower.copy()
+    upper_half_lower[rows, longest] = middle
+
+    return (
+        np.concatenate([lower, upper_half_lower]),
+        np.concatenate([lower_half_upper, upper]),
+        np.concatenate(
+            [
+                np.where(is_upper_corner, cut_dose, corner_dose),
+                np.where(is_upper_corner, corner_dose, cut_dose),
+            ]
+        ),
+    )
+
+
+def lower_bound_gamma(point, dose, lower, upper, corner_dose):
+    """The distance from each reference point to the bounding box of its cell.
+
+    A multilinearly interpolated dose never leaves the range spanned by the
+    doses at the corners of its cell, so no point within the cell can have a
+    smaller gamma than this.
+    """
+    spatial_gap = np.max([lower - point, np.zeros_like(lower), point - upper], axis=0)
+    dose_gap = np.max(
+        [
+            np.min(corner_dose, axis=1) - dose,
+            np.zeros_like(dose),
+            dose - np.max(corner_dose, axis=1),
+        ],
+        axis=0,
+    )
+
+    return np.sqrt(np.sum(spatial_gap ** 2, axis=1) + dose_gap ** 2)
+
+
+def linearised_lower_bound_gamma(
+    corner_bits, point, dose, lower, upper, corner_dose, position
+):
+    """A lower bound on gamma within each box which, unlike
+    ``lower_bound_gamma``, tightens quadratically as the box shrinks.
+
+    Within the box the interpolated dose departs from its linearisation
+    about the box centre by no more than the sum of its higher order
+    terms. The squared distance to the band of doses this leaves is convex,
+    and so is bounded below by its tangent plane at ``position``.
+    """
+    num_corners, num_dimensions = np.shape(corner_bits)
+    sign = 2 * corner_bits - 1
+
+    # The coefficients of the interpolation as a polynomial in coordinates
+    # which run from -1 to 1 across the box, one for each set of axes.
+    subset_sign = np.prod(
+        np.where(corner_bits[None, :, :] == 1, sign[:, None, :], 1), axis=-1
+    )
+    coefficients = corner_dose @ subset_sign / num_corners
+    order = np.sum(corner_bits, axis=1)
+
+    centre = (lower + upper) / 2
+    gradient = coefficients[:, order == 1][:, ::-1] * 2 / (upper - lower)
+    remainder = np.sum(np.abs(coefficients[:, order >= 2]), axis=1)
+
+    dose_residual = (
+        coefficients[:, 0] + np.sum(gradient * (position - centre), axis=1) - dose
+    )
+    dose_gap = np.maximum(np.abs(dose_residual) - remainder, 0)
+
+    squared_gamma = np.sum((position - point) ** 2, axis=1) + dose_gap ** 2
+    slope = (
+        2 * (position - point)
+        + 2 * gradient * (dose_gap * np.sign(dose_residual))[:, None]
+    )
+    tangent_drop = np.sum(
+        np.minimum(slope * (lower - position), slope * (upper - position)), axis=1
+    )
+
+    return np.sqrt(np.maximum(squared_gamma + tangent_drop, 0))
+
+
+def minimise_gamma_within_cells(
+    corner_bits,
+    point,
+    dose,
+    lower,
+    upper,
+    corner_dose,
+    start=None,
+    num_steps=NUM_MINIMISATION_STEPS,
+):
+    """Find a local minimum of gamma within each cell for its reference point.
+
+    Starting from the point within the cell spatially closest to the
+    reference point, Gauss-Newton steps are taken on the residuals of the
+    gamma function. Any coordinate that sits on the cell's boundary and is
+    being pushed further outwards is held fixed for that step. The search
+    instead starts from ``start`` where it is given. Both the gamma found
+    and its position are returned.
+    """
+    cell_size = upper - lower
+    if start is None:
+        start = point
+    position = np.clip(start, lower, upper)
+
+    for _ in range(num_steps):
+        interpolated_dose, gradient = multilinear_dose_and_gradient(
+            corner_bits, (position - lower) / cell_size, cell_size, corner_dose
+        )
+        spatial_residual = position - point
+        dose_residual = interpolated_dose - dose
+
+        descent = spatial_residual + gradient * dose_residual[:, None]
+        held = ((position <= lower) & (descent > 0)) | (
+            (position >= upper) & (descent < 0)
+        )
+        spatial_residual = np.where(held, 0, spatial_residual)
+        gradient = np.where(held, 0, gradient)
+
+        # (I + g g^T)^-1 by the Sherman-Morrison formula
+        right_hand_side = spatial_residual + gradient * dose_residual[:, None]
+        step = (
+            right_hand_side
+            - gradient
+            * (
+                np.sum(gradient * right_hand_side, axis=1)
+                / (1 + np.sum(gradient ** 2, axis=1))
+            )[:, None]
+        )
+
+        position = np.clip(position - step, lower, upper)
+
+    interpolated_dose, _ = multilinear_dose_and_gradient(
+        corner_bits, (position - lower) / cell_size, cell_size, corner_dose
+    )
+    gamma = np.sqrt(
+        np.sum((position - point) ** 2, axis=1) + (interpolated_dose - dose) ** 2
+    )
+
+    return gamma, position
+
+
+def multilinear_dose_and_gradient(corner_bits, fraction, cell_size, corner_dose):
+    """Interpolate the dose, and its gradient, at ``fraction`` of the way
+    across each cell by interpolating along one axis at a time."""
+    num_dimensions = np.shape(corner_bits)[1]
+    corner_dose = np.reshape(corner_dose, (-1,) + (2,) * num_dimensions)
+
+    interpolated_dose = interpolate_along_each_axis(corner_dose, fraction)
+
+    gradient = []
+    for axis in range(num_dimensions):
+        difference = corner_dose.take(1, axis=axis + 1) - corner_dose.take(
+            0, axis=axis + 1
+        )
+        other_axes = [other for other in range(num_dimensions) if other != axis]
+        gradient.append(
+            interpolate_along_each_axis(difference, fraction[:, other_axes])
+            / cell_size[:, axis]
+        )
+
+    return interpolated_dose, np.array(gradient).T
+
+
+def interpolate_along_each_axis(corner_dose, fraction):
+    for axis in range(np.shape(fraction)[1]):
+        weight = np.reshape(fraction[:, axis], (-1,) + (1,) * (corner_dose.ndim - 2))
+        corner_dose = (
+            corner_dose[:, 0, ...]
+            + (corner_dose[:, 1, ...] - corner_dose[:, 0, ...]) * weight
+        )
+
+    return corner_dose
@@ -0,0 +1,295 @@
+# Copyright (C) 2020 Cancer Care Associates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Spread a gamma calculation across a pool of worker processes.
+
+The dose grids are placed within shared memory so that each worker reads
+them without being sent its own copy. Gamma loops which calculate each
+reference point independently of the others, such as the kdtree loop, are
+run over chunks of the reference points within the workers. The distances
+searched by the shell loop depend upon every reference point which is
+still being searched, so it is instead run within this process, with only
+the dose differences at each of its distances calculated by the workers.
+"""
+
+import dataclasses
+import functools
+import multiprocessing
+import sys
+
+from pymedphys._imports import numpy as np
+from pymedphys._imports import scipy
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# More chunks than workers so that a chunk full of slow to converge
+# reference points does not leave the rest of the pool idle.
+CHUNKS_PER_WORKER = 4
+
+_WORKER_STATE = {}
+
+
+def gamma_loop_parallel(options, gamma_loop, workers):
+    """Run ``gamma_loop`` across a pool of ``workers`` processes.
+
+    Returns the same array as ``gamma_loop(options)`` would.
+    """
+    # Imported here to avoid a circular import with the shell module
+    from .shell import gamma_loop as shell_gamma_loop
+
+    with GammaWorkerPool(options, workers) as pool:
+        if gamma_loop is shell_gamma_loop:
+            return shell_gamma_loop(
+                options, min_dose_difference=pool.calculate_min_dose_difference
+            )
+
+        return pool.calculate_in_chunks(options, gamma_loop)
+
+
+class GammaWorkerPool:
+    """A pool of worker processes, each with the reference and evaluation
+    doses of ``options`` attached from shared memory."""
+
+    def __init__(self, options, workers):
+        self.workers = workers
+
+        interpolation = options.evaluation_interpolation
+        self._arrays = {
+            "flat_mesh_axes_reference": options.flat_mesh_axes_reference,
+            "flat_dose_reference": options.flat_dose_reference,
+            "evaluation_values": interpolation.values,
+        }
+
+        self._fixed_options = {
+            field.name: getattr(options, field.name)
+            for field in dataclasses.fields(options)
+            if field.name
+            not in (
+                "flat_mesh_axes_reference",
+                "flat_dose_reference",
+                "reference_points_to_calc",
+                "evaluation_interpolation",
+            )
+        }
+        self._fixed_options["ram_available"] = options.ram_available // workers
+        self._fixed_options["quiet"] = True
+
+        self._interpolation_parameters = {
+            "points": interpolation.grid,
+            "method": interpolation.method,
+            "bounds_error": interpolation.bounds_error,
+            "fill_value": interpolation.fill_value,
+        }
+
+        self._shared = None
+        self._pool = None
+
+    def __enter__(self):
+        self._shared = SharedArrays(self._arrays).__enter__()
+
+        try:
+            self._pool = multiprocessing.Pool(
+                self.workers,
+                initializer=_initialise_worker,
+                initargs=(
+                    self._shared.descriptors,
+                    self._fixed_options,
+                    self._interpolation_parameters,
+                ),
+            ).__enter__()
+        except BaseException:
+            self._shared.__exit__(None, None, None)
+            raise
+
+        return self
+
+    def __exit__(self, *args):
+        try:
+            self._pool.__exit__(*args)
+        finally:
+            self._shared.__exit__(*args)
+
+    def calculate_in_chunks(self, options, gamma_loop):
+        """Run ``gamma_loop`` over chunks of the reference points to be
+        calculated, with each chunk calculated independently."""
+        current_gamma = np.inf * np.ones(
+            (
+                len(options.flat_dose_reference),
+                len(options.dose_percent_threshold),
+                len(options.distance_mm_threshold),
+            )
+        )
+
+        to_calc_index = np.where(options.reference_points_to_calc)[0]
+        if len(to_calc_index) == 0:
+            return current_gamma
+
+        chunks = self._split(to_calc_index)
+
+        for i, (chunk, chunk_gamma) in enumerate(
+            self._pool.imap_unordered(
+                functools.partial(_calculate_chunk, gamma_loop=gamma_loop), chunks
+            )
+        ):
+            current_gamma[chunk, :, :] = chunk_gamma
+
+            if not options.quiet:
+                sys.stdout.write(
+                    "\rWorkers: {} | Chunks complete: {} of {}".format(
+                        self.workers, i + 1, len(chunks)
+                    )
+                )
+                sys.stdout.flush()
+
+        return current_gamma
+
+    def calculate_min_dose_difference(
+        self, options, distance, to_be_checked, distance_step_size
+    ):
+        """A drop in replacement for the shell module's
+        ``calculate_min_dose_difference`` which spreads the reference points
+        to be checked across the workers."""
+        chunks = self._split(np.where(np.ravel(to_be_checked))[0])
+
+        return np.concatenate(
+            self._pool.map(
+                functools.partial(
+                    _calculate_min_dose_difference_chunk,
+                    distance=distance,
+                    distance_step_size=distance_step_size,
+                ),
+                chunks,
+            )
+        )
+
+    def _split(self, index):
+        num_chunks = int(
+            np.max([np.min([self.workers * CHUNKS_PER_WORKER, len(index)]), 1])
+        )
+
+        return np.array_split(index, num_chunks)
+
+
+class SharedArrays:
+    """Place a dictionary of arrays within shared memory.
+
+    On Python versions without ``multiprocessing.shared_memory`` the arrays
+    themselves are used as the descriptors and are copied to each worker on
+    start up instead.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.blocks = []
+        self.descriptors = {}
+
+    def __enter__(self):
+        for key, array in self.arrays.items():
+            array = np.ascontiguousarray(array)
+
+            if shared_memory is None:
+                self.descriptors[key] = array
+                continue
+
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(block)
+
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            self.descriptors[key] = (block.name, array.shape, array.dtype.str)
+
+        return self
+
+    def __exit__(self, *args):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def attach_shared_arrays(descriptors):
+    """Recreate the arrays described by ``SharedArrays.descriptors``.
+
+    Also returns the shared memory blocks, which must be kept alive for as
+    long as the arrays are in use.
+    """
+    arrays = {}
+    blocks = []
+    for key, descriptor in descriptors.items():
+        if shared_memory is None:
+            arrays[key] = descriptor
+            continue
+
+        name, shape, dtype = descriptor
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[key] = array
+
+    return arrays, blocks
+
+
+def _initialise_worker(descriptors, fixed_options, interpolation_parameters):
+    # Imported here to avoid a circular import with the shell module
+    from .shell import GammaInternalFixedOptions
+
+    arrays, blocks = attach_shared_arrays(descriptors)
+
+    evaluation_interpolation = scipy.interpolate.RegularGridInterpolator(
+        values=arrays["evaluation_values"], **interpolation_parameters
+    )
+
+    _WORKER_STATE["blocks"] = blocks
+    _WORKER_STATE["arrays"] = arrays
+    _WORKER_STATE["options"] = GammaInternalFixedOptions(
+        flat_mesh_axes_reference=arrays["flat_mesh_axes_reference"],
+        flat_dose_reference=arrays["flat_dose_reference"],
+        reference_points_to_calc=np.zeros(
+            len(arrays["flat_dose_reference"]), dtype=bool
+        ),
+        evaluation_interpolation=evaluation_interpolation,
+        **fixed_options
+    )
+
+
+def _calculate_chunk(chunk, gamma_loop):
+    options = _WORKER_STATE["options"]
+    arrays = _WORKER_STATE["arrays"]
+
+    chunk_options = dataclasses.replace(
+        options,
+        flat_mesh_axes_reference=arrays["flat_mesh_axes_reference"][:, chunk],
+        flat_dose_reference=arrays["flat_dose_reference"][chunk],
+        reference_points_to_calc=np.ones(len(chunk), dtype=bool),
+    )
+
+    return chunk, gamma_loop(chunk_options)
+
+
+def _calculate_min_dose_difference_chunk(chunk, distance, distance_step_size):
+    # Imported here to avoid a circular import with the shell module
+    from .shell import calculate_min_dose_difference
+
+    options = _WORKER_STATE["options"]
+
+    to_be_checked = np.zeros(len(options.flat_dose_reference), dtype=bool)
+    to_be_checked[chunk] = True
+
+    return calculate_min_dose_difference(
+        options, distance, to_be_checked, distance_step_size
+    )
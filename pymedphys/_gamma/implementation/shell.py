@@ -25,6 +25,8 @@ from pymedphys._imports import scipy
 import pymedphys._utilities.createshells
 
 from ..utilities import run_input_checks
+from .kdtree import gamma_loop_kdtree
+from .parallel import gamma_loop_parallel
 
 DEFAULT_RAM = int(2 ** 30 * 1.5)  # 1.5 GB
 
@@ -45,6 +47,8 @@ def gamma_shell(
     random_subset=None,
     ram_available=DEFAULT_RAM,
     quiet=False,
+    method="shell",
+    workers=None,
 ):
     """Compare two dose grids with the gamma index.
 
@@ -99,6 +103,21 @@ def gamma_shell(
     quiet : bool, optional
         Used to quiet informational printing during function usage. Defaults to
         False.
+    method : str, optional
+        The search engine used to find the minimum gamma. Either ``"shell"``,
+        which searches shells of increasing distance around each reference
+        point, or ``"kdtree"``, which indexes the evaluation grid once within
+        the combined distance and dose space and then finds the closest
+        point on the interpolated evaluation dose within each nearby grid
+        cell. The ``"kdtree"`` method is considerably faster on large 3D
+        grids and, as it does not sample at discrete steps, does not make use
+        of ``interp_fraction``. It only supports global gamma. Defaults to
+        ``"shell"``.
+    workers : int, optional
+        The number of worker processes to spread the reference points
+        across. The dose grids are shared between the workers and each
+        worker is given ``ram_available`` divided by ``workers``. Defaults
+        to None, which calculates within the current process.
 
     Returns
     -------
@@ -110,6 +129,16 @@ def gamma_shell(
     if max_gamma is None:
         max_gamma = np.inf
 
+    gamma_loops = {"shell": gamma_loop, "kdtree": gamma_loop_kdtree}
+    try:
+        selected_gamma_loop = gamma_loops[method]
+    except KeyError:
+        raise ValueError(
+            "Unknown gamma method '{}'. Expected one of {}".format(
+                method, list(gamma_loops.keys())
+            )
+        )
+
     options = GammaInternalFixedOptions.from_user_inputs(
         axes_reference,
         dose_reference,
@@ -147,7 +176,10 @@ def gamma_shell(
         )
         print("")
 
-    current_gamma = gamma_loop(options)
+    if workers is None or workers <= 1:
+        current_gamma = selected_gamma_loop(options)
+    else:
+        current_gamma = gamma_loop_parallel(options, selected_gamma_loop, workers)
 
     gamma = {}
     for i, dose_threshold in enumerate(options.dose_percent_threshold):
@@ -308,7 +340,10 @@ class GammaInternalFixedOptions:
         )
 
 
-def gamma_loop(options: GammaInternalFixedOptions):
+def gamma_loop(options: GammaInternalFixedOptions, min_dose_difference=None):
+    if min_dose_difference is None:
+        min_dose_difference = calculate_min_dose_difference
+
     still_searching_for_gamma = np.full_like(
         options.flat_dose_reference, True, dtype=bool
     )
@@ -337,7 +372,7 @@ def gamma_loop(options: GammaInternalFixedOptions):
                 )
             )
 
-        min_relative_dose_difference = calculate_min_dose_difference(
+        min_relative_dose_difference = min_dose_difference(
             options, distance, to_be_checked, distance_step_size
         )
 
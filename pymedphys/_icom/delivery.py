@@ -45,6 +45,10 @@ def delivery_from_icom_stream(icom_stream):
         for single_icom_stream in icom_stream_points
     ]
 
+    return delivery_from_data_items(delivery_raw)
+
+
+def delivery_from_data_items(delivery_raw):
     mu = np.array([item[0] for item in delivery_raw])
     diff_mu = np.concatenate([[0], np.diff(mu)])
     diff_mu[diff_mu < 0] = 0
@@ -66,3 +70,13 @@ class DeliveryIcom(
         return cls(  # pylint: disable = protected-access
             *delivery_from_icom_stream(icom_stream)
         )._filter_cps()
+
+    @classmethod
+    def _from_icom_data_items(cls, delivery_data_items):
+        """Create a delivery from the output of ``get_delivery_data_items``
+        for each iCOM frame, as is used when frames are decoded as they
+        arrive.
+        """
+        return cls(  # pylint: disable = protected-access
+            *delivery_from_data_items(delivery_data_items)
+        )._filter_cps()
@@ -1,13 +1,14 @@
 import logging
 import pathlib
-import re
 import socket
 import time
 import traceback
 
 from . import patients
+from .extract import DATE_PATTERN
+from .stream import IcomStreamParser
 
-BUFFER_SIZE = 256
+BUFFER_SIZE = 4096
 ICOM_PORT = 1706
 
 
@@ -22,10 +23,6 @@ def save_an_icom_batch(date_pattern, ip_directory, data_to_save):
         f.write(data_to_save)
 
 
-def get_start_location_from_date_span(span):
-    return span[0] - 8
-
-
 def initialise_socket(ip):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect((ip, ICOM_PORT))
@@ -36,8 +33,6 @@ def initialise_socket(ip):
 
 
 def listen(ip, data_dir):
-    date_pattern = re.compile(rb"\d\d\d\d-\d\d-\d\d\d\d:\d\d:\d\d")
-
     data_dir = pathlib.Path(data_dir)
     live_dir = data_dir.joinpath("live")
     patients_dir = data_dir.joinpath("patients")
@@ -53,37 +48,28 @@ def listen(ip, data_dir):
     s = initialise_socket(ip)
 
     try:
-        data = b""
+        stream_parser = IcomStreamParser()
 
         while True:
             try:
-                data += s.recv(BUFFER_SIZE)
+                data = s.recv(BUFFER_SIZE)
             except socket.timeout:
-                logging.warning("Socket connection timed out, retrying connection")
+                data = None
+
+            if not data:
+                logging.warning(
+                    "Socket connection timed out or was closed, retrying connection"
+                )
                 logging.info(s)
                 s.close()
                 logging.info(s)
                 s = initialise_socket(ip)
                 continue
 
-            matches = date_pattern.finditer(data)
-            try:
-                span = next(matches).span()
-            except StopIteration:
-                continue
-
-            previous_start_location = get_start_location_from_date_span(span)
-            for match in matches:
-                new_start_location = get_start_location_from_date_span(match.span())
-                data_to_save = data[previous_start_location:new_start_location]
-
-                save_an_icom_batch(date_pattern, ip_directory, data_to_save)
+            for data_to_save in stream_parser.feed(data):
+                save_an_icom_batch(DATE_PATTERN, ip_directory, data_to_save)
                 archive_by_patient(ip, data_to_save)
 
-                previous_start_location = new_start_location
-
-            data = data[previous_start_location::]
-
     finally:
         s.close()
         logging.info(s)
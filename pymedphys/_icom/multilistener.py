@@ -0,0 +1,276 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Listen to the iCOM streams of many linacs from a single event loop.
+
+Each linac has its own connection, which reconnects with an exponential
+backoff independently of the others. Completed frames are passed to a
+single writer which saves them from a background thread, so that a slow
+disk never holds up the receiving of the streams.
+"""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import logging
+import pathlib
+import time
+import traceback
+from typing import Optional
+
+from . import patients
+from .extract import DATE_PATTERN
+from .listener import BUFFER_SIZE, ICOM_PORT, save_an_icom_batch
+from .stream import IcomStreamParser
+
+# iCOM frames arrive a few times a second while a linac is in use, and
+# heartbeat frames are sent while it is idle.
+RECEIVE_TIMEOUT = 10
+
+MIN_BACKOFF = 1
+MAX_BACKOFF = 60 * 5
+
+WRITE_QUEUE_SIZE = 1000
+
+
+@dataclasses.dataclass
+class ConnectionMetrics:
+    """Throughput and lag of a single linac's connection.
+
+    ``write_lag`` is the time between a frame being received and it being
+    saved to disk, for the most recently saved frame.
+    """
+
+    ip: str
+    connected: bool = False
+    connection_attempts: int = 0
+    bytes_received: int = 0
+    frames_received: int = 0
+    frames_written: int = 0
+    last_frame_received: Optional[float] = None
+    write_lag: float = 0.0
+
+    _interval_start: float = dataclasses.field(default_factory=time.monotonic)
+    _interval_bytes: int = 0
+
+    def record_bytes(self, number_of_bytes):
+        self.bytes_received += number_of_bytes
+        self._interval_bytes += number_of_bytes
+
+    def throughput(self):
+        """Bytes per second received since the previous call."""
+        now = time.monotonic()
+        elapsed = now - self._interval_start
+        throughput = self._interval_bytes / elapsed if elapsed > 0 else 0.0
+
+        self._interval_start = now
+        self._interval_bytes = 0
+
+        return throughput
+
+    def summary(self):
+        if self.last_frame_received is None:
+            since_last_frame = "never"
+        else:
+            since_last_frame = "{:.1f} s ago".format(
+                time.monotonic() - self.last_frame_received
+            )
+
+        return (
+            f"IP: {self.ip} | Connected: {self.connected} | "
+            f"Throughput: {self.throughput():.0f} B/s | "
+            f"Frames received: {self.frames_received} | "
+            f"Frames written: {self.frames_written} | "
+            f"Last frame: {since_last_frame} | "
+            f"Write lag: {self.write_lag:.3f} s | "
+            f"Connection attempts: {self.connection_attempts}"
+        )
+
+
+class IcomWriter:
+    """Save iCOM frames to disk from a background thread.
+
+    Frames are queued by ``put`` and saved, in the order they were queued,
+    by a single thread. This saves each frame within the ``live``
+    directory and archives it by patient, the same as ``listener.listen``.
+    """
+
+    def __init__(self, data_dir, queue_size=WRITE_QUEUE_SIZE):
+        data_dir = pathlib.Path(data_dir)
+        self._live_dir = data_dir.joinpath("live")
+        self._patient_icom_data = patients.PatientIcomData(
+            data_dir.joinpath("patients")
+        )
+
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def patient_icom_data(self):
+        return self._patient_icom_data
+
+    async def put(self, ip, frame, metrics):
+        await self._queue.put((ip, frame, metrics, time.monotonic()))
+
+    async def join(self):
+        await self._queue.join()
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+
+        try:
+            while True:
+                ip, frame, metrics, received = await self._queue.get()
+                try:
+                    await loop.run_in_executor(self._executor, self._write, ip, frame)
+                    metrics.frames_written += 1
+                    metrics.write_lag = time.monotonic() - received
+                except Exception:  # pylint: disable = broad-except
+                    logging.error(  # pylint: disable = logging-fstring-interpolation
+                        f"Unable to save an iCOM frame from {ip}.\n"
+                        f"{traceback.format_exc()}"
+                    )
+                finally:
+                    self._queue.task_done()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _write(self, ip, frame):
+        ip_directory = self._live_dir.joinpath(ip)
+        ip_directory.mkdir(exist_ok=True, parents=True)
+
+        save_an_icom_batch(DATE_PATTERN, ip_directory, frame)
+        self._patient_icom_data.update_data(ip, frame)
+
+
+async def listen_to_linac(
+    ip,
+    writer,
+    metrics,
+    port=ICOM_PORT,
+    receive_timeout=RECEIVE_TIMEOUT,
+    min_backoff=MIN_BACKOFF,
+    max_backoff=MAX_BACKOFF,
+):
+    """Receive the iCOM stream of one linac, reconnecting whenever the
+    connection fails.
+
+    The wait before each reconnection attempt doubles with each attempt
+    that fails to receive any data, up to ``max_backoff`` seconds.
+    """
+    backoff = min_backoff
+
+    # Kept across reconnections, as the linac's stream continues on from
+    # where it was when the connection dropped.
+    stream_parser = IcomStreamParser()
+
+    while True:
+        metrics.connection_attempts += 1
+        stream_writer = None
+
+        try:
+            reader, stream_writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, port), receive_timeout
+            )
+            metrics.connected = True
+            logging.info(  # pylint: disable = logging-fstring-interpolation
+                f"Connected to {ip}:{port}"
+            )
+
+            while True:
+                data = await asyncio.wait_for(reader.read(BUFFER_SIZE), receive_timeout)
+                if not data:
+                    raise ConnectionError("The connection was closed by the linac")
+
+                backoff = min_backoff
+                metrics.record_bytes(len(data))
+
+                for frame in stream_parser.feed(data):
+                    metrics.frames_received += 1
+                    metrics.last_frame_received = time.monotonic()
+                    await writer.put(ip, frame, metrics)
+
+        except (OSError, asyncio.TimeoutError) as e:
+            logging.warning(  # pylint: disable = logging-fstring-interpolation
+                f"iCOM connection to {ip}:{port} dropped out ({repr(e)}). "
+                f"Will retry in {backoff} s."
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # pylint: disable = broad-except
+            logging.error(  # pylint: disable = logging-fstring-interpolation
+                f"Unexpected error within the iCOM connection to {ip}:{port}. "
+                f"Will retry in {backoff} s.\n{traceback.format_exc()}"
+            )
+        finally:
+            metrics.connected = False
+            if stream_writer is not None:
+                stream_writer.close()
+
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, max_backoff)
+
+
+async def report_metrics(all_metrics, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for metrics in all_metrics:
+            logging.info(metrics.summary())
+
+
+async def listen_to_linacs(addresses, data_dir, metrics_interval=60, **kwargs):
+    """Listen to the iCOM streams of many linacs at once.
+
+    Parameters
+    ----------
+    addresses : list of str
+        The IP address of each linac, optionally followed by ``:port``.
+    data_dir : str or pathlib.Path
+        The directory within which the ``live`` and ``patients``
+        directories are created.
+    metrics_interval : float, optional
+        The number of seconds between each logging of the connection
+        metrics. Defaults to 60.
+    **kwargs
+        Passed to ``listen_to_linac``.
+    """
+    writer = IcomWriter(data_dir)
+
+    all_metrics = []
+    listeners = []
+    for address in addresses:
+        ip, _, port = address.partition(":")
+        port = int(port) if port else ICOM_PORT
+
+        metrics = ConnectionMetrics(ip)
+        all_metrics.append(metrics)
+        listeners.append(listen_to_linac(ip, writer, metrics, port=port, **kwargs))
+
+    await asyncio.gather(
+        writer.run(), report_metrics(all_metrics, metrics_interval), *listeners
+    )
+
+
+def listen_multiple_cli(args):
+    coroutine = listen_to_linacs(
+        args.ips, args.directory, metrics_interval=args.metrics_interval
+    )
+
+    try:
+        run = asyncio.run
+    except AttributeError:  # Python 3.6
+        asyncio.get_event_loop().run_until_complete(coroutine)
+    else:
+        run(coroutine)
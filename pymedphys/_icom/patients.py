@@ -6,6 +6,7 @@ import traceback
 import pymedphys
 
 from . import extract, observer
+from .delivery import get_delivery_data_items
 
 # TODO: Convert logging to use lazy formatting
 # see https://docs.python.org/3/howto/logging.html#optimization
@@ -19,9 +20,43 @@ class UnableToReadIcom(ValueError):
     pass
 
 
-def validate_data(data_to_be_saved):
+class IncrementalIcomDelivery:
+    """The delivery data of a treatment, decoded one iCOM frame at a time.
+
+    Each frame is decoded as it is appended so that the delivery is
+    available while the treatment is still underway, and so that it does
+    not need to be decoded again once the treatment is complete.
+    """
+
+    def __init__(self):
+        self._delivery_data_items = []
+        self.unreadable_frames = 0
+
+    def append(self, data):
+        try:
+            self._delivery_data_items.append(get_delivery_data_items(data))
+        except Exception as _:  # pylint: disable = broad-except
+            traceback.print_exc()
+            self.unreadable_frames += 1
+
+    @property
+    def delivery(self):
+        if self.unreadable_frames:
+            raise UnableToReadIcom(
+                f"{self.unreadable_frames} iCOM frames were unable to be read"
+            )
+
+        return pymedphys.Delivery._from_icom_data_items(  # pylint: disable = protected-access
+            self._delivery_data_items
+        )
+
+
+def validate_data(data_to_be_saved, incremental_delivery=None):
     try:
-        delivery = pymedphys.Delivery.from_icom(data_to_be_saved)
+        if incremental_delivery is None:
+            delivery = pymedphys.Delivery.from_icom(data_to_be_saved)
+        else:
+            delivery = incremental_delivery.delivery
     except Exception as _:
         traceback.print_exc()
         raise UnableToReadIcom()
@@ -32,7 +67,12 @@ def validate_data(data_to_be_saved):
     return delivery
 
 
-def save_patient_data(start_timestamp, patient_data, output_dir: pathlib.Path):
+def save_patient_data(
+    start_timestamp,
+    patient_data,
+    output_dir: pathlib.Path,
+    incremental_delivery: IncrementalIcomDelivery = None,
+):
     _, patient_id = extract.extract(patient_data[0], "Patient ID")
 
     for data in patient_data:
@@ -48,12 +88,10 @@ def save_patient_data(start_timestamp, patient_data, output_dir: pathlib.Path):
     )
     filename = patient_dir.joinpath(f"{reformatted_timestamp}.xz")
 
-    data = b""
-    for item in patient_data:
-        data += item
+    data = b"".join(patient_data)
 
     try:
-        delivery = validate_data(data)
+        delivery = validate_data(data, incremental_delivery=incremental_delivery)
         logging.info(  # pylint: disable = logging-fstring-interpolation
             f"Delivery with a total MU of {delivery.mu[-1]} for "
             f"{patient_name} ({patient_id}) is being saved within "
@@ -88,25 +126,70 @@ def save_patient_data(start_timestamp, patient_data, output_dir: pathlib.Path):
 
 class PatientIcomData:
     def __init__(self, output_dir):
-        self._data = {}
+        # Only the most recent data item for each IP is kept, which is all
+        # that is needed to detect duplicated or out of order items.
+        self._previous_data = {}
         self._usage_start = {}
         self._current_patient_data = {}
+        self._current_delivery = {}
         self._output_dir = pathlib.Path(output_dir)
 
+    def live_delivery(self, ip):
+        """The delivery so far of the patient currently on the linac at
+        ``ip``, or ``None`` if there is no patient.
+        """
+        try:
+            incremental_delivery = self._current_delivery[ip]
+        except KeyError:
+            return None
+
+        if incremental_delivery is None:
+            return None
+
+        return incremental_delivery.delivery
+
+    def reset(self, ip):
+        """Forget the data stream from ``ip`` so that the next data item
+        begins a new delivery.
+
+        The data of any patient currently on the linac is saved first, so
+        that the delivery up until the reset is kept.
+        """
+        usage_start = self._usage_start.pop(ip, None)
+        patient_data = self._current_patient_data.pop(ip, None)
+        incremental_delivery = self._current_delivery.pop(ip, None)
+        self._previous_data.pop(ip, None)
+
+        if usage_start is not None:
+            save_patient_data(
+                usage_start,
+                patient_data,
+                self._output_dir,
+                incremental_delivery=incremental_delivery,
+            )
+
     def update_data(self, ip, data):
         try:
-            if self._data[ip][-1][26] == data[26]:
+            previous_data = self._previous_data[ip]
+        except KeyError:
+            previous_data = None
+
+        if previous_data is not None:
+            if previous_data[26] == data[26]:
                 logging.warning("Skip this data item, duplicate of previous data item.")
-                if self._data[ip][-1] != data:
+                if previous_data != data:
                     raise ValueError("Duplicate ID, but not duplicate data!")
 
                 return
 
-            if (self._data[ip][-1][26] + 1) % 256 != data[26]:
-                raise ValueError("Data stream appears to be arriving out of order")
-            self._data[ip].append(data)
-        except KeyError:
-            self._data[ip] = [data]
+            if (previous_data[26] + 1) % 256 != data[26]:
+                logging.warning(  # pylint: disable = logging-fstring-interpolation
+                    f"The data stream from {ip} appears to be arriving out of "
+                    "order, or has skipped data items. Starting a new delivery."
+                )
+                self.reset(ip)
+
+        self._previous_data[ip] = data
 
         timestamp = data[8:26].decode()
         shrunk_data, patient_id = extract.extract(data, "Patient ID")
@@ -126,17 +209,23 @@ class PatientIcomData:
         if patient_id is not None:
             if usage_start is None:
                 self._current_patient_data[ip] = []
+                self._current_delivery[ip] = IncrementalIcomDelivery()
 
                 timestamp = data[8:26].decode()
                 iso_timestamp = f"{timestamp[0:10]}T{timestamp[10::]}"
                 self._usage_start[ip] = iso_timestamp
 
             self._current_patient_data[ip].append(data)
+            self._current_delivery[ip].append(data)
         elif not usage_start is None:
             save_patient_data(
-                usage_start, self._current_patient_data[ip], self._output_dir
+                usage_start,
+                self._current_patient_data[ip],
+                self._output_dir,
+                incremental_delivery=self._current_delivery[ip],
             )
             self._current_patient_data[ip] = None
+            self._current_delivery[ip] = None
             self._usage_start[ip] = None
 
 
@@ -0,0 +1,98 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Split a live iCOM stream into its frames as the bytes arrive.
+"""
+
+import logging
+
+from .extract import DATE_PATTERN
+
+# Each iCOM frame begins 8 bytes before its timestamp
+DATE_OFFSET = 8
+DATE_LENGTH = 18
+
+# Far larger than any single iCOM frame. Should the stream ever go this
+# long without a timestamp the partial frame is dropped.
+MAX_FRAME_SIZE = 2 ** 20
+
+
+class IcomStreamParser:
+    """Split an iCOM stream into frames, only scanning newly received bytes.
+
+    Bytes are passed to ``feed`` as they are received, and each frame is
+    returned once the timestamp of the frame after it has arrived. Only
+    the incomplete frame at the end of the stream is kept, and it is
+    dropped should it grow beyond ``max_frame_size``.
+
+    Examples
+    --------
+    >>> parser = IcomStreamParser()
+    >>> for frame in parser.feed(received_bytes):  # doctest: +SKIP
+    ...     print(frame[26])
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+
+        self._buffer = bytearray()
+        self._frame_start = None
+        self._search_from = 0
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+
+        for match in DATE_PATTERN.finditer(self._buffer, self._search_from):
+            start = max(match.start() - DATE_OFFSET, 0)
+
+            if self._frame_start is not None and start > self._frame_start:
+                frames.append(bytes(self._buffer[self._frame_start : start]))
+                self._frame_start = start
+            elif self._frame_start is None:
+                self._frame_start = start
+
+        self._discard_consumed_bytes()
+
+        return frames
+
+    def _discard_consumed_bytes(self):
+        if self._frame_start is None:
+            discard_up_to = max(len(self._buffer) - DATE_OFFSET - DATE_LENGTH, 0)
+        else:
+            discard_up_to = self._frame_start
+
+        if len(self._buffer) - discard_up_to > self.max_frame_size:
+            logging.warning(  # pylint: disable = logging-fstring-interpolation
+                f"No iCOM timestamp within the last {self.max_frame_size} "
+                "bytes, dropping the incomplete frame."
+            )
+            discard_up_to = len(self._buffer) - DATE_OFFSET - DATE_LENGTH
+            self._frame_start = None
+
+        del self._buffer[0:discard_up_to]
+        if self._frame_start is not None:
+            self._frame_start -= discard_up_to
+
+        # A timestamp may be split across two receives, so the search
+        # resumes far enough back to find one which was cut short.
+        search_start = len(self._buffer) - DATE_LENGTH + 1
+        if self._frame_start is not None:
+            search_start = max(search_start, self._frame_start + DATE_OFFSET + 1)
+
+        self._search_from = max(search_start, 0)
@@ -27,6 +27,7 @@ EXTERNAL_EXPORTS = (
     "scipy.ndimage.measurements",
     "scipy.ndimage",
     "scipy.signal",
+    "scipy.spatial",
     "scipy",
     "pandas",
     "dbfread",
@@ -86,6 +87,7 @@ if "numpy" not in IMPORTABLES:
     import scipy.ndimage.measurements
     import scipy.ndimage
     import scipy.signal
+    import scipy.spatial
     import scipy
     import pandas
     import dbfread
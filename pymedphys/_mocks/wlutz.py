@@ -93,3 +93,21 @@ def create_saturated_field_func(field, level=0.9):
         return result
 
     return saturated_field
+
+
+def create_iview_image(field, size=1024):
+    """Render a field as the pixels of a ``size`` x ``size`` iView image.
+
+    The inverse of ``pymedphys._wlutz.iview.iview_image_transform``, with
+    the first and last columns, which iView images don't use, left as zero.
+    """
+    pixels_per_mm = size / 256
+
+    x = np.arange(-(size - 2) / 2, (size - 2) / 2) / pixels_per_mm
+    y = np.arange(-size / 2, size / 2) / pixels_per_mm
+    xx, yy = np.meshgrid(x, y)
+
+    img = np.zeros((size, size), dtype=np.uint16)
+    img[::-1, 1:-1] = np.round((1 - field(xx, yy)) * (2 ** 16 - 1))
+
+    return img
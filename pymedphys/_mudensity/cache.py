@@ -0,0 +1,223 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""An on-disk cache of calculated MU Density grids.
+
+Each grid is stored as an ``.npy`` file named by a key derived from a hash
+of the delivery along with every parameter of the calculation. Once the
+cache grows beyond its size budget, the least recently used grids are
+removed.
+"""
+
+import hashlib
+import os
+import pathlib
+import tempfile
+
+from pymedphys._imports import numpy as np
+
+from pymedphys import _config as pmp_config
+from pymedphys._utilities.config import get_data_directory
+
+# Increment this whenever a change to the MU Density calculation alters
+# its result, so that stale cache entries are no longer used.
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 5 * 2 ** 30  # 5 GB
+
+# Parameters which only change how the MU Density is calculated, and not
+# the result, so aren't a part of the cache key.
+UNKEYED_PARAMETERS = ("workers", "max_memory")
+
+
+def get_default_cache_directory():
+    return pmp_config.get_config_dir().joinpath("cache", "mudensity")
+
+
+def _canonical(value):
+    if value is None or isinstance(value, str):
+        return repr(value)
+
+    return repr(np.asarray(value, dtype=float).tolist())
+
+
+def mu_density_cache_key(delivery_hash, **parameters):
+    """The cache key of an MU Density calculated with the given parameters.
+
+    Parameters
+    ----------
+    delivery_hash : str
+        A hash which identifies the delivery, such as the hash of its
+        logfile or ``Delivery._content_digest()``.
+    **parameters
+        Every parameter which changes the calculated MU Density, such as
+        ``grid_resolution`` and ``leaf_pair_widths``.
+    """
+    key = hashlib.sha1()
+    key.update("v{};{};".format(CACHE_VERSION, delivery_hash).encode())
+
+    for name in sorted(parameters):
+        key.update("{}={};".format(name, _canonical(parameters[name])).encode())
+
+    return key.hexdigest()
+
+
+class MuDensityCache:
+    """A content-addressed, size-limited cache of MU Density grids.
+
+    The modification time of each file records when it was last used, and
+    the least recently used grids are removed whenever the total size of
+    the cache exceeds ``max_bytes``.
+
+    Examples
+    --------
+    >>> cache = MuDensityCache()  # doctest: +SKIP
+    >>> mu_density = cache.mudensity(delivery, grid_resolution=1)  # doctest: +SKIP
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        if directory is None:
+            directory = get_default_cache_directory()
+
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._size = None
+
+    def _path(self, key):
+        return self.directory.joinpath("{}.npy".format(key))
+
+    def get(self, key):
+        """The cached grid for ``key``, or ``None`` if it isn't cached."""
+        path = self._path(key)
+
+        try:
+            mu_density = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # A corrupt entry, such as from an interrupted write on a
+            # system without atomic renames, is recalculated.
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return mu_density
+
+    def put(self, key, mu_density):
+        path = self._path(key)
+
+        # Written to a temporary file first so that a partially written
+        # grid is never found within the cache.
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=self.directory, suffix=".npy.tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as temp_file:
+                np.save(temp_file, np.asarray(mu_density))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        if self._size is not None:
+            self._size += path.stat().st_size
+
+        self.evict()
+
+    def get_or_calculate(self, delivery_hash, calculate, **parameters):
+        """The cached grid for the delivery and parameters, calling
+        ``calculate()`` and caching its result should it not be cached."""
+        key = mu_density_cache_key(delivery_hash, **parameters)
+
+        mu_density = self.get(key)
+        if mu_density is None:
+            mu_density = calculate()
+            self.put(key, mu_density)
+
+        return mu_density
+
+    def mudensity(self, delivery, output_always_list=False, **kwargs):
+        """The same as ``delivery.mudensity(**kwargs)``, cached by the
+        contents of the delivery."""
+        parameters = {
+            key: value for key, value in kwargs.items() if key not in UNKEYED_PARAMETERS
+        }
+
+        mu_densities = self.get_or_calculate(
+            delivery._content_digest(),  # pylint: disable = protected-access
+            lambda: np.stack(delivery.mudensity(output_always_list=True, **kwargs)),
+            **parameters,
+        )
+
+        if not output_always_list and len(mu_densities) == 1:
+            return mu_densities[0]
+
+        return list(mu_densities)
+
+    def size(self):
+        if self._size is None:
+            self._size = sum(path.stat().st_size for path in self._entries())
+
+        return self._size
+
+    def evict(self):
+        """Remove the least recently used grids until the cache is within
+        its size budget."""
+        if self.size() <= self.max_bytes:
+            return
+
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            self._size -= size
+
+    def _entries(self):
+        return self.directory.glob("*.npy")
+
+
+def get_mu_density_cache(config):
+    """The MU Density cache within the logfile data directory, as set by
+    the ``mu_density.grid_cache`` section of the config."""
+    grid_cache_config = config["mu_density"].get("grid_cache", {})
+
+    directory = os.path.join(
+        get_data_directory(config),
+        grid_cache_config.get("directory", "mu_density_cache"),
+    )
+    max_bytes = int(grid_cache_config.get("max_gigabytes", 5) * 2 ** 30)
+
+    return MuDensityCache(directory, max_bytes=max_bytes)
@@ -28,6 +28,8 @@ class DeliveryMuDensity(DeliveryBase):
         leaf_pair_widths=None,
         min_step_per_pixel=None,
         output_always_list=False,
+        workers=None,
+        max_memory=None,
     ):
         if gantry_angles is None:
             gantry_angles = 0
@@ -52,6 +54,8 @@ class DeliveryMuDensity(DeliveryBase):
                     max_leaf_gap=max_leaf_gap,
                     leaf_pair_widths=leaf_pair_widths,
                     min_step_per_pixel=min_step_per_pixel,
+                    workers=workers,
+                    max_memory=max_memory,
                 )
             )
 
@@ -20,12 +20,15 @@ from pymedphys._imports import plt
 from pymedphys._utilities.constants import AGILITY
 from pymedphys._utilities.controlpoints import remove_irrelevant_control_points
 
+from .parallel import calc_mu_density_parallel
 from .plt import pcolormesh_grid
 
 __DEFAULT_LEAF_PAIR_WIDTHS = AGILITY
 __DEFAULT_GRID_RESOLUTION = 1
 __DEFAULT_MAX_LEAF_GAP = 400
 __DEFAULT_MIN_STEP_PER_PIXEL = 10
+__DEFAULT_BLOCK_SIZE = 20
+__DEFAULT_MAX_MEMORY = 2 ** 30  # 1 GB
 
 
 def calc_mu_density(
@@ -36,6 +39,9 @@ def calc_mu_density(
     max_leaf_gap=None,
     leaf_pair_widths=None,
     min_step_per_pixel=None,
+    block_size=None,
+    workers=None,
+    max_memory=None,
 ):
     """Determine the MU Density.
 
@@ -77,6 +83,21 @@ def calc_mu_density(
         The minimum number of time steps
         used per pixel for each control point. Defaults to 10.
 
+    block_size : int, optional
+        The number of consecutive control point pairs which are calculated
+        together within a single vectorised pass. Larger blocks are faster
+        but use more memory. Defaults to 20.
+
+    workers : int, optional
+        The number of processes across which the control points are split.
+        Each process calculates a partial MU Density and these are then
+        summed. Defaults to calculating within the current process.
+
+    max_memory : int, optional
+        An approximate upper bound, in bytes, on the memory used by the
+        intermediate arrays of the calculation. When ``workers`` is given
+        it is shared evenly between the workers. Defaults to 1 GB.
+
     Returns
     -------
     mu_density : numpy.ndarray
@@ -198,6 +219,12 @@ def calc_mu_density(
     if min_step_per_pixel is None:
         min_step_per_pixel = __DEFAULT_MIN_STEP_PER_PIXEL
 
+    if block_size is None:
+        block_size = __DEFAULT_BLOCK_SIZE
+
+    if max_memory is None:
+        max_memory = __DEFAULT_MAX_MEMORY
+
     divisibility_of_max_leaf_gap = np.array(max_leaf_gap / 2 / grid_resolution)
     max_leaf_gap_is_divisible = (
         divisibility_of_max_leaf_gap.astype(int) == divisibility_of_max_leaf_gap
@@ -224,28 +251,31 @@ def calc_mu_density(
 
     full_grid = get_grid(max_leaf_gap, grid_resolution, leaf_pair_widths)
 
-    mu_density = np.zeros((len(full_grid["jaw"]), len(full_grid["mlc"])))
+    if len(mu) > 1:
+        _check_leaf_pair_widths_and_jaw(jaw, leaf_pair_widths, grid_resolution)
+
+    calculation_options = {
+        "leaf_pair_widths": leaf_pair_widths,
+        "grid_resolution": grid_resolution,
+        "min_step_per_pixel": min_step_per_pixel,
+        "block_size": block_size,
+    }
 
-    for i in range(len(mu) - 1):
-        control_point_slice = slice(i, i + 2, 1)
-        current_mlc = mlc[control_point_slice, :, :]
-        current_jaw = jaw[control_point_slice, :]
-        delivered_mu = np.diff(mu[control_point_slice])
-
-        grid, mu_density_of_slice = calc_single_control_point(
-            current_mlc,
-            current_jaw,
-            delivered_mu,
-            leaf_pair_widths=leaf_pair_widths,
-            grid_resolution=grid_resolution,
-            min_step_per_pixel=min_step_per_pixel,
+    if workers is not None and workers > 1:
+        mu_density = calc_mu_density_parallel(
+            mu,
+            mlc,
+            jaw,
+            full_grid,
+            workers,
+            max_memory=max_memory // workers,
+            **calculation_options,
         )
-        full_grid_mu_density_of_slice = _convert_to_full_grid(
-            grid, full_grid, mu_density_of_slice
+    else:
+        mu_density = _calc_mu_density_batched(
+            mu, mlc, jaw, full_grid, max_memory=max_memory, **calculation_options
         )
 
-        mu_density += full_grid_mu_density_of_slice
-
     return mu_density
 
 
@@ -298,21 +328,7 @@ def calc_single_control_point(
     """
 
     leaf_pair_widths = np.array(leaf_pair_widths)
-    leaf_division = leaf_pair_widths / grid_resolution
-
-    if not np.all(leaf_division.astype(int) == leaf_division):
-        raise ValueError(
-            "The grid resolution needs to exactly divide every leaf pair width."
-        )
-
-    if (
-        not np.max(np.abs(jaw))  # pylint: disable = unneeded-not
-        <= np.sum(leaf_pair_widths) / 2
-    ):
-        raise ValueError(
-            "The jaw should not travel further out than the maximum leaf limits. "
-            f"Max travel was {np.max(np.abs(jaw))}"
-        )
+    _check_leaf_pair_widths_and_jaw(jaw, leaf_pair_widths, grid_resolution)
 
     (grid, grid_leaf_map, mlc) = _determine_calc_grid_and_adjustments(
         mlc, jaw, leaf_pair_widths, grid_resolution
@@ -508,6 +524,330 @@ def display_mu_density(
     plt.gca().invert_yaxis()
 
 
+def _check_leaf_pair_widths_and_jaw(jaw, leaf_pair_widths, grid_resolution):
+    leaf_division = leaf_pair_widths / grid_resolution
+
+    if not np.all(leaf_division.astype(int) == leaf_division):
+        raise ValueError(
+            "The grid resolution needs to exactly divide every leaf pair width."
+        )
+
+    if (
+        not np.max(np.abs(jaw))  # pylint: disable = unneeded-not
+        <= np.sum(leaf_pair_widths) / 2
+    ):
+        raise ValueError(
+            "The jaw should not travel further out than the maximum leaf limits. "
+            f"Max travel was {np.max(np.abs(jaw))}"
+        )
+
+
+def _calc_mu_density_batched(
+    mu,
+    mlc,
+    jaw,
+    full_grid,
+    leaf_pair_widths,
+    grid_resolution,
+    min_step_per_pixel,
+    block_size,
+    max_memory=__DEFAULT_MAX_MEMORY,
+):
+    """Calculate the MU Density of all control point pairs in blocks.
+
+    This gives the same result as summing ``calc_single_control_point``
+    over every pair of consecutive control points. Instead of calculating
+    each pair on its own grid and then expanding it to the full grid, the
+    pairs within a block which share the same number of time steps are
+    calculated together on the section of the full grid that bounds them.
+    Each pair is then masked to the extent of its own calculation grid and
+    summed directly into the full grid.
+    """
+    mu_density = np.zeros((len(full_grid["jaw"]), len(full_grid["mlc"])))
+
+    delivered_mu = np.diff(mu)
+    if len(delivered_mu) == 0:
+        return mu_density
+
+    leaf_centres, _ = _determine_leaf_centres(leaf_pair_widths)
+    full_grid_leaf_map = np.argmin(
+        np.abs(full_grid["jaw"][:, None] - leaf_centres[None, :]), axis=1
+    )
+
+    bounds, time_steps = _determine_segment_bounds_and_time_steps(
+        mlc,
+        jaw,
+        full_grid,
+        full_grid_leaf_map,
+        leaf_pair_widths,
+        grid_resolution,
+        min_step_per_pixel,
+    )
+
+    calculated = delivered_mu != 0
+    for block_start in range(0, len(delivered_mu), block_size):
+        block = np.arange(block_start, min(block_start + block_size, len(delivered_mu)))
+        block = block[calculated[block]]
+
+        for time_steps_of_group in np.unique(time_steps[block]):
+            segments = block[time_steps[block] == time_steps_of_group]
+
+            _accumulate_segments(
+                mu_density,
+                delivered_mu[segments],
+                mlc[segments],
+                mlc[segments + 1],
+                jaw[segments],
+                jaw[segments + 1],
+                {key: value[segments] for key, value in bounds.items()},
+                full_grid,
+                full_grid_leaf_map,
+                grid_resolution,
+                time_steps_of_group,
+                max_memory,
+            )
+
+    return mu_density
+
+
+def _determine_segment_bounds_and_time_steps(
+    mlc,
+    jaw,
+    full_grid,
+    full_grid_leaf_map,
+    leaf_pair_widths,
+    grid_resolution,
+    min_step_per_pixel,
+):
+    """Determine, for every control point pair at once, the indices of the
+    full grid covered by the grid of ``_determine_calc_grid_and_adjustments``
+    along with the time steps of ``_calc_time_steps``.
+    """
+    _, top_of_reference_leaf = _determine_leaf_centres(leaf_pair_widths)
+    grid_reference_position = _determine_reference_grid_position(
+        top_of_reference_leaf, grid_resolution
+    )
+
+    min_y = np.minimum(-jaw[:-1, 0], -jaw[1:, 0])
+    max_y = np.maximum(jaw[:-1, 1], jaw[1:, 1])
+
+    top_grid_pos = (
+        np.round((max_y - grid_reference_position) / grid_resolution)
+    ) * grid_resolution + grid_reference_position
+    bot_grid_pos = (
+        grid_reference_position
+        - (np.round((-min_y + grid_reference_position) / grid_resolution))
+        * grid_resolution
+    )
+
+    number_of_rows = len(full_grid["jaw"])
+    row_start = np.clip(
+        np.round((bot_grid_pos - full_grid["jaw"][0]) / grid_resolution).astype(int),
+        0,
+        number_of_rows - 1,
+    )
+    row_end = np.clip(
+        np.round((top_grid_pos - full_grid["jaw"][0]) / grid_resolution).astype(int),
+        -1,
+        number_of_rows - 1,
+    )
+
+    leaves = np.arange(mlc.shape[1])
+    leaves_to_be_calced = (
+        leaves[None, :] >= full_grid_leaf_map[row_start][:, None]
+    ) & (leaves[None, :] <= full_grid_leaf_map[np.maximum(row_end, 0)][:, None])
+
+    left = -mlc[:, :, 0]
+    right = mlc[:, :, 1]
+    min_x = np.min(
+        np.where(leaves_to_be_calced, np.minimum(left[:-1], left[1:]), np.inf), axis=1
+    )
+    max_x = np.max(
+        np.where(leaves_to_be_calced, np.maximum(right[:-1], right[1:]), -np.inf),
+        axis=1,
+    )
+    min_x = np.round(min_x / grid_resolution) * grid_resolution
+    max_x = np.round(max_x / grid_resolution) * grid_resolution
+
+    number_of_columns = len(full_grid["mlc"])
+    column_start = np.clip(
+        np.round((min_x - full_grid["mlc"][0]) / grid_resolution).astype(int),
+        0,
+        number_of_columns - 1,
+    )
+    column_end = np.clip(
+        np.round((max_x - full_grid["mlc"][0]) / grid_resolution).astype(int),
+        -1,
+        number_of_columns - 1,
+    )
+
+    mlc_travel = np.max(np.abs(mlc[1:] - mlc[:-1]), axis=2)
+    maximum_travel = np.maximum(
+        np.max(np.where(leaves_to_be_calced, mlc_travel, 0), axis=1),
+        np.max(np.abs(jaw[1:] - jaw[:-1]), axis=1),
+    )
+    number_of_pixels = np.ceil(maximum_travel / grid_resolution)
+    time_steps = np.maximum(number_of_pixels * min_step_per_pixel, 10)
+
+    bounds = {
+        "row_start": row_start,
+        "row_end": row_end,
+        "column_start": column_start,
+        "column_end": column_end,
+    }
+
+    return bounds, time_steps
+
+
+def _accumulate_segments(
+    mu_density,
+    delivered_mu,
+    mlc_start,
+    mlc_end,
+    jaw_start,
+    jaw_end,
+    bounds,
+    full_grid,
+    full_grid_leaf_map,
+    grid_resolution,
+    time_steps,
+    max_memory,
+):
+    """Add the MU Density of a group of control point pairs, which all
+    share the same number of time steps, into ``mu_density``.
+
+    Groups whose intermediate arrays would exceed ``max_memory`` are split
+    into smaller groups, and then into chunks of time steps.
+    """
+    in_grid = (bounds["row_end"] >= bounds["row_start"]) & (
+        bounds["column_end"] >= bounds["column_start"]
+    )
+    if not np.any(in_grid):
+        return
+
+    rows = slice(
+        np.min(bounds["row_start"][in_grid]), np.max(bounds["row_end"][in_grid]) + 1
+    )
+    columns = slice(
+        np.min(bounds["column_start"][in_grid]),
+        np.max(bounds["column_end"][in_grid]) + 1,
+    )
+
+    grid_leaf_map = full_grid_leaf_map[rows]
+    leaves = slice(np.min(grid_leaf_map), np.max(grid_leaf_map) + 1)
+    adjusted_grid_leaf_map = grid_leaf_map - leaves.start
+
+    grid = {"mlc": full_grid["mlc"][columns], "jaw": full_grid["jaw"][rows]}
+
+    # At most two arrays the size of the MLC's open fraction exist at once,
+    # along with the open fraction of the grid and its mask.
+    bytes_per_time_step = 2 * 8 * (leaves.stop - leaves.start) * len(grid["mlc"])
+    bytes_per_pair = 2 * 8 * len(grid["jaw"]) * len(grid["mlc"])
+
+    number_of_pairs = len(delivered_mu)
+    pairs_at_once = max(
+        1, max_memory // int(bytes_per_pair + time_steps * bytes_per_time_step)
+    )
+    if pairs_at_once < number_of_pairs:
+        for first_pair in range(0, number_of_pairs, pairs_at_once):
+            pairs = slice(first_pair, first_pair + pairs_at_once)
+            _accumulate_segments(
+                mu_density,
+                delivered_mu[pairs],
+                mlc_start[pairs],
+                mlc_end[pairs],
+                jaw_start[pairs],
+                jaw_end[pairs],
+                {key: value[pairs] for key, value in bounds.items()},
+                full_grid,
+                full_grid_leaf_map,
+                grid_resolution,
+                time_steps,
+                max_memory,
+            )
+        return
+
+    time_steps_at_once = max(
+        1,
+        (max_memory - number_of_pairs * bytes_per_pair)
+        // (number_of_pairs * bytes_per_time_step),
+    )
+
+    positions = {
+        "mlc": {
+            1: (-mlc_start[:, leaves, 0], -mlc_end[:, leaves, 0]),  # left
+            -1: (mlc_start[:, leaves, 1], mlc_end[:, leaves, 1]),  # right
+        },
+        "jaw": {
+            1: (-jaw_start[:, 0], -jaw_end[:, 0]),  # bot
+            -1: (jaw_start[:, 1], jaw_end[:, 1]),  # top
+        },
+    }
+
+    open_fraction = np.zeros((number_of_pairs, len(grid["jaw"]), len(grid["mlc"])))
+    for first_step in range(0, int(time_steps), time_steps_at_once):
+        steps = np.arange(first_step, min(first_step + time_steps_at_once, time_steps))
+        device_open = _calc_device_open_batched(
+            grid, positions, grid_resolution, steps, time_steps
+        )
+        mlc_open = device_open["mlc"]
+        jaw_open = device_open["jaw"]
+
+        # All of the grid rows under a given leaf share that leaf's open
+        # fraction, so the product with the jaw's open fraction, summed
+        # over time, is a matrix multiplication for each leaf.
+        for leaf in range(mlc_open.shape[2]):
+            leaf_rows = adjusted_grid_leaf_map == leaf
+            open_fraction[:, leaf_rows, :] += np.matmul(
+                np.swapaxes(jaw_open[:, :, leaf_rows], 1, 2), mlc_open[:, :, leaf, :]
+            )
+
+    open_fraction /= time_steps
+
+    row_index = np.arange(rows.start, rows.stop)
+    column_index = np.arange(columns.start, columns.stop)
+    within_row = (row_index[None, :] >= bounds["row_start"][:, None]) & (
+        row_index[None, :] <= bounds["row_end"][:, None]
+    )
+    within_column = (column_index[None, :] >= bounds["column_start"][:, None]) & (
+        column_index[None, :] <= bounds["column_end"][:, None]
+    )
+    open_fraction *= within_row[:, :, None] & within_column[:, None, :]
+
+    mu_density[rows, columns] += np.tensordot(delivered_mu, open_fraction, axes=1)
+
+
+def _calc_device_open_batched(grid, positions, grid_resolution, steps, time_steps):
+    """The open fraction of each device at the given time steps.
+
+    Within the returned arrays axis 0 is the control point pair and axis 1
+    is time.
+    """
+    device_open = {}
+    for device, value in positions.items():
+        for multiplier, (start, end) in value.items():
+            start = np.expand_dims(start, axis=1)
+            end = np.expand_dims(end, axis=1)
+            step_shape = (1, -1) + (1,) * (start.ndim - 2)
+
+            dt = (end - start) / (time_steps - 1)
+            travel = start + steps.reshape(step_shape) * dt
+
+            # The same as ``_calc_blocked_t``, rearranged so that the
+            # scaling is applied to the smaller travel and grid arrays
+            # rather than to their much larger difference.
+            scale = multiplier / grid_resolution
+            blocked = np.subtract(travel[..., None] * scale + 0.5, grid[device] * scale)
+            np.clip(blocked, 0, 1, out=blocked)
+
+            if device in device_open:
+                device_open[device] -= blocked
+            else:
+                device_open[device] = np.subtract(1, blocked, out=blocked)
+
+    return device_open
+
+
 def _calc_blocked_t(travel_diff, grid_resolution):
     blocked_t = np.ones_like(travel_diff) * np.nan
 
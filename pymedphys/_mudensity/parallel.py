@@ -0,0 +1,72 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Spread an MU Density calculation across a pool of worker processes.
+
+The control point pairs are split into contiguous chunks. Each worker
+calculates the partial MU Density of a chunk on the full grid, and the
+partial MU Densities are then summed.
+"""
+
+import functools
+import multiprocessing
+
+from pymedphys._imports import numpy as np
+
+# More chunks than workers so that a chunk of control points with a lot
+# of travel does not leave the rest of the pool idle.
+CHUNKS_PER_WORKER = 4
+
+
+def calc_mu_density_parallel(mu, mlc, jaw, full_grid, workers, **kwargs):
+    """Calculate the MU Density of chunks of control points in parallel.
+
+    Returns the same MU Density as ``_calc_mu_density_batched`` would, with
+    ``kwargs`` passed through to it within each worker.
+    """
+    mu_density = np.zeros((len(full_grid["jaw"]), len(full_grid["mlc"])))
+
+    number_of_pairs = len(mu) - 1
+    if number_of_pairs < 1:
+        return mu_density
+
+    num_chunks = int(np.min([workers * CHUNKS_PER_WORKER, number_of_pairs]))
+    boundaries = np.linspace(0, number_of_pairs, num_chunks + 1).astype(int)
+
+    # Neighbouring chunks share their boundary control point so that every
+    # control point pair is within exactly one chunk.
+    chunks = [
+        (mu[start : end + 1], mlc[start : end + 1], jaw[start : end + 1])
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+    calculate_chunk = functools.partial(_calculate_chunk, full_grid=full_grid, **kwargs)
+
+    with multiprocessing.Pool(workers) as pool:
+        # Ordered, so that the partial MU Densities are always summed in the
+        # same order.
+        for partial_mu_density in pool.imap(calculate_chunk, chunks):
+            mu_density += partial_mu_density
+
+    return mu_density
+
+
+def _calculate_chunk(chunk, full_grid, **kwargs):
+    # Imported here to avoid a circular import with the mudensity module
+    from .mudensity import _calc_mu_density_batched
+
+    mu, mlc, jaw = chunk
+
+    return _calc_mu_density_batched(mu, mlc, jaw, full_grid, **kwargs)
@@ -12,4 +12,5 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .lazy import LazyTrf
 from .trf2pandas import read_trf
@@ -0,0 +1,155 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""An on-disk cache of decoded trf logfiles, keyed by the logfile's hash.
+
+Each decoded logfile is stored as an uncompressed ``.npz`` file with one
+array per column type, so that loading an entry is little more than a read
+from disk. Float and integer columns are each stored as a single block,
+while the string columns are stored as integer codes into their unique
+values. All names are stored as unicode arrays so that an entry can be
+loaded without pickle.
+"""
+
+import os
+import pathlib
+import tempfile
+import zipfile
+
+from pymedphys._imports import numpy as np
+from pymedphys._imports import pandas as pd
+
+from pymedphys import _config as pmp_config
+from pymedphys._utilities.filehash import hash_file
+
+from .header import Header
+from .trf2pandas import read_trf
+
+# Increment this whenever a change to the decoding alters the decoded
+# result, so that stale cache entries are no longer used.
+CACHE_VERSION = 1
+
+
+def get_default_cache_directory():
+    return pmp_config.get_config_dir().joinpath("cache", "trf")
+
+
+def read_trf_cached(filepath, cache_directory=None):
+    """Read a trf logfile, using a cached decode if one exists.
+
+    The cache is keyed by the hash of the logfile's contents, so a logfile
+    which has been modified will be decoded afresh.
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        The trf logfile to read.
+    cache_directory : str or pathlib.Path, optional
+        The directory in which to store the cache. Defaults to
+        ``~/.pymedphys/cache/trf``.
+
+    Returns
+    -------
+    header : pandas.DataFrame
+    table : pandas.DataFrame
+        The same header and table as returned by ``read_trf``.
+    """
+    if cache_directory is None:
+        cache_directory = get_default_cache_directory()
+
+    cache_directory = pathlib.Path(cache_directory)
+    cache_directory.mkdir(parents=True, exist_ok=True)
+
+    cache_path = cache_directory.joinpath(
+        "{}.v{}.npz".format(hash_file(filepath), CACHE_VERSION)
+    )
+
+    try:
+        return load_cached_trf(cache_path)
+    except FileNotFoundError:
+        pass
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        # A corrupt cache entry, such as from an interrupted write on a
+        # system without atomic renames, is overwritten below.
+        pass
+
+    header, table = read_trf(filepath)
+    save_cached_trf(cache_path, header, table)
+
+    return header, table
+
+
+def save_cached_trf(cache_path, header, table):
+    cache_path = pathlib.Path(cache_path)
+
+    float_columns = [key for key, dtype in table.dtypes.items() if dtype == np.float64]
+    int_columns = [key for key, dtype in table.dtypes.items() if dtype == np.int64]
+    string_columns = [
+        key for key in table.columns if key not in float_columns + int_columns
+    ]
+
+    arrays = {
+        "header": np.array([header[key].iloc[0] for key in Header._fields]),
+        "columns": np.array(table.columns, dtype=str),
+        "index": np.array(table.index),
+        "float_columns": np.array(float_columns, dtype=str),
+        "float_values": table[float_columns].values,
+        "int_columns": np.array(int_columns, dtype=str),
+        "int_values": table[int_columns].values,
+        "string_columns": np.array(string_columns, dtype=str),
+    }
+
+    for i, key in enumerate(string_columns):
+        codes, uniques = pd.factorize(table[key])
+        arrays["string_codes_{}".format(i)] = codes.astype(np.int16)
+        arrays["string_uniques_{}".format(i)] = np.array(uniques, dtype=str)
+
+    # Written to a temporary file first so that a partially written entry
+    # is never found within the cache.
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=cache_path.parent, suffix=".npz.tmp"
+    )
+    try:
+        with os.fdopen(file_descriptor, "wb") as temp_file:
+            np.savez(temp_file, **arrays)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_cached_trf(cache_path):
+    with np.load(cache_path, allow_pickle=False) as cached:
+        header = pd.DataFrame(
+            [[str(item) for item in cached["header"]]], columns=Header._fields
+        )
+
+        columns = {}
+        for key, values in zip(cached["float_columns"], cached["float_values"].T):
+            columns[str(key)] = values
+        for key, values in zip(cached["int_columns"], cached["int_values"].T):
+            columns[str(key)] = values
+        for i, key in enumerate(cached["string_columns"]):
+            uniques = np.array(
+                [str(item) for item in cached["string_uniques_{}".format(i)]],
+                dtype=object,
+            )
+            columns[str(key)] = uniques[cached["string_codes_{}".format(i)]]
+
+        column_names = [str(key) for key in cached["columns"]]
+        table = pd.DataFrame(data=columns, columns=column_names)
+        table.index = cached["index"]
+
+    return header, table
@@ -18,6 +18,7 @@ from pymedphys._imports import numpy as np
 
 from pymedphys._base.delivery import DeliveryBase, DeliveryGeneric
 
+from .cache import read_trf_cached
 from .constants import (
     COLLIMATOR_NAME,
     GANTRY_NAME,
@@ -25,19 +26,33 @@ from .constants import (
     Y1_LEAF_BANK_NAMES,
     Y2_LEAF_BANK_NAMES,
 )
-from .trf2pandas import read_trf
+from .lazy import LazyTrf
+
+MONITOR_UNITS_NAME = "Step Dose/Actual Value (Mu)"
+
+DELIVERY_COLUMN_NAMES = (
+    [MONITOR_UNITS_NAME, GANTRY_NAME, COLLIMATOR_NAME]
+    + Y1_LEAF_BANK_NAMES
+    + Y2_LEAF_BANK_NAMES
+    + JAW_NAMES
+)
 
 
 class DeliveryLogfile(DeliveryBase):
     @classmethod
-    def from_logfile(cls, filepath):
-        _, dataframe = read_trf(filepath)
+    def from_logfile(cls, filepath, cache=False):
+        if cache:
+            _, table = read_trf_cached(filepath)
+            dataframe = table[DELIVERY_COLUMN_NAMES]
+        else:
+            with LazyTrf(filepath) as logfile:
+                dataframe = logfile.table(columns=DELIVERY_COLUMN_NAMES)
 
         return cls._from_pandas(dataframe)
 
     @classmethod
     def _from_pandas(cls: Type[DeliveryGeneric], table) -> DeliveryGeneric:
-        raw_monitor_units = table["Step Dose/Actual Value (Mu)"]
+        raw_monitor_units = table[MONITOR_UNITS_NAME]
 
         diff = np.append([0], np.diff(raw_monitor_units))
         diff[diff < 0] = 0
@@ -0,0 +1,174 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Memory-mapped trf logfiles which decode only what is asked for.
+"""
+
+import mmap
+
+from pymedphys._imports import numpy as np
+from pymedphys._imports import pandas as pd
+
+from .constants import CONFIG
+from .header import decode_header, determine_header_length
+from .table import convert_data_table, decode_rows, get_column_names
+from .trf2pandas import header_as_dataframe
+
+# The header is always found well within the start of the file.
+HEADER_SEARCH_LENGTH = 4096
+
+
+class LazyTrf:
+    """A trf logfile which is memory-mapped and decoded on access.
+
+    Only the header is parsed when the file is opened. The table is viewed
+    directly within the memory map, and columns and rows are only decoded
+    and converted when they are requested through ``table``.
+
+    Examples
+    --------
+    >>> with LazyTrf(filepath) as logfile:  # doctest: +SKIP
+    ...     print(logfile.header.field_label)
+    ...     table = logfile.table(columns=["Step Dose/Actual Value (Mu)"])
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+        self._file = open(filepath, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        self._header_length = _determine_header_length_from_start(self._mmap)
+        self._raw_header = self._mmap[0 : self._header_length]
+        self._table_view = memoryview(self._mmap)[self._header_length : :]
+
+        self._decoded_rows = None
+        self._column_names = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._get_decoded_rows())
+
+    def close(self):
+        self._decoded_rows = None
+
+        try:
+            self._table_view.release()
+            self._mmap.close()
+        except BufferError:
+            # Arrays viewing the memory map are still referenced, such as
+            # from the traceback of a table which failed to decode. The map
+            # is instead closed once those arrays are garbage collected, so
+            # that the original error is not masked.
+            pass
+        finally:
+            self._file.close()
+
+    @property
+    def raw_header(self):
+        return self._raw_header
+
+    @property
+    def header(self):
+        return decode_header(self._raw_header)
+
+    @property
+    def header_dataframe(self):
+        return header_as_dataframe(self._raw_header)
+
+    @property
+    def column_names(self):
+        self._get_decoded_rows()
+
+        return list(self._column_names)
+
+    def table(self, columns=None, rows=None):
+        """Decode the requested columns and rows into a dataframe.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            The column names to decode. Defaults to all columns.
+        rows : slice or array_like, optional
+            The rows to decode. Defaults to all rows.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The same values, columns, and time index as the matching
+            section of the table returned by ``read_trf``.
+        """
+        decoded_rows = self._get_decoded_rows()
+        column_names = self._column_names
+
+        if columns is None:
+            selected_columns = None
+            columns = column_names
+        else:
+            try:
+                selected_columns = [column_names.index(key) for key in columns]
+            except ValueError:
+                missing = [key for key in columns if key not in column_names]
+                raise ValueError(
+                    "The following columns are not within this logfile: "
+                    "{}".format(missing)
+                )
+
+        row_numbers = np.arange(len(decoded_rows))
+        if rows is not None:
+            row_numbers = row_numbers[rows]
+            decoded_rows = decoded_rows[rows]
+
+        converted_columns = convert_data_table(
+            decoded_rows,
+            column_names,
+            CONFIG["linac_state_codes"],
+            CONFIG["wedge_codes"],
+            selected_columns=selected_columns,
+        )
+
+        dataframe = pd.DataFrame(data=converted_columns, columns=columns)
+        dataframe.index = np.round(row_numbers * CONFIG["time_increment"], 2)
+
+        return dataframe
+
+    def _get_decoded_rows(self):
+        if self._decoded_rows is None:
+            decoded_rows, column_adjustment_key = decode_rows(self._table_view)
+            column_names = get_column_names(column_adjustment_key)
+
+            if len(column_names) != decoded_rows.shape[1]:
+                raise ValueError("Columns names don't agree with number of columns")
+
+            self._decoded_rows = decoded_rows
+            self._column_names = column_names
+
+        return self._decoded_rows
+
+
+def _determine_header_length_from_start(trf_contents):
+    try:
+        return determine_header_length(trf_contents[0:HEADER_SEARCH_LENGTH])
+    except StopIteration:
+        return determine_header_length(trf_contents[::])
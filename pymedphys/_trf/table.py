@@ -12,8 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List
-
 from pymedphys._imports import numpy as np
 from pymedphys._imports import pandas as pd
 
@@ -78,18 +76,11 @@ def decode_rows(
     decoded_results = []
     possible_column_adjustment_key = []
     for key, (line_grouping, linac_state_codes_column) in possible_groupings.items():
-        rows = [
-            trf_table_contents[i : i + line_grouping]
-            for i in range(0, len(trf_table_contents), line_grouping)
-        ]
-
-        result = decode_table_data(rows, line_grouping)
-        tentative_state_codes = result[  # pylint: disable = unsubscriptable-object
-            :, linac_state_codes_column
-        ]
-
-        if set(tentative_state_codes).issubset(reference_state_codes):
-            decoded_results.append(decode_table_data(rows, line_grouping))
+        result = decode_table_data(trf_table_contents, line_grouping)
+        tentative_state_codes = np.unique(result[:, linac_state_codes_column])
+
+        if np.all(np.isin(tentative_state_codes, list(reference_state_codes))):
+            decoded_results.append(result)
             possible_column_adjustment_key.append(key)
 
     if not decoded_results:
@@ -147,49 +138,46 @@ def decode_trf_table(trf_table_contents):
     if len(column_names) != number_of_columns:
         raise ValueError("Columns names don't agree with number of columns")
 
-    table_dataframe = create_dataframe(
-        decoded_rows, column_names, CONFIG["time_increment"]
+    converted_columns = convert_data_table(
+        decoded_rows, column_names, CONFIG["linac_state_codes"], CONFIG["wedge_codes"]
     )
 
-    convert_data_table(
-        table_dataframe, CONFIG["linac_state_codes"], CONFIG["wedge_codes"]
+    table_dataframe = create_dataframe(
+        converted_columns, column_names, CONFIG["time_increment"]
     )
 
     return table_dataframe
 
 
-def decode_data_item(row, group, byteorder) -> int:
-    """Converts the bytes of data items into an integer."""
-    return int.from_bytes(row[group], byteorder=byteorder)
+def decode_table_data(trf_table_contents: bytes, line_grouping):
+    """Decode the table into integer values.
 
+    The table bytes are viewed, without copying, as little-endian unsigned
+    16 bit integers with one row per ``line_grouping`` bytes.
+    """
+    number_of_columns = line_grouping // 2
 
-def decode_column(raw_table_rows: List[str], column_number: int):
-    """Decode all of the items in a given column."""
-    grouping = 2
-    i = column_number * grouping
-    group = slice(i, i + grouping)
-    byteorder = "little"
+    if line_grouping % 2 == 0:
+        return np.frombuffer(trf_table_contents, dtype="<u2").reshape(
+            (-1, number_of_columns)
+        )
 
-    column = np.array(
-        [decode_data_item(row, group, byteorder) for row in raw_table_rows]
+    # An odd line grouping leaves a trailing byte on each row which is not
+    # part of any column.
+    rows = np.frombuffer(trf_table_contents, dtype=np.uint8).reshape(
+        (-1, line_grouping)
     )
 
-    return column
-
-
-def decode_table_data(raw_table_rows: List[str], line_grouping):
-    """Decode the table into integer values."""
-
-    result = []
-    for column_number in range(0, line_grouping // 2):
-        result.append(decode_column(raw_table_rows, column_number))
-
-    return np.array(result).T
+    return (
+        np.ascontiguousarray(rows[:, : 2 * number_of_columns])
+        .view("<u2")
+        .reshape((-1, number_of_columns))
+    )
 
 
-def create_dataframe(data, column_names, time_increment):
-    """Converts the provided data into a pandas dataframe."""
-    dataframe = pd.DataFrame(data=data, columns=column_names)
+def create_dataframe(columns, column_names, time_increment):
+    """Converts the provided columns into a pandas dataframe."""
+    dataframe = pd.DataFrame(data=columns, columns=column_names)
     dataframe.index = np.round(dataframe.index * time_increment, 2)
 
     return dataframe
@@ -201,12 +189,12 @@ def convert_numbers_to_string(name, lookup, column):
     result[:] = ""
 
     for i, item in lookup.items():
-        result[column.values == int(i)] = item
+        result[column == int(i)] = item
 
     if np.any(result == ""):
         print(lookup)
         print(np.where(result == ""))
-        print(column[result == ""].values)
+        print(column[result == ""])
         unconverted_entries = np.unique(column[result == ""])
         raise Exception(
             "The conversion lookup list for converting {} is incomplete. "
@@ -219,50 +207,116 @@ def convert_numbers_to_string(name, lookup, column):
     return result
 
 
-def convert_linac_state_codes(dataframe, linac_state_codes):
-    name = "linac state"
-    key = "Linac State/Actual Value (None)"
-    dataframe[key] = convert_numbers_to_string(name, linac_state_codes, dataframe[key])
+def apply_negative(values):
+    """Convert unsigned 16 bit values into their signed equivalent.
 
+    Works on whole arrays at once, returning float64 values.
+    """
+    values = np.asarray(values)
+    negative_values = values > 2 ** 15
 
-def convert_wedge_codes(dataframe, wedge_codes):
-    name = "wedge"
-    key = "Wedge Position/Actual Value (None)"
-    dataframe[key] = convert_numbers_to_string(name, wedge_codes, dataframe[key])
+    result = np.where(negative_values, values - 2 ** 16, values).astype(np.float64)
 
+    if np.any(np.isnan(result)):
+        raise Exception("Not all column values were converted")
 
-def apply_negative(column):
-    result = np.ones_like(column).astype(np.float64) * np.nan
-    negative_values = column.values > 2 ** 15
+    return result
 
-    result[negative_values] = column[negative_values] - 2 ** 16
-    result[np.invert(negative_values)] = column[np.invert(negative_values)]
 
-    if np.any(np.isnan(result)):
-        raise Exception("Not all column values were converted")
+def negative_and_divide_by_10(values):
+    result = apply_negative(values)
+    result = result / 10
 
     return result
 
 
-def convert_applying_negative(dataframe):
+class _ConvertedTable:
+    """The columns of a decoded table, as they are converted.
+
+    All numerical conversions are undergone on a single float64 copy of the
+    selected columns, so that each conversion is a whole-array operation.
+    Columns which are never converted are left as their original integers.
+    Conversions are always defined in terms of the full table's columns, so
+    that a selected column is converted identically to when the whole table
+    is decoded.
+    """
+
+    def __init__(self, decoded_rows, column_names, selected_columns=None):
+        self.column_names = list(column_names)
+
+        if selected_columns is None:
+            self.selected_columns = np.arange(len(self.column_names))
+            self.decoded_rows = decoded_rows
+        else:
+            self.selected_columns = np.array(selected_columns, dtype=int)
+            self.decoded_rows = decoded_rows[:, self.selected_columns]
+
+        self.values = self.decoded_rows.astype(np.float64)
+        self.converted = np.zeros(len(self.selected_columns), dtype=bool)
+        self.strings = {}
+
+    def index(self, keys):
+        return np.array([self.column_names.index(key) for key in keys], dtype=int)
+
+    def _local(self, columns):
+        return np.where(np.isin(self.selected_columns, columns))[0]
+
+    def apply(self, columns, function):
+        local_columns = self._local(columns)
+        if len(local_columns) == 0:
+            return
+
+        self.values[:, local_columns] = function(self.values[:, local_columns])
+        self.converted[local_columns] = True
+
+    def apply_string_lookup(self, key, name, lookup):
+        local_columns = self._local(self.index([key]))
+        if len(local_columns) == 0:
+            return
+
+        self.strings[key] = convert_numbers_to_string(
+            name, lookup, self.decoded_rows[:, local_columns[0]]
+        )
+
+    def as_dict(self):
+        integers = self.decoded_rows.astype(np.int64)
+
+        columns = {}
+        for i, column in enumerate(self.selected_columns):
+            key = self.column_names[column]
+            if key in self.strings:
+                columns[key] = self.strings[key]
+            elif self.converted[i]:
+                columns[key] = self.values[:, i]
+            else:
+                columns[key] = integers[:, i]
+
+        return columns
+
+
+def convert_linac_state_codes(table, linac_state_codes):
+    name = "linac state"
+    key = "Linac State/Actual Value (None)"
+    table.apply_string_lookup(key, name, linac_state_codes)
+
+
+def convert_wedge_codes(table, wedge_codes):
+    name = "wedge"
+    key = "Wedge Position/Actual Value (None)"
+    table.apply_string_lookup(key, name, wedge_codes)
+
+
+def convert_applying_negative(table):
     keys = [
         "Control point/Actual Value (None)",
         "Table Isocentric/Scaled Actual (deg)",
         "Table Isocentric/Positional Error (deg)",
     ]
 
-    for key in keys:
-        dataframe[key] = apply_negative(dataframe[key])
+    table.apply(table.index(keys), apply_negative)
 
 
-def negative_and_divide_by_10(column):
-    result = apply_negative(column)
-    result = result / 10
-
-    return result
-
-
-def convert_negative_and_divide_by_10(dataframe):
+def convert_negative_and_divide_by_10(table):
     keys = [
         "Step Dose/Actual Value (Mu)",
         "Step Gantry/Scaled Actual (deg)",
@@ -271,28 +325,36 @@ def convert_negative_and_divide_by_10(dataframe):
         "Step Collimator/Positional Error (deg)",
     ]
 
-    for key in keys:
-        dataframe[key] = negative_and_divide_by_10(dataframe[key])
+    table.apply(table.index(keys), negative_and_divide_by_10)
 
 
-def convert_remaining(dataframe):
-    column_names = dataframe.columns
+def convert_remaining(table):
+    columns = np.arange(len(table.column_names))
 
-    for key in column_names[14:30]:
-        dataframe[key] = negative_and_divide_by_10(dataframe[key])
+    table.apply(columns[14:30], negative_and_divide_by_10)
 
     # Y2 leaves need to be multiplied by -1
-    for key in column_names[30:110]:
-        dataframe[key] = -negative_and_divide_by_10(dataframe[key])
+    table.apply(columns[30:110], lambda values: -negative_and_divide_by_10(values))
+
+    table.apply(columns[110::], negative_and_divide_by_10)
+
+
+def convert_data_table(
+    decoded_rows, column_names, linac_state_codes, wedge_codes, selected_columns=None
+):
+    """Convert the decoded integer table into its final units.
 
-    for key in column_names[110::]:
-        dataframe[key] = negative_and_divide_by_10(dataframe[key])
+    Returns a dictionary of columns, in the order of ``column_names``. If
+    ``selected_columns`` is provided, only those column indices are
+    converted and returned, in the order given.
+    """
+    table = _ConvertedTable(decoded_rows, column_names, selected_columns)
 
+    convert_linac_state_codes(table, linac_state_codes)
+    convert_wedge_codes(table, wedge_codes)
 
-def convert_data_table(dataframe, linac_state_codes, wedge_codes):
-    convert_linac_state_codes(dataframe, linac_state_codes)
-    convert_wedge_codes(dataframe, wedge_codes)
+    convert_applying_negative(table)
+    convert_negative_and_divide_by_10(table)
+    convert_remaining(table)
 
-    convert_applying_negative(dataframe)
-    convert_negative_and_divide_by_10(dataframe)
-    convert_remaining(dataframe)
+    return table.as_dict()
@@ -20,6 +20,7 @@
 import os
 from glob import glob
 
+from .cache import read_trf_cached
 from .trf2pandas import trf2pandas
 
 
@@ -40,7 +41,7 @@ def trf2csv_by_directory(input_directory, output_directory):
         table.to_csv(table_csv_filepath)
 
 
-def trf2csv(trf_filepath, skip_if_exists=False):
+def trf2csv(trf_filepath, skip_if_exists=False, use_cache=False):
     if not os.path.exists(trf_filepath):
         raise Exception("The provided trf filepath cannot be found.")
 
@@ -51,7 +52,10 @@ def trf2csv(trf_filepath, skip_if_exists=False):
     # Skip if conversion has already occured
     if not skip_if_exists or not os.path.exists(table_csv_filepath):
         print("Converting {}".format(trf_filepath))
-        header, table = trf2pandas(trf_filepath)
+        if use_cache:
+            header, table = read_trf_cached(trf_filepath)
+        else:
+            header, table = trf2pandas(trf_filepath)
 
         header.to_csv(header_csv_filepath)
         table.to_csv(table_csv_filepath)
@@ -74,4 +78,4 @@ def trf2csv_cli(args):
         filepaths = glob(glob_string)
 
         for filepath in filepaths:
-            trf2csv(filepath)
+            trf2csv(filepath, use_cache=args.cache)
@@ -13,7 +13,6 @@
 # limitations under the License.
 
 
-import json
 import os
 
 
@@ -50,14 +49,6 @@ def get_mu_density_parameters(config):
     return grid_resolution, ram_fraction
 
 
-def get_index(config):
-    index_filepath = os.path.join(get_data_directory(config), "index.json")
-    with open(index_filepath) as json_data_file:
-        index = json.load(json_data_file)
-
-    return index
-
-
 def get_centre(config, file_info):
     machine = file_info["logfile_header"]["machine"]
     centre = config["machine_map"][machine]["centre"]
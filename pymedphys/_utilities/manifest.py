@@ -0,0 +1,84 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""A JSON lines manifest, recording the outcome of each item of a batch job
+as it completes so that an interrupted job can be resumed.
+
+Each record is appended as a single line, flushed straight away, so that an
+interruption leaves at most a truncated final line. That line is skipped
+when the manifest is read, and is ended before any further records are
+appended.
+"""
+
+import json
+import os
+
+
+class ManifestWriter:
+    """Append records to a JSON lines manifest.
+
+    Parameters
+    ----------
+    manifest_filepath : str
+        The manifest to append to, created should it not yet exist.
+    """
+
+    def __init__(self, manifest_filepath):
+        self._file = open(manifest_filepath, "a")
+
+        if _ends_with_truncated_line(manifest_filepath):
+            self._file.write("\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_manifest(manifest_filepath):
+    """The records within a JSON lines manifest, skipping any truncated
+    line. A manifest which doesn't exist has no records."""
+    try:
+        with open(manifest_filepath) as manifest_file:
+            lines = manifest_file.readlines()
+    except FileNotFoundError:
+        return []
+
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+
+    return records
+
+
+def _ends_with_truncated_line(filepath):
+    with open(filepath, "rb") as a_file:
+        a_file.seek(0, os.SEEK_END)
+        if a_file.tell() == 0:
+            return False
+
+        a_file.seek(-1, os.SEEK_END)
+        return a_file.read(1) != b"\n"
@@ -11,3 +11,30 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+
+
+import os
+
+from .iview import batch_process
+
+
+def batch_cli(args):
+    workers = args.workers
+    if workers is None:
+        workers = os.cpu_count()
+
+    results = batch_process(
+        args.image_paths,
+        args.edge_lengths,
+        bb_diameter=args.bb_diameter,
+        penumbra=args.penumbra,
+        display_figure=False,
+        workers=workers,
+        pylinac_tol=None if args.skip_pylinac else args.pylinac_tol,
+    )
+    results.insert(0, "Image", args.image_paths)
+
+    if args.output is None:
+        print(results.to_string(index=False))
+    else:
+        results.to_csv(args.output, index=False)
@@ -43,7 +43,14 @@ def find_field_and_bb(
     penumbra=2,
     fixed_rotation=None,
     pylinac_tol=0.2,
+    initial_bb_centre=None,
 ):
+    """Find the field and the BB within it.
+
+    ``initial_bb_centre`` may be given to start the BB search from a known
+    approximate BB centre, such as the BB centre found within the previous
+    image of a gantry sweep.
+    """
     field, field_centre, field_rotation = find_field(
         x,
         y,
@@ -62,6 +69,7 @@ def find_field_and_bb(
         field_centre,
         field_rotation,
         pylinac_tol=pylinac_tol,
+        initial_bb_centre=initial_bb_centre,
     )
 
     return bb_centre, field_centre, field_rotation
@@ -15,12 +15,20 @@
 # import warnings
 
 from pymedphys._imports import numpy as np
-from pymedphys._imports import plt, scipy
+from pymedphys._imports import scipy
 
-from . import imginterp, interppoints, pylinac, reporting, utilities
+from . import imginterp, interppoints, pylinac, utilities
 
 BB_MIN_SEARCH_DIST = 2
-BB_REPEAT_TOL = 0.1
+
+# The spacing, in mm, of the grid of candidate BB centres spanning the
+# field. This needs to be well within the radius of any BB so that a
+# candidate always lands within the basin of the BB centre.
+BB_COARSE_GRID_SPACING = 1
+BB_FINE_GRID_SPACING = 0.05
+BB_GRID_REFINEMENT = 4
+BB_LOCAL_GRID_HALF_WIDTH = 2
+BB_POLISH_TOL = 0.0001
 
 
 def optimise_bb_centre(
@@ -31,16 +39,29 @@ def optimise_bb_centre(
     field_centre,
     field_rotation,
     pylinac_tol=0.2,
-    debug=True,
+    initial_bb_centre=None,
 ):
+    """Find the centre of the BB within a field.
+
+    The BB is found by a deterministic coarse-to-fine search. When an
+    ``initial_bb_centre`` is given, such as the BB centre found within the
+    previous image of a gantry sweep, the search starts around it, only
+    falling back to a search of the whole field should the BB not be found
+    nearby.
+    """
     centralised_field = utilities.create_centralised_field(
         field, field_centre, field_rotation
     )
     to_minimise_edge_agreement = create_bb_to_minimise(centralised_field, bb_diameter)
     bb_bounds = define_bb_bounds(bb_diameter, edge_lengths, penumbra)
 
-    bb_centre_in_centralised_field = bb_basinhopping(
-        to_minimise_edge_agreement, bb_bounds
+    if initial_bb_centre is not None:
+        initial_bb_centre = utilities.inverse_transform_point(
+            initial_bb_centre, field_centre, field_rotation
+        )
+
+    bb_centre_in_centralised_field = bb_coarse_to_fine_search(
+        to_minimise_edge_agreement, bb_bounds, initial_bb_centre=initial_bb_centre
     )
 
     if check_if_at_bounds(bb_centre_in_centralised_field, bb_bounds):
@@ -50,46 +71,6 @@ def optimise_bb_centre(
         bb_centre_in_centralised_field, field_centre, field_rotation
     )
 
-    verification_repeat = bb_basinhopping(to_minimise_edge_agreement, bb_bounds)
-    repeat_agreement = np.abs(verification_repeat - bb_centre_in_centralised_field)
-
-    if np.any(repeat_agreement > BB_REPEAT_TOL):
-        bb_repeated = utilities.transform_point(
-            verification_repeat, field_centre, field_rotation
-        )
-        if debug:
-            reporting.image_analysis_figure(
-                field.x,
-                field.y,
-                field.img,
-                bb_centre,
-                field_centre,
-                field_rotation,
-                bb_diameter,
-                edge_lengths,
-                penumbra,
-            )
-            plt.title("First iteration")
-
-            reporting.image_analysis_figure(
-                field.x,
-                field.y,
-                field.img,
-                bb_repeated,
-                field_centre,
-                field_rotation,
-                bb_diameter,
-                edge_lengths,
-                penumbra,
-            )
-            plt.title("Second iteration")
-            plt.show()
-        raise ValueError(
-            "BB centre not able to be consistently determined\n"
-            f"  First iteration:  {bb_centre}\n"
-            f"  Second iteration: {bb_repeated}"
-        )
-
     if not pylinac_tol is None:
         try:
             pylinac_result = pylinac.run_wlutz(
@@ -135,45 +116,148 @@ def check_if_at_bounds(bb_centre, bb_bounds):
     return any_at_bounds
 
 
-def bb_basinhopping(to_minimise, bb_bounds):
-    bb_results = scipy.optimize.basinhopping(
+def bb_coarse_to_fine_search(to_minimise, bb_bounds, initial_bb_centre=None):
+    """Find the BB centre which minimises ``to_minimise`` within ``bb_bounds``.
+
+    Regions of the field away from both the BB and the field edges are
+    flat, and so have as low a cost as the BB itself. So the candidate
+    centres of a grid spanning the bounds are first compared, all at once,
+    by their cost as a fraction of the total variance about each centre,
+    which is only small about the BB. The best candidate is then refined on
+    successively finer grids and polished with a local minimisation.
+
+    With an ``initial_bb_centre`` the grid spanning the bounds is skipped,
+    unless the best centre of a grid about the initial centre is on that
+    grid's edge or at the bounds.
+    """
+    bb_bounds = np.array(bb_bounds, dtype=float)
+
+    if initial_bb_centre is not None:
+        initial_bb_centre = np.clip(initial_bb_centre, bb_bounds[:, 0], bb_bounds[:, 1])
+        best_centre, on_edge = _grid_search_around(
+            to_minimise.radial_asymmetry,
+            initial_bb_centre,
+            BB_COARSE_GRID_SPACING,
+            bb_bounds,
+        )
+        if not on_edge and not check_if_at_bounds(best_centre, bb_bounds):
+            return _refine_bb_centre(to_minimise, best_centre, bb_bounds)
+
+    return _refine_bb_centre(
+        to_minimise, _coarse_bb_centre(to_minimise, bb_bounds), bb_bounds
+    )
+
+
+def _coarse_bb_centre(to_minimise, bb_bounds):
+    """The least radially asymmetric centre on a grid spanning the bounds."""
+    x, y = [
+        np.linspace(lower, upper, _number_of_grid_points(lower, upper))
+        for lower, upper in bb_bounds
+    ]
+    centres = _grid_of_centres(x, y)
+
+    return centres[np.argmin(to_minimise.radial_asymmetry(centres))]
+
+
+def _refine_bb_centre(to_minimise, centre, bb_bounds):
+    spacing = BB_COARSE_GRID_SPACING
+    while spacing > BB_FINE_GRID_SPACING:
+        spacing = spacing / BB_GRID_REFINEMENT
+        centre, _ = _grid_search_around(to_minimise.many, centre, spacing, bb_bounds)
+
+    # The field is linearly interpolated, so the cost is only piecewise
+    # smooth. Nelder-Mead, unlike a gradient based method, isn't stalled by
+    # the kinks between pixels.
+    bb_results = scipy.optimize.minimize(
         to_minimise,
-        [0, 0],
-        T=1,
-        niter=200,
-        niter_success=5,
-        stepsize=0.25,
-        minimizer_kwargs={"method": "L-BFGS-B", "bounds": bb_bounds},
+        centre,
+        method="Nelder-Mead",
+        options={"xatol": BB_POLISH_TOL, "fatol": 1e-12},
     )
 
-    return bb_results.x
+    return np.clip(bb_results.x, bb_bounds[:, 0], bb_bounds[:, 1])
+
+
+def _number_of_grid_points(lower, upper):
+    return int(np.ceil((upper - lower) / BB_COARSE_GRID_SPACING)) + 1
+
+
+def _grid_of_centres(x, y):
+    xx, yy = np.meshgrid(x, y)
+
+    return np.stack([np.ravel(xx), np.ravel(yy)], axis=-1)
+
+
+def _grid_search_around(costs_of_centres, centre, spacing, bb_bounds):
+    """Evaluate ``costs_of_centres`` on a small grid about ``centre``, returning
+    the best centre and whether it was on the edge of the grid."""
+    offsets = np.arange(-BB_LOCAL_GRID_HALF_WIDTH, BB_LOCAL_GRID_HALF_WIDTH + 1)
+    indices = _grid_of_centres(offsets, offsets)
+
+    centres = np.clip(centre + indices * spacing, bb_bounds[:, 0], bb_bounds[:, 1])
+    best = np.argmin(costs_of_centres(centres))
+
+    on_edge = np.any(np.abs(indices[best]) == BB_LOCAL_GRID_HALF_WIDTH)
+
+    return centres[best], on_edge
 
 
 def create_bb_to_minimise(field, bb_diameter):
     """This is a numpy vectorised version of `create_bb_to_minimise_simple`
+
+    The returned function also has a ``many`` attribute, which takes an
+    ``(N, 2)`` array of centres and returns the ``N`` costs, evaluating the
+    field at the points of every centre at once, and a ``radial_asymmetry``
+    attribute, which does the same for the cost as a fraction of the total
+    variance of the points about each centre.
     """
 
     points_to_check_edge_agreement, dist = interppoints.create_bb_points_function(
         bb_diameter
     )
+    x_at_origin, y_at_origin = points_to_check_edge_agreement([0, 0])
+
     dist_mask = np.unique(dist)[:, None] == dist[None, :]
     num_in_mask = np.sum(dist_mask, axis=1)
     mask_count_per_item = np.sum(num_in_mask[:, None] * dist_mask, axis=0)
     mask_mean_lookup = np.where(dist_mask)[0]
 
-    def to_minimise_edge_agreement(centre):
-        x, y = points_to_check_edge_agreement(centre)
+    def layer_statistics(centres):
+        centres = np.asarray(centres, dtype=float)
+        x = x_at_origin[None, :] + centres[:, 0:1]
+        y = y_at_origin[None, :] + centres[:, 1:2]
 
         results = field(x, y)
-        masked_results = results * dist_mask
-        mask_mean = np.sum(masked_results, axis=1) / num_in_mask
-        diff_to_mean_square = (results - mask_mean[mask_mean_lookup]) ** 2
-        mean_of_layers = np.sum(diff_to_mean_square[1::] / mask_count_per_item[1::]) / (
-            len(mask_mean) - 1
-        )
+        mask_mean = (results @ dist_mask.T) / num_in_mask
+        diff_to_mean_square = (results - mask_mean[:, mask_mean_lookup]) ** 2
+        mean_of_layers = np.sum(
+            diff_to_mean_square[:, 1::] / mask_count_per_item[1::], axis=1
+        ) / (len(num_in_mask) - 1)
+
+        return mean_of_layers, np.var(mask_mean, axis=1)
+
+    def to_minimise_edge_agreement_many(centres):
+        mean_of_layers, _ = layer_statistics(centres)
 
         return mean_of_layers
 
+    def radial_asymmetry(centres):
+        mean_of_layers, variance_between_layers = layer_statistics(centres)
+        total_variance = mean_of_layers + variance_between_layers
+
+        # A flat region, with no variance at all, is entirely unlike a BB.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            asymmetry = mean_of_layers / total_variance
+        asymmetry[total_variance == 0] = 1
+
+        return asymmetry
+
+    def to_minimise_edge_agreement(centre):
+        return to_minimise_edge_agreement_many(np.reshape(centre, (1, 2)))[0]
+
+    to_minimise_edge_agreement.many = to_minimise_edge_agreement_many
+    to_minimise_edge_agreement.radial_asymmetry = radial_asymmetry
+
     return to_minimise_edge_agreement
 
 
@@ -20,13 +20,17 @@ import pymedphys._vendor.pylinac.winstonlutz
 from .interppoints import (
     define_penumbra_points_at_origin,
     define_rotation_field_points_at_origin,
-    transform_penumbra_points,
-    transform_rotation_field_points,
+    transform_penumbra_points_many,
+    transform_points_many,
 )
 from .pylinac import PylinacComparisonDeviation, run_wlutz
 
-BASINHOPPING_NITER = 200
-INITIAL_ROTATION = 0
+# The spacing, in degrees, of the grid of candidate field rotations. The
+# rotation is then refined to within ROTATION_TOL degrees.
+ROTATION_GRID_SPACING = 5
+ROTATION_TOL = 0.001
+
+CENTRE_TOL = 0.0001
 
 
 def get_initial_centre(x, y, img):
@@ -83,7 +87,11 @@ def field_centre_and_rotation_refining(
         if fixed_rotation is None:
             previous_rotation = predicted_rotation
             predicted_rotation = optimise_rotation(
-                field, predicted_centre, edge_lengths, penumbra
+                field,
+                predicted_centre,
+                edge_lengths,
+                penumbra,
+                initial_rotation=previous_rotation,
             )
             try:
                 check_rotation_close(
@@ -104,6 +112,8 @@ def field_centre_and_rotation_refining(
             pass
 
     if fixed_rotation is None:
+        # Searched afresh across every rotation, rather than from the
+        # predicted rotation, so that the verification is independent of it.
         verification_rotation = optimise_rotation(
             field, predicted_centre, edge_lengths, penumbra
         )
@@ -188,51 +198,75 @@ def check_centre_close(verification_centre, predicted_centre):
         )
 
 
-def optimise_rotation(field, centre, edge_lengths, penumbra):
+def optimise_rotation(field, centre, edge_lengths, penumbra, initial_rotation=None):
+    """Find the field rotation by a deterministic coarse-to-fine search.
+
+    Without an ``initial_rotation`` the cost is first evaluated across every
+    distinguishable rotation of the field. The best rotation, or the
+    ``initial_rotation``, is then refined by a bounded search within one
+    grid spacing either side of it.
+    """
     to_minimise = create_rotation_only_minimiser(field, centre, edge_lengths, penumbra)
-    result = scipy.optimize.basinhopping(
+
+    if np.allclose(*edge_lengths, rtol=0.001, atol=0.001):
+        period = 90
+    else:
+        period = 180
+
+    if initial_rotation is None:
+        rotations = np.arange(-period / 2, period / 2, ROTATION_GRID_SPACING)
+        costs = to_minimise.many(rotations)
+        initial_rotation = rotations[np.argmin(costs)]
+
+    result = scipy.optimize.minimize_scalar(
         to_minimise,
-        INITIAL_ROTATION,
-        T=1,
-        niter=BASINHOPPING_NITER,
-        niter_success=5,
-        stepsize=90,
-        minimizer_kwargs={"method": "L-BFGS-B"},
+        bounds=(
+            initial_rotation - ROTATION_GRID_SPACING,
+            initial_rotation + ROTATION_GRID_SPACING,
+        ),
+        method="bounded",
+        options={"xatol": ROTATION_TOL},
     )
 
-    predicted_rotation = result.x[0]
+    predicted_rotation = float(result.x)
 
-    if np.allclose(*edge_lengths, rtol=0.001, atol=0.001):
-        modulo_rotation = predicted_rotation % 90
-        if modulo_rotation >= 45:
-            modulo_rotation = modulo_rotation - 90
-        return modulo_rotation
-
-    modulo_rotation = predicted_rotation % 180
-    if modulo_rotation >= 90:
-        modulo_rotation = modulo_rotation - 180
+    modulo_rotation = predicted_rotation % period
+    if modulo_rotation >= period / 2:
+        modulo_rotation = modulo_rotation - period
     return modulo_rotation
 
 
 def optimise_centre(field, initial_centre, edge_lengths, penumbra, rotation):
-    bounds = [
-        (initial_centre[0] - penumbra, initial_centre[0] + penumbra),
-        (initial_centre[1] - penumbra, initial_centre[1] + penumbra),
-    ]
+    """Find the field centre by a local search from ``initial_centre``,
+    within one penumbra width of it."""
+    bounds = np.array(
+        [
+            (initial_centre[0] - penumbra, initial_centre[0] + penumbra),
+            (initial_centre[1] - penumbra, initial_centre[1] + penumbra),
+        ]
+    )
 
-    to_minimise = create_penumbra_minimiser(field, edge_lengths, penumbra, rotation)
+    penumbra_minimiser = create_penumbra_minimiser(
+        field, edge_lengths, penumbra, rotation
+    )
+
+    def to_minimise(centre):
+        # A centre outside of the bounds costs that of the nearest centre
+        # within them, plus its distance from it. The minimum of this cost is
+        # therefore the minimum within the bounds.
+        bounded_centre = np.clip(centre, bounds[:, 0], bounds[:, 1])
+        distance_outside = np.sum(np.abs(centre - bounded_centre))
+
+        return penumbra_minimiser(bounded_centre) + distance_outside
 
-    result = scipy.optimize.basinhopping(
+    result = scipy.optimize.minimize(
         to_minimise,
         initial_centre,
-        T=1,
-        niter=BASINHOPPING_NITER,
-        niter_success=3,
-        stepsize=0.25,
-        minimizer_kwargs={"method": "L-BFGS-B", "bounds": bounds},
+        method="Nelder-Mead",
+        options={"xatol": CENTRE_TOL, "fatol": 1e-12},
     )
 
-    predicted_centre = result.x
+    predicted_centre = np.clip(result.x, bounds[:, 0], bounds[:, 1])
     return predicted_centre
 
 
@@ -252,45 +286,61 @@ def _interp_coords(coord):
 
 
 def create_penumbra_minimiser(field, edge_lengths, penumbra, rotation):
-
+    """The penumbra cost of a field centre. The returned function also has a
+    ``many`` attribute which takes an ``(N, 2)`` array of centres and
+    returns the ``N`` costs from a single sampling of the field."""
     points_at_origin = define_penumbra_points_at_origin(edge_lengths, penumbra)
 
-    def to_minimise(centre):
+    def to_minimise_many(centres):
         (
             xx_left_right,
             yy_left_right,
             xx_top_bot,
             yy_top_bot,
-        ) = transform_penumbra_points(points_at_origin, centre, rotation)
+        ) = transform_penumbra_points_many(points_at_origin, centres, rotation)
 
         left_right_interpolated = field(xx_left_right, yy_left_right)
         top_bot_interpolated = field(xx_top_bot, yy_top_bot)
 
+        left_right_flipped = left_right_interpolated[..., ::-1]
+        top_bot_flipped = top_bot_interpolated[..., ::-1, :]
+
         left_right_weighted_diff = (
             2
-            * (left_right_interpolated - left_right_interpolated[:, ::-1])
-            / (left_right_interpolated + left_right_interpolated[:, ::-1])
+            * (left_right_interpolated - left_right_flipped)
+            / (left_right_interpolated + left_right_flipped)
         )
         top_bot_weighted_diff = (
             2
-            * (top_bot_interpolated - top_bot_interpolated[::-1, :])
-            / (top_bot_interpolated + top_bot_interpolated[::-1, :])
+            * (top_bot_interpolated - top_bot_flipped)
+            / (top_bot_interpolated + top_bot_flipped)
         )
 
-        return np.sum(left_right_weighted_diff ** 2) + np.sum(
-            top_bot_weighted_diff ** 2
+        return np.sum(left_right_weighted_diff ** 2, axis=(-2, -1)) + np.sum(
+            top_bot_weighted_diff ** 2, axis=(-2, -1)
         )
 
+    def to_minimise(centre):
+        return to_minimise_many(np.reshape(centre, (1, 2)))[0]
+
+    to_minimise.many = to_minimise_many
+
     return to_minimise
 
 
 def create_rotation_only_minimiser(field, centre, edge_lengths, penumbra):
-    points_at_origin = define_rotation_field_points_at_origin(edge_lengths, penumbra)
+    """The cost of a field rotation. The returned function also has a
+    ``many`` attribute which takes ``N`` rotations and returns the ``N``
+    costs from a single sampling of the field."""
+    xx_flat, yy_flat = define_rotation_field_points_at_origin(edge_lengths, penumbra)
+
+    def to_minimise_many(rotations):
+        all_field_points = transform_points_many(xx_flat, yy_flat, centre, rotations)
+        return np.mean(field(*all_field_points) ** 2, axis=-1)
 
     def to_minimise(rotation):
-        all_field_points = transform_rotation_field_points(
-            points_at_origin, centre, rotation
-        )
-        return np.mean(field(*all_field_points) ** 2)
+        return to_minimise_many(np.ravel(rotation)[0:1])[0]
+
+    to_minimise.many = to_minimise_many
 
     return to_minimise
@@ -13,11 +13,17 @@
 # limitations under the License.
 
 
+import functools
+
 from pymedphys._imports import matplotlib
 from pymedphys._imports import numpy as np
 
 import pymedphys._utilities.createshells
 
+# The number of distinct sets of field or BB dimensions whose sampling
+# points are kept.
+TEMPLATE_CACHE_SIZE = 32
+
 
 def transform_penumbra_points(points_at_origin, centre, rotation):
     transform = translate_and_rotate_transform(centre, rotation)
@@ -39,6 +45,16 @@ def transform_penumbra_points(points_at_origin, centre, rotation):
     )
 
 
+def transform_penumbra_points_many(points_at_origin, centres, rotations):
+    """The penumbra points of each of ``N`` field centres and rotations,
+    each with a leading axis of length ``N``."""
+    xx_left_right, yy_left_right, xx_top_bot, yy_top_bot = points_at_origin
+
+    return transform_points_many(
+        xx_left_right, yy_left_right, centres, rotations
+    ) + transform_points_many(xx_top_bot, yy_top_bot, centres, rotations)
+
+
 def translate_and_rotate_transform(centre, rotation):
     transform = matplotlib.transforms.Affine2D()
     try:
@@ -52,6 +68,11 @@ def translate_and_rotate_transform(centre, rotation):
 
 
 def define_penumbra_points_at_origin(edge_lengths, penumbra):
+    return _penumbra_points_at_origin(*_template_key(edge_lengths, penumbra))
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _penumbra_points_at_origin(edge_lengths, penumbra):
     penumbra_range = np.linspace(-penumbra / 2, penumbra / 2, 11)
 
     def _each_edge(current_edge_length, orthogonal_edge_length):
@@ -71,7 +92,7 @@ def define_penumbra_points_at_origin(edge_lengths, penumbra):
     xx_left_right, yy_left_right = np.meshgrid(*edge_points_left_right)
     xx_top_bot, yy_top_bot = np.meshgrid(*edge_points_top_bot[::-1])
 
-    return xx_left_right, yy_left_right, xx_top_bot, yy_top_bot
+    return _read_only(xx_left_right, yy_left_right, xx_top_bot, yy_top_bot)
 
 
 def transform_rotation_field_points(points_at_origin, centre, rotation):
@@ -84,6 +105,11 @@ def transform_rotation_field_points(points_at_origin, centre, rotation):
 
 
 def define_rotation_field_points_at_origin(edge_lengths, penumbra):
+    return _rotation_field_points_at_origin(*_template_key(edge_lengths, penumbra))
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _rotation_field_points_at_origin(edge_lengths, penumbra):
     x_half_range = edge_lengths[0] / 2 + penumbra / 2
     y_half_range = edge_lengths[1] / 2 + penumbra / 2
 
@@ -104,7 +130,7 @@ def define_rotation_field_points_at_origin(edge_lengths, penumbra):
     xx_flat = xx_flat[np.invert(inside)]
     yy_flat = yy_flat[np.invert(inside)]
 
-    return xx_flat, yy_flat
+    return _read_only(xx_flat, yy_flat)
 
 
 def apply_transform(xx, yy, transform):
@@ -124,6 +150,23 @@ def apply_transform(xx, yy, transform):
 
 
 def create_bb_points_function(bb_diameter):
+    x, y, dist = define_bb_points_at_origin(bb_diameter)
+
+    def points_to_check(bb_centre):
+        x_shifted = x + bb_centre[0]
+        y_shifted = y + bb_centre[1]
+
+        return x_shifted, y_shifted
+
+    return points_to_check, dist
+
+
+def define_bb_points_at_origin(bb_diameter):
+    return _bb_points_at_origin(float(bb_diameter))
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _bb_points_at_origin(bb_diameter):
     max_distance = bb_diameter * 0.5
     min_distance = 0
     num_steps = 11
@@ -151,20 +194,59 @@ def create_bb_points_function(bb_diameter):
     y = np.concatenate(y)
     dist = np.concatenate(dist)
 
-    def points_to_check(bb_centre):
-        x_shifted = x + bb_centre[0]
-        y_shifted = y + bb_centre[1]
-
-        return x_shifted, y_shifted
-
-    return points_to_check, dist
+    return _read_only(x, y, dist)
 
 
 def create_centralised_field(field, centre, rotation):
-    transform = translate_and_rotate_transform(centre, rotation)
-
     def new_field(x, y):
-        x_prime, y_prime = apply_transform(x, y, transform)
+        x_prime, y_prime = transform_points(x, y, centre, rotation)
         return field(x_prime, y_prime)
 
     return new_field
+
+
+def transform_points(x, y, centre, rotation):
+    """Rotate the points ``x, y`` by ``rotation`` degrees and then translate
+    them to ``centre``, the same transform as
+    ``translate_and_rotate_transform`` but applied directly with numpy."""
+    x_transformed, y_transformed = transform_points_many(x, y, [centre], [rotation])
+
+    return x_transformed[0], y_transformed[0]
+
+
+def transform_points_many(x, y, centres, rotations):
+    """Apply each of ``N`` centres and rotations to the points ``x, y``.
+
+    ``rotations`` may also be a single rotation shared by every centre, and
+    ``centres`` a single centre shared by every rotation. Returns arrays of
+    shape ``(N,) + np.shape(x)``.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    centres = np.reshape(np.asarray(centres, dtype=float), (-1, 2))
+    rotations = np.ravel(np.radians(np.asarray(rotations, dtype=float)))
+
+    extra_dims = (1,) * x.ndim
+    cos = np.reshape(np.cos(rotations), (-1,) + extra_dims)
+    sin = np.reshape(np.sin(rotations), (-1,) + extra_dims)
+    x_centres = np.reshape(centres[:, 0], (-1,) + extra_dims)
+    y_centres = np.reshape(centres[:, 1], (-1,) + extra_dims)
+
+    x_transformed = cos * x + sin * y + x_centres
+    y_transformed = cos * y - sin * x + y_centres
+
+    return x_transformed, y_transformed
+
+
+def _template_key(edge_lengths, penumbra):
+    return tuple(float(length) for length in edge_lengths), float(penumbra)
+
+
+def _read_only(*arrays):
+    # The templates are shared between every caller, so are protected from
+    # being modified in place.
+    for array in arrays:
+        array.flags.writeable = False
+
+    return arrays
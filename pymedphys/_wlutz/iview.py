@@ -13,6 +13,9 @@
 # limitations under the License.
 
 
+import functools
+import multiprocessing
+
 from pymedphys._imports import imageio
 from pymedphys._imports import numpy as np
 from pymedphys._imports import pandas as pd
@@ -22,13 +25,29 @@ from .core import find_field_and_bb
 from .reporting import image_analysis_figure
 
 
+RESULT_COLUMNS = ["BB x", "BB y", "Field x", "Field y", "Rotation"]
+
+
 def iview_find_bb_and_field(
-    image_path, edge_lengths, bb_diameter=8, penumbra=2, display_figure=True
+    image_path,
+    edge_lengths,
+    bb_diameter=8,
+    penumbra=2,
+    display_figure=True,
+    pylinac_tol=0.2,
+    initial_bb_centre=None,
 ):
     x, y, img = iview_image_transform_from_path(image_path)
 
     bb_centre, field_centre, field_rotation = find_field_and_bb(
-        x, y, img, edge_lengths, bb_diameter, penumbra=penumbra
+        x,
+        y,
+        img,
+        edge_lengths,
+        bb_diameter,
+        penumbra=penumbra,
+        pylinac_tol=pylinac_tol,
+        initial_bb_centre=initial_bb_centre,
     )
 
     if display_figure:
@@ -47,35 +66,138 @@ def iview_find_bb_and_field(
     return bb_centre, field_centre, field_rotation
 
 
-def batch_process(
-    image_paths, edge_lengths, bb_diameter=8, penumbra=2, display_figure=True
+def iter_batch_process(
+    image_paths, edge_lengths, bb_diameter=8, penumbra=2, workers=None, pylinac_tol=0.2
 ):
-    bb_centres = []
-    field_centres = []
-    field_rotations = []
+    """Find the BB and field of each iView image, yielding the results in
+    the order the images finish.
+
+    Without ``workers`` the images are analysed in order, with the BB search
+    of each image starting from the BB centre found within the previous
+    image, as suits the images of a gantry sweep.
+
+    Yields
+    ------
+    index : int
+        The index of the image within ``image_paths``.
+    result : tuple
+        The ``(bb_centre, field_centre, field_rotation)`` of the image.
+    """
+    find_bb_and_field = functools.partial(
+        _find_bb_and_field_of_image,
+        edge_lengths=edge_lengths,
+        bb_diameter=bb_diameter,
+        penumbra=penumbra,
+        pylinac_tol=pylinac_tol,
+    )
+    indexed_image_paths = list(enumerate(image_paths))
+
+    if workers is None or workers <= 1:
+        bb_centre = None
+        for indexed_image_path in indexed_image_paths:
+            index, result = find_bb_and_field(
+                indexed_image_path, initial_bb_centre=bb_centre
+            )
+            bb_centre = result[0]
+
+            yield index, result
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(find_bb_and_field, indexed_image_paths)
+
+
+def _find_bb_and_field_of_image(
+    indexed_image_path,
+    edge_lengths,
+    bb_diameter,
+    penumbra,
+    pylinac_tol,
+    initial_bb_centre=None,
+):
+    index, image_path = indexed_image_path
+
+    result = iview_find_bb_and_field(
+        image_path,
+        edge_lengths,
+        bb_diameter=bb_diameter,
+        penumbra=penumbra,
+        display_figure=False,
+        pylinac_tol=pylinac_tol,
+        initial_bb_centre=initial_bb_centre,
+    )
 
-    for image_path in image_paths:
-        bb_centre, field_centre, field_rotation = iview_find_bb_and_field(
-            image_path,
-            edge_lengths,
-            bb_diameter=bb_diameter,
-            penumbra=penumbra,
-            display_figure=display_figure,
-        )
+    return index, result
 
-        bb_centres.append(bb_centre)
-        field_centres.append(field_centre)
-        field_rotations.append(field_rotation)
 
-        if display_figure:
+def batch_process(
+    image_paths,
+    edge_lengths,
+    bb_diameter=8,
+    penumbra=2,
+    display_figure=True,
+    workers=None,
+    pylinac_tol=0.2,
+):
+    """Find the BB and field of each of a batch of iView images.
+
+    Parameters
+    ----------
+    image_paths : list of str or pathlib.Path
+    edge_lengths : list of float
+        The expected field edge lengths, in mm.
+    bb_diameter : float, optional
+    penumbra : float, optional
+    display_figure : bool, optional
+        Whether to display a figure of each analysed image. The figures
+        are drawn once every image has been analysed.
+    workers : int, optional
+        The number of worker processes the images are spread across. By
+        default the images are analysed one after another within this
+        process.
+    pylinac_tol : float, optional
+        The tolerance, in mm, of the comparison to pylinac. ``None`` skips
+        the comparison.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        A row of results for each image, in the order of ``image_paths``.
+    """
+    image_paths = list(image_paths)
+
+    results = pd.DataFrame(
+        data=np.full((len(image_paths), len(RESULT_COLUMNS)), np.nan),
+        columns=RESULT_COLUMNS,
+    )
+
+    for index, (bb_centre, field_centre, field_rotation) in iter_batch_process(
+        image_paths,
+        edge_lengths,
+        bb_diameter=bb_diameter,
+        penumbra=penumbra,
+        workers=workers,
+        pylinac_tol=pylinac_tol,
+    ):
+        results.iloc[index] = [*bb_centre, *field_centre, field_rotation]
+
+    if display_figure:
+        for image_path, row in zip(image_paths, results.itertuples(index=False)):
+            x, y, img = iview_image_transform_from_path(image_path)
+            image_analysis_figure(
+                x,
+                y,
+                img,
+                row[0:2],
+                row[2:4],
+                row[4],
+                bb_diameter,
+                edge_lengths,
+                penumbra,
+            )
             plt.show()
 
-    data = np.concatenate(
-        [bb_centres, field_centres, np.array(field_rotations)[:, None]], axis=1
-    )
-    return pd.DataFrame(
-        data=data, columns=["BB x", "BB y", "Field x", "Field y", "Rotation"]
-    )
+    return results
 
 
 def iview_image_transform_from_path(image_path):
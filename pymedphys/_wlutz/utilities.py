@@ -15,7 +15,11 @@
 
 from pymedphys._imports import numpy as np
 
-from .interppoints import apply_transform, translate_and_rotate_transform
+from .interppoints import (
+    apply_transform,
+    transform_points,
+    translate_and_rotate_transform,
+)
 
 
 def transform_point(point, field_centre, field_rotation):
@@ -27,11 +31,16 @@ def transform_point(point, field_centre, field_rotation):
 
 
 def create_centralised_field(field, centre, rotation):
-
-    transform = translate_and_rotate_transform(centre, rotation)
-
     def new_field(x, y):
-        x_prime, y_prime = apply_transform(x, y, transform)
+        x_prime, y_prime = transform_points(x, y, centre, rotation)
         return field(x_prime, y_prime)
 
     return new_field
+
+
+def inverse_transform_point(point, field_centre, field_rotation):
+    transform = translate_and_rotate_transform(field_centre, field_rotation).inverted()
+    centralised_point = apply_transform(*point, transform)
+    centralised_point = np.array(centralised_point).tolist()
+
+    return centralised_point
@@ -220,4 +220,28 @@ def anonymise(dicom_subparsers):
         ),
     )
 
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "The number of processes to anonymise the DICOM files of a "
+            "directory across. Defaults to a single process."
+        ),
+    )
+
+    parser.add_argument(
+        "-m",
+        "--manifest_path",
+        type=str,
+        default=None,
+        help=(
+            "A file to record the outcome of anonymising each DICOM file "
+            "of a directory within. Files recorded as anonymised within "
+            "an existing manifest are skipped, allowing an interrupted "
+            "anonymisation to be resumed."
+        ),
+    )
+
     parser.set_defaults(func=anonymise_cli)
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import pymedphys._icom.listener
+import pymedphys._icom.multilistener
 
 
 def icom_cli(subparsers):
@@ -20,6 +21,7 @@ def icom_cli(subparsers):
     icom_subparsers = icom_parser.add_subparsers(dest="icom")
 
     icom_listen(icom_subparsers)
+    icom_listen_multiple(icom_subparsers)
 
     return icom_parser
 
@@ -32,3 +34,29 @@ def icom_listen(icom_subparsers):
     parser.set_defaults(
         func=pymedphys._icom.listener.listen_cli  # pylint: disable = protected-access
     )
+
+
+def icom_listen_multiple(icom_subparsers):
+    parser = icom_subparsers.add_parser(
+        "listen-multiple",
+        help=(
+            "Listen to the iCOM streams of multiple linacs from a single "
+            "process, reconnecting to each independently."
+        ),
+    )
+
+    parser.add_argument("directory")
+    parser.add_argument(
+        "ips",
+        nargs="+",
+        help="The IP address of each linac, optionally followed by ``:port``.",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=60,
+        help="The number of seconds between each logging of connection metrics.",
+    )
+    parser.set_defaults(
+        func=pymedphys._icom.multilistener.listen_multiple_cli  # pylint: disable = protected-access
+    )
@@ -16,7 +16,7 @@
 """Export DICOM objects from raw Pinnacle data.
 """
 
-from pymedphys.labs.pinnacle import export_cli
+from pymedphys.labs.pinnacle import batch_export_cli, export_cli
 
 
 def pinnacle_cli(subparsers):
@@ -26,6 +26,7 @@ def pinnacle_cli(subparsers):
     pinnacle_subparsers = pinnacle_parser.add_subparsers(dest="pinnacle")
 
     export_pinnacle(pinnacle_subparsers)
+    batch_export_pinnacle(pinnacle_subparsers)
 
     return pinnacle_parser
 
@@ -103,3 +104,66 @@ def export_pinnacle(pinnacle_subparsers):
     )
 
     parser.set_defaults(func=export_cli)
+
+
+def batch_export_pinnacle(pinnacle_subparsers):
+    parser = pinnacle_subparsers.add_parser(
+        "batch-export",
+        help="Export every plan within an archive of raw Pinnacle data to DICOM",
+    )
+
+    parser.add_argument(
+        "archive_root",
+        type=str,
+        help=(
+            "Directory containing raw Pinnacle Patient directories "
+            "(directories containing a 'Patient' file) at any depth."
+        ),
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-directory",
+        required=True,
+        help=(
+            "Directory in which to generate DICOM objects, one directory " "per plan."
+        ),
+    )
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help=("Flag to output debug information."),
+    )
+
+    parser.add_argument(
+        "-m",
+        "--modality",
+        action="append",
+        default=[],
+        help=("Modalities to export (CT exports the plans primary " "planning CT)."),
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "The number of processes to export plans across. Defaults to "
+            "the number of CPUs."
+        ),
+    )
+
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help=(
+            "File recording the outcome of each plan's export. Plans "
+            "recorded as exported are skipped. Defaults to a manifest "
+            "within the output directory."
+        ),
+    )
+
+    parser.set_defaults(func=batch_export_cli)
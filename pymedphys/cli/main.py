@@ -24,6 +24,7 @@ from .icom import icom_cli
 from .labs import labs_cli
 from .logfile import logfile_cli
 from .trf import trf_cli
+from .wlutz import wlutz_cli
 from .zenodo import zenodo_cli
 
 
@@ -47,6 +48,7 @@ def define_parser():
     icom_cli(subparsers)
     bundle_cli(subparsers)
     gui_cli(subparsers)
+    wlutz_cli(subparsers)
 
     # https://stackoverflow.com/a/20663028/3912576
     parser.add_argument(
@@ -50,6 +50,15 @@ def trf_to_csv(trf_subparsers):
         ),
     )
 
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=(
+            "Store the decoded logfiles within ``~/.pymedphys/cache/trf`` "
+            "and reuse them whenever an unchanged logfile is converted again."
+        ),
+    )
+
     parser.set_defaults(func=trf2csv_cli)
 
 
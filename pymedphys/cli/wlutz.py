@@ -0,0 +1,82 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""A command line interface for the Winston-Lutz analysis of iView images.
+"""
+
+
+from pymedphys._wlutz.cli import batch_cli
+
+
+def wlutz_cli(subparsers):
+    wlutz_parser = subparsers.add_parser(
+        "wlutz", help="Winston-Lutz analysis of iView EPID images."
+    )
+    wlutz_subparsers = wlutz_parser.add_subparsers(dest="wlutz")
+    wlutz_batch(wlutz_subparsers)
+
+    return wlutz_parser
+
+
+def wlutz_batch(wlutz_subparsers):
+    parser = wlutz_subparsers.add_parser(
+        "batch",
+        help=(
+            "Find the BB and field of each of a batch of iView images, "
+            "spread across a pool of worker processes."
+        ),
+    )
+
+    parser.add_argument(
+        "image_paths", type=str, nargs="+", help="The iView images to analyse."
+    )
+    parser.add_argument(
+        "--edge-lengths",
+        type=float,
+        nargs=2,
+        required=True,
+        help="The expected field edge lengths, in mm.",
+    )
+    parser.add_argument("--bb-diameter", type=float, default=8)
+    parser.add_argument("--penumbra", type=float, default=2)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of worker processes. Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--pylinac-tol",
+        type=float,
+        default=0.2,
+        help="The tolerance, in mm, of the comparison to pylinac.",
+    )
+    parser.add_argument(
+        "--skip-pylinac",
+        action="store_true",
+        help="Don't compare the results to pylinac.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help=(
+            "A ``.csv`` file to write the results to. By default the results "
+            "are printed."
+        ),
+    )
+
+    parser.set_defaults(func=batch_cli)
@@ -16,4 +16,4 @@
 """A Mephysto toolbox.
 """
 
-from .api import load_mephysto, load_single_item
+from .api import load_mephysto, load_mephysto_scans, load_single_item
@@ -17,7 +17,7 @@ import os
 
 from pymedphys._imports import numpy as np
 
-from .core import pull_mephysto_data, pull_mephysto_item, pull_mephysto_number
+from .core import mephysto_scan_data, mephysto_scan_items, parse_mephysto
 from .mcc2csv import file_output
 
 
@@ -32,26 +32,31 @@ def load_single_item(filepath, index):
     )
 
 
+def load_mephysto_scans(filepath):
+    """Input the filepath of a mephysto .mcc file and return a list with a
+    dictionary for each scan, holding the scan's parameters and data. The
+    file is read and parsed once.
+    """
+    with open(filepath) as file_pointer:
+        return parse_mephysto(file_pointer)
+
+
 def load_mephysto(filepath, output_to_file=False, output_directory=None, sort=True):
     """Input the filepath of a mephysto .mcc file and return the data of the
     scans in four lists, distance, relative_dose, scan_curvetype, and
     scan_depth. Each respective element in these lists corresponds to an
     individual scan.
     """
-    # Open the file and store the contents in file_contents
-    with open(filepath) as file_pointer:
-        file_contents = np.array(file_pointer.readlines())
+    scans = load_mephysto_scans(filepath)
 
-    # Use the functions defined within mccread.py to pull the desired data
-    distance, relative_dose = pull_mephysto_data(file_contents)
-    scan_curvetype = pull_mephysto_item("SCAN_CURVETYPE", file_contents)
-    scan_depth = pull_mephysto_number("SCAN_DEPTH", file_contents)
+    distance, relative_dose = mephysto_scan_data(scans)
+    scan_curvetype = mephysto_scan_items("SCAN_CURVETYPE", scans)
+    scan_depth = mephysto_scan_items("SCAN_DEPTH", scans).astype(float)
 
-    # Convert python lists into numpy arrays for easier use
-    distance = np.array(distance)
-    relative_dose = np.array(relative_dose)
-    scan_curvetype = np.array(scan_curvetype)
-    scan_depth = np.array(scan_depth)
+    # Convert python lists into numpy arrays for easier use. As the scans
+    # differ in length these are arrays of arrays.
+    distance = _array_of_scans(distance)
+    relative_dose = _array_of_scans(relative_dose)
 
     # If the user requests to sort the data (which is default) the loaded
     # mephysto files are organised so that PDDs are first, then inplane
@@ -97,3 +102,11 @@ def load_mephysto(filepath, output_to_file=False, output_directory=None, sort=Tr
         )
 
     return distance, relative_dose, scan_curvetype, scan_depth
+
+
+def _array_of_scans(scans):
+    array = np.empty(len(scans), dtype=object)
+    for i, scan in enumerate(scans):
+        array[i] = scan
+
+    return array
@@ -16,120 +16,94 @@ import re
 
 from pymedphys._imports import numpy as np
 
+BEGIN_SCAN = re.compile(r"\tBEGIN_SCAN\s\s\d+$")
+END_SCAN = re.compile(r"\tEND_SCAN\s\s\d+$")
 
-def find_scan_index(file_contents):
-    """Searches through the mephysto file for where the BEGIN_SCAN and END_SCAN
-    appear. This region contains all of the information for a given scan within
-    the mephysto file. Returns a list of ranges which span each scan region.
-    """
-    # Find the positions of all BEGIN_SCAN
-    # Demo of match -- https://regex101.com/r/lR4pS2/2
-    # Demo of ignoring "BEGIN_SCAN_DATA" -- https://regex101.com/r/lR4pS2/4
-    # Basic guide to regular expressions (regex):
-    #    http://www.regular-expressions.info/quickstart.html
-    begin_scan_index = np.array(
-        [
-            i
-            for i, item in enumerate(file_contents)
-            if re.search(r"^\tBEGIN_SCAN\s\s\d+$", item)
-        ]
-    ).astype(int)
-
-    # Find the positions of all END_SCAN
-    # Regex demo here -- https://regex101.com/r/lR4pS2/3
-    end_scan_index = np.array(
-        [
-            i
-            for i, item in enumerate(file_contents)
-            if re.search(r"^\tEND_SCAN\s\s\d+$", item)
-        ]
-    ).astype(int)
-
-    # Convert the indices into the range type allowing for easy looping
-    scan_index = [
-        range(begin_scan_index[i] + 1, end_scan_index[i])
-        for i in range(len(begin_scan_index))
-    ]
-
-    return scan_index
-
-
-def find_data_index(file_contents):
-    """Searches through the mephysto file for where the BEGIN_DATA and END_DATA
-    appear. This region contains only the raw data in column format. Returns a
-    list of ranges which span each scan region.
-    """
-    # Find the positions of BEGIN_DATA
-    # Demo of match -- https://regex101.com/r/lR4pS2/5
-    begin_data_index = np.array(
-        [
-            i
-            for i, item in enumerate(file_contents)
-            if re.search(r"^\t\tBEGIN_DATA$", item)
-        ]
-    ).astype(int)
-
-    # Find the positions of END_DATA
-    # Demo of match -- https://regex101.com/r/lR4pS2/6
-    end_data_index = np.array(
-        [
-            i
-            for i, item in enumerate(file_contents)
-            if re.search(r"^\t\tEND_DATA$", item)
-        ]
-    ).astype(int)
-
-    # Convert the indices into the range type allowing for easy looping
-    data_index = [
-        range(begin_data_index[i] + 1, end_data_index[i])
-        for i in range(len(begin_data_index))
-    ]
-
-    return data_index
 
+def parse_mephysto(file_contents):
+    """Index every scan within the mephysto file contents in a single pass
+    over its lines. Returns a list with a dictionary for each scan, holding
+    the scan's parameters, keyed by their label, and the scan's data columns
+    as a numpy array under "data".
 
-def pull_mephysto_item(string, file_contents):
-    """Steps through each scan region searching for a mephysto parameter that
-    matches the requested string. Returns an array filled with the results for
-    all scans that have a match. If a scan does not have a parameter matching
-    the request then np.nan is returned.
+    A label which appears more than once within a scan is recorded within
+    the scan's "duplicated_parameters".
     """
-    scan_index = find_scan_index(file_contents)
+    scans = []
+    scan = None
+    data_rows = None
+
+    for line in file_contents:
+        line = line.rstrip("\n")
+
+        if data_rows is not None:
+            if line == "\t\tEND_DATA":
+                scan["data"] = np.array(data_rows, dtype=float)
+                data_rows = None
+            else:
+                data_rows.append(line.split())
+
+        elif scan is None:
+            if line.startswith("\tBEGIN_SCAN") and BEGIN_SCAN.match(line):
+                scan = {"parameters": {}, "duplicated_parameters": set(), "data": None}
+
+        elif line.startswith("\tEND_SCAN") and END_SCAN.match(line):
+            scans.append(scan)
+            scan = None
 
-    # Format the input string for use in a regex search
-    string_test = re.escape(string)
+        elif line == "\t\tBEGIN_DATA":
+            data_rows = []
 
+        elif line.startswith("\t\t") and not line.startswith("\t\t\t"):
+            label, equals, value = line[2:].partition("=")
+            if not equals:
+                continue
+
+            if label in scan["parameters"]:
+                scan["duplicated_parameters"].add(label)
+            scan["parameters"][label] = value
+
+    return scans
+
+
+def mephysto_scan_items(string, scans):
+    """Returns an array filled with the value of the mephysto parameter that
+    matches the requested string for each of the parsed scans. If a scan does
+    not have a parameter matching the request then np.nan is returned.
+    """
     result = []
-    # Loop over each scan index searching for requested parameter
-    for index in scan_index:
-        # See if any parameters match within this scan
-        match = np.array(
-            [
-                re.match(r"^\t\t" + string_test + "=(.*)$", item) is not None
-                for item in file_contents[index]
-            ]
-        )
-
-        # If there is a single match then return the result
-        if np.sum(match) == 1:
-            relevant_line = file_contents[index][match][0]
-            # Return the value that is after the equal sign
-            # Example -- https://regex101.com/r/lR4pS2/7
-            result.append(
-                re.search(r"^\t\t" + string_test + "=(.*)$", relevant_line).group(1)
-            )
-
-        # If there is no matches return np.nan
-        elif np.sum(match) == 0:
-            result.append(np.nan)
-
-        # If there is more than one match raise an error
-        else:
+    for scan in scans:
+        if string in scan["duplicated_parameters"]:
             raise Exception("More than one item has this label")
 
+        result.append(scan["parameters"].get(string, np.nan))
+
     return np.array(result)
 
 
+def mephysto_scan_data(scans):
+    """Returns the distance and relative dose, the first two data columns, of
+    each of the parsed scans.
+    """
+    for scan in scans:
+        if scan["data"] is None:
+            raise ValueError("A scan within this mephysto file has no data")
+
+    distance = [scan["data"][:, 0] for scan in scans]
+    relative_dose = [scan["data"][:, 1] for scan in scans]
+
+    return distance, relative_dose
+
+
+def pull_mephysto_item(string, file_contents):
+    """Searches each scan region for a mephysto parameter that matches the
+    requested string. Returns an array filled with the results for all scans
+    that have a match. If a scan does not have a parameter matching the
+    request then np.nan is returned.
+    """
+    return mephysto_scan_items(string, parse_mephysto(file_contents))
+
+
 def pull_mephysto_number(string, file_contents):
     """Pulls data using pull_mephysto_item and returns the result to the user
     as a float.
@@ -140,47 +114,7 @@ def pull_mephysto_number(string, file_contents):
 
 def pull_mephysto_data(file_contents):
     """Pull the distance and relative dose from the mephysto file contents.
-    Will only be able to return data if the data is stored in two columns. Some
-    mephysto scans use three or more columns, for these this function will have
-    to be updated.
+    Only the first two data columns are returned for scans which store three
+    or more columns.
     """
-    scan_index = find_scan_index(file_contents)
-    data_index = find_data_index(file_contents)
-
-    # Confirm that each data index is within the expected scan index. Raise an
-    # error if it is not.
-    for i in range(len(scan_index)):  # pylint: disable = consider-using-enumerate
-        assert (scan_index[i][0] < data_index[i][0]) & (
-            scan_index[i][-1] > data_index[i][-1]
-        )
-
-    distance = []
-    # Loop through the data index and return all of the first column
-    for index in data_index:
-        # Demo of regex -- https://regex101.com/r/lR4pS2/10
-        distance.append(
-            np.array(
-                [
-                    re.search(
-                        r"^\t\t\t([-+]?\d+\.\d+)\t\t(\d+\.\d+E[-+]?\d+)", item
-                    ).group(1)
-                    for item in file_contents[index]
-                ]
-            ).astype(float)
-        )
-
-    relative_dose = []
-    # Loop through the data index and return all of the second column
-    for index in data_index:
-        relative_dose.append(
-            np.array(
-                [
-                    re.search(
-                        r"^\t\t\t([-+]?\d+\.\d+)\t\t(\d+\.\d+E[-+]?\d+)", item
-                    ).group(2)
-                    for item in file_contents[index]
-                ]
-            ).astype(float)
-        )
-
-    return distance, relative_dose
+    return mephysto_scan_data(parse_mephysto(file_contents))
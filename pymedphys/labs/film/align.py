@@ -15,17 +15,262 @@
 
 from pymedphys._imports import numpy as np
 
+import scipy.ndimage
 from scipy.interpolate import RegularGridInterpolator
-from scipy.optimize import basinhopping
+from scipy.optimize import basinhopping, minimize
 
 import skimage
 import skimage.color.adapt_rgb
 import skimage.filters
 
+# The coarsest level of the image pyramid is downsampled until it is no
+# smaller than this many pixels along either axis.
+COARSEST_LEVEL_PIXELS = 64
+
+# The most rotations which are tried when searching for the initial
+# alignment at the coarsest level of the image pyramid.
+MAX_ROTATIONS_SEARCHED = 121
+
+# How closely the alignment is refined at each level of the image pyramid,
+# as a fraction of a pixel.
+REFINEMENT_TOLERANCE = 0.01
+
 
 def align_images(
     ref_axes, ref_image, moving_axes, moving_image, max_shift=np.inf, max_rotation=30
 ):
+    """Find the shift and rotation which aligns the moving image to the
+    reference image.
+
+    The Scharr edges of both images are aligned over an image pyramid.
+    At the coarsest level each rotation within ``max_rotation`` is tried,
+    with the shift of each found by an FFT cross-correlation. The best of
+    these is then refined by a local minimisation at each finer level, up
+    to the full resolution images.
+
+    Parameters
+    ----------
+    ref_axes : tuple of numpy.ndarray
+        The ``(x, y)`` coordinates of the reference image's pixels.
+    ref_image : numpy.ndarray
+        The reference image, indexed by ``[x, y]``.
+    moving_axes : tuple of numpy.ndarray
+        The ``(x, y)`` coordinates of the moving image's pixels.
+    moving_image : numpy.ndarray
+        The image to be aligned to the reference image.
+    max_shift : float, optional
+        The largest shift, along either axis, to be considered.
+    max_rotation : float, optional
+        The largest rotation, in degrees, to be considered.
+
+    Returns
+    -------
+    x_shift, y_shift, angle : float
+        The alignment, such that ``shift_and_rotate(moving_axes, ref_axes,
+        moving_image, x_shift, y_shift, angle)`` lines up with the
+        reference image.
+    """
+    if not (_is_evenly_spaced(ref_axes) and _is_evenly_spaced(moving_axes)):
+        return align_images_with_basinhopping(
+            ref_axes, ref_image, moving_axes, moving_image, max_shift, max_rotation
+        )
+
+    ref_pyramid = _image_pyramid(ref_axes, scharr_gray(ref_image))
+    moving_pyramid = _image_pyramid(moving_axes, scharr_gray(moving_image))
+
+    bounds = np.array(
+        [
+            (-max_shift, max_shift),
+            (-max_shift, max_shift),
+            (-max_rotation, max_rotation),
+        ]
+    )
+
+    # The images may differ in resolution, and so in the depth of their
+    # pyramids. Each reference level is paired with the moving level of the
+    # nearest pixel size, so that the refinement always finishes at the full
+    # resolution of the reference image.
+    level_pairs = [
+        (ref_level, _nearest_level(moving_pyramid, ref_level))
+        for ref_level in ref_pyramid[::-1]
+    ]
+
+    alignment = _search_for_initial_alignment(*level_pairs[0], max_shift, max_rotation)
+
+    # The edge images are only piecewise linear once interpolated, so a
+    # simplex search, which doesn't rely on gradients, is used to refine the
+    # alignment. It searches in steps of a pixel's movement at each level.
+    for ref_level, moving_level in level_pairs:
+        steps = _pixel_steps(ref_level)
+        result = minimize(
+            _stepped_alignment_cost,
+            np.zeros(3),
+            args=(alignment, steps, bounds, ref_level, moving_level),
+            method="Nelder-Mead",
+            options={
+                "initial_simplex": np.vstack([np.zeros(3), np.eye(3)]),
+                "xatol": REFINEMENT_TOLERANCE,
+                "fatol": np.inf,
+            },
+        )
+        alignment = np.clip(alignment + result.x * steps, bounds[:, 0], bounds[:, 1])
+
+    x_shift, y_shift, angle = alignment
+
+    return x_shift, y_shift, angle
+
+
+def _is_evenly_spaced(axes):
+    for span in axes:
+        if len(span) < 2:
+            return False
+
+        steps = np.diff(span)
+        if steps[0] <= 0 or not np.allclose(steps, steps[0]):
+            return False
+
+    return True
+
+
+def _image_pyramid(axes, image):
+    """Halve the resolution of the image, by averaging each 2x2 block of
+    pixels, until the coarsest level is reached."""
+    x_span, y_span = [np.asarray(span, dtype=float) for span in axes]
+    pyramid = [((x_span, y_span), image)]
+
+    while min(np.shape(image)) >= 2 * COARSEST_LEVEL_PIXELS:
+        x_size, y_size = [length // 2 * 2 for length in np.shape(image)]
+        image = image[:x_size, :y_size]
+        image = image.reshape(x_size // 2, 2, y_size // 2, 2).mean(axis=(1, 3))
+
+        x_span = x_span[:x_size].reshape(-1, 2).mean(axis=1)
+        y_span = y_span[:y_size].reshape(-1, 2).mean(axis=1)
+
+        pyramid.append(((x_span, y_span), image))
+
+    return pyramid
+
+
+def _pixel_size(level):
+    axes, _ = level
+    return np.mean([span[1] - span[0] for span in axes])
+
+
+def _nearest_level(pyramid, level):
+    """The level of the pyramid with the pixel size nearest to that of the
+    given level, compared on a log scale."""
+    pixel_size = _pixel_size(level)
+    log_ratios = [np.abs(np.log(_pixel_size(other) / pixel_size)) for other in pyramid]
+
+    return pyramid[int(np.argmin(log_ratios))]
+
+
+def _aligned_image(moving_level, ref_axes, shifts, angle):
+    """The same as ``shift_and_rotate``, for evenly spaced axes."""
+    (move_x, move_y), moving_image = moving_level
+    x_span, y_span = ref_axes
+    x_shift, y_shift = shifts
+
+    radians = -angle * np.pi / 180
+    x = (x_span - x_shift)[:, None]
+    y = (y_span - y_shift)[None, :]
+
+    x_index = (np.cos(radians) * x + np.sin(radians) * y - move_x[0]) / (
+        move_x[1] - move_x[0]
+    )
+    y_index = (-np.sin(radians) * x + np.cos(radians) * y - move_y[0]) / (
+        move_y[1] - move_y[0]
+    )
+
+    return scipy.ndimage.map_coordinates(
+        moving_image, (x_index, y_index), order=1, mode="constant", cval=0
+    )
+
+
+def _alignment_cost(inputs, ref_level, moving_level):
+    ref_axes, ref_edge_filtered = ref_level
+    interpolated = _aligned_image(moving_level, ref_axes, inputs[0:2], inputs[2])
+
+    return np.sum((interpolated - ref_edge_filtered) ** 2) - np.sum(interpolated)
+
+
+def _stepped_alignment_cost(
+    pixel_steps, alignment, steps, bounds, ref_level, moving_level
+):
+    inputs = np.clip(alignment + pixel_steps * steps, bounds[:, 0], bounds[:, 1])
+
+    return _alignment_cost(inputs, ref_level, moving_level)
+
+
+def _pixel_steps(ref_level):
+    """The shifts and rotation which each move the image by a pixel, with
+    the rotation moving the edge of the image by a pixel."""
+    _, ref_image = ref_level
+    pixel_size = _pixel_size(ref_level)
+
+    radius_in_pixels = np.hypot(*np.shape(ref_image)) / 2
+    rotation_step = np.degrees(1 / radius_in_pixels)
+
+    return np.array([pixel_size, pixel_size, rotation_step])
+
+
+def _search_for_initial_alignment(ref_level, moving_level, max_shift, max_rotation):
+    """Try each rotation, a pixel's movement at the image's edge apart,
+    finding the shift of each by cross-correlating the rotated moving
+    image with the reference image."""
+    ref_axes, ref_image = ref_level
+    x_span, y_span = ref_axes
+    pixel_size = np.array([x_span[1] - x_span[0], y_span[1] - y_span[0]])
+
+    rotation_step = max(
+        _pixel_steps(ref_level)[2], 2 * max_rotation / (MAX_ROTATIONS_SEARCHED - 1)
+    )
+    angles = np.arange(0, max_rotation + rotation_step / 2, rotation_step)
+    angles = np.unique(np.concatenate([-angles[::-1], angles]))
+    angles = np.clip(angles, -max_rotation, max_rotation)
+
+    # Zero padded so that the cross-correlation doesn't wrap around.
+    padded_shape = [2 * length for length in np.shape(ref_image)]
+    ref_fft = np.fft.rfft2(ref_image, s=padded_shape)
+
+    pixel_shifts = [
+        np.fft.fftfreq(length, 1 / length)[:, None] for length in padded_shape
+    ]
+    out_of_bounds = (np.abs(pixel_shifts[0] * pixel_size[0]) > max_shift) | (
+        np.abs(pixel_shifts[1].T * pixel_size[1]) > max_shift
+    )
+
+    best_cost = np.inf
+    best_alignment = np.zeros(3)
+    for angle in angles:
+        rotated = _aligned_image(moving_level, ref_axes, (0, 0), angle)
+
+        cross_correlation = np.fft.irfft2(
+            ref_fft * np.conj(np.fft.rfft2(rotated, s=padded_shape)), s=padded_shape
+        )
+        cross_correlation[out_of_bounds] = -np.inf
+
+        peak = np.unravel_index(np.argmax(cross_correlation), padded_shape)
+        shifts = [
+            pixel_shifts[axis].ravel()[peak[axis]] * pixel_size[axis]
+            for axis in range(2)
+        ]
+
+        alignment = np.array([shifts[0], shifts[1], angle])
+        cost = _alignment_cost(alignment, ref_level, moving_level)
+        if cost < best_cost:
+            best_cost = cost
+            best_alignment = alignment
+
+    return best_alignment
+
+
+def align_images_with_basinhopping(
+    ref_axes, ref_image, moving_axes, moving_image, max_shift=np.inf, max_rotation=30
+):
+    """Align the images by a global minimisation over the full resolution
+    images. This is much slower than ``align_images``, though also
+    supports unevenly spaced axes."""
     ref_edge_filtered = scharr_gray(ref_image)
     moving_edge_filtered = scharr_gray(moving_image)
 
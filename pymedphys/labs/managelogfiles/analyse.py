@@ -16,6 +16,7 @@
 """Analyse logfiles.
 """
 
+import functools
 import json
 import os
 import traceback
@@ -24,24 +25,25 @@ from pymedphys._imports import numpy as np
 from pymedphys._imports import plt
 
 import pymedphys
+from pymedphys._mudensity.cache import get_mu_density_cache
 from pymedphys._utilities.config import (
     get_cache_filepaths,
     get_centre,
     get_filepath,
-    get_index,
     get_mu_density_parameters,
     get_sql_servers,
     get_sql_servers_list,
 )
 
+from .store import get_index
 
-def analyse_single_hash(index, config, filehash, cursors):
-    field_id_key_map = get_field_id_key_map(index)
+
+def analyse_single_hash(index, config, filehash, cursors, cache=None):
     logfile_filepath = get_filepath(index, config, filehash)
     print(logfile_filepath)
 
     results = get_logfile_mosaiq_results(
-        index, config, field_id_key_map, filehash, cursors, grid_resolution=5 / 3
+        index, config, filehash, cursors, grid_resolution=5 / 3, cache=cache
     )
 
     comparison = calc_comparison(results[2], results[3])
@@ -61,10 +63,13 @@ def load_comparisons_from_cache(config):
 
     comparisons = np.array([comparison_storage[file_hash] for file_hash in file_hashes])
 
-    index = get_index(config)
-    file_paths_worst_first = np.array(
-        [get_filepath_from_hash(config, index, file_hash) for file_hash in file_hashes]
-    )
+    with get_index(config) as index:
+        file_paths_worst_first = np.array(
+            [
+                get_filepath_from_hash(config, index, file_hash)
+                for file_hash in file_hashes
+            ]
+        )
 
     sort_ref = np.argsort(comparisons)[::-1]
 
@@ -75,20 +80,6 @@ def load_comparisons_from_cache(config):
     return file_hashes, comparison_storage, file_paths_worst_first
 
 
-def get_field_id_key_map(index):
-    field_id_key_map = dict()
-
-    for key, value in index.items():
-        if not value["delivery_details"]["qa_mode"]:
-            field_id = value["delivery_details"]["field_id"]
-            if field_id not in field_id_key_map:
-                field_id_key_map[field_id] = []
-
-            field_id_key_map[field_id].append(key)
-
-    return field_id_key_map
-
-
 def random_uncompared_logfiles(index, config, compared_hashes):
     index_set = set(index.keys())
     comparison_set = set(compared_hashes)
@@ -120,24 +111,37 @@ def random_uncompared_logfiles(index, config, compared_hashes):
     return file_hashes_vmat[shuffle_index], vmat_filepaths[shuffle_index]
 
 
-def mudensity_comparisons(config, plot=True, new_logfiles=False):
+def mudensity_comparisons(config, plot=True, new_logfiles=False, use_cache=True):
+    """Compare the logfile and Mosaiq MU Densities of the indexed logfiles.
+
+    With ``new_logfiles`` only logfiles which haven't yet been compared are
+    calculated, otherwise the previously compared logfiles are checked
+    against their stored comparisons. Each comparison is stored as soon as
+    it is calculated, so that an interrupted run can be resumed. With
+    ``use_cache`` each MU Density is stored within the MU Density cache, so
+    that only new logfiles, or changed Mosaiq plans, are calculated again.
+    """
     (comparison_storage_filepath, comparison_storage_scratch) = get_cache_filepaths(
         config
     )
 
     grid_resolution, _ = get_mu_density_parameters(config)
 
-    index = get_index(config)
-    field_id_key_map = get_field_id_key_map(index)
+    if use_cache:
+        cache = get_mu_density_cache(config)
+    else:
+        cache = None
 
     (file_hashes, comparisons, _) = load_comparisons_from_cache(config)
 
-    if new_logfiles:
-        file_hashes, _ = random_uncompared_logfiles(index, config, file_hashes)
-
     sql_servers_list = get_sql_servers_list(config)
 
-    with pymedphys.mosaiq.connect(sql_servers_list) as cursors:
+    with get_index(config) as index, pymedphys.mosaiq.connect(
+        sql_servers_list
+    ) as cursors:
+        if new_logfiles:
+            file_hashes, _ = random_uncompared_logfiles(index, config, file_hashes)
+
         for file_hash in file_hashes:
 
             try:
@@ -162,10 +166,10 @@ def mudensity_comparisons(config, plot=True, new_logfiles=False):
                     results = get_logfile_mosaiq_results(
                         index,
                         config,
-                        field_id_key_map,
                         file_hash,
                         cursors,
                         grid_resolution=grid_resolution,
+                        cache=cache,
                     )
                     new_comparison = calc_comparison(results[2], results[3])
 
@@ -212,40 +216,58 @@ def mudensity_comparisons(config, plot=True, new_logfiles=False):
                 print(traceback.format_exc())
 
 
-def mu_density_from_delivery_data(delivery_data: pymedphys.Delivery, grid_resolution=1):
+def mu_density_from_delivery_data(
+    delivery_data: pymedphys.Delivery, grid_resolution=1, cache=None
+):
     grid_xx, grid_yy = pymedphys.mudensity.grid(grid_resolution=grid_resolution)
-    mu_density = delivery_data.mudensity(grid_resolution=grid_resolution)
+
+    if cache is None:
+        mu_density = delivery_data.mudensity(grid_resolution=grid_resolution)
+    else:
+        mu_density = cache.mudensity(delivery_data, grid_resolution=grid_resolution)
 
     return grid_xx, grid_yy, mu_density
 
 
-def find_consecutive_logfiles(field_id_key_map, field_id, filehash, index):
-    keys = np.array(field_id_key_map[field_id])
+def logfile_mu_density(filepath, grid_resolution=1):
+    logfile_delivery_data = pymedphys.Delivery.from_logfile(filepath)
 
-    times = np.array([index[key]["local_time"] for key in keys]).astype(np.datetime64)
+    return logfile_delivery_data.mudensity(grid_resolution=grid_resolution)
 
-    sort_reference = np.argsort(times)
-    keys = keys[sort_reference]
-    times = times[sort_reference]
 
-    hours_4 = np.array(60 * 60 * 4).astype(np.timedelta64)
+def find_consecutive_logfiles(index, filehash):
+    """The non-QA logfiles of the same field delivered within 4 hours of
+    the given logfile, looked up from the logfile index's field ID index."""
+    return index.consecutive_filehashes(filehash)
 
-    delivery_time = np.array(index[filehash]["local_time"]).astype(np.datetime64)
-    within_4_hours_reference = np.abs(delivery_time - times) < hours_4
-    within_4_hours = keys[within_4_hours_reference].tolist()
 
-    return within_4_hours
+def calc_and_merge_logfile_mudensity(
+    filepaths, grid_resolution=1, cache=None, filehashes=None
+):
+    """Sum the MU Densities of the given logfiles.
 
+    Given a ``cache`` and the logfiles' ``filehashes``, each logfile's MU
+    Density is cached by the hash of the logfile, so that a cached logfile
+    doesn't need to be read at all.
+    """
+    if cache is None or filehashes is None:
+        filehashes = [None] * len(filepaths)
 
-def calc_and_merge_logfile_mudensity(filepaths, grid_resolution=1):
     logfile_results = []
-    for filepath in filepaths:
-        logfile_delivery_data = pymedphys.Delivery.from_logfile(filepath)
-        mu_density_results = mu_density_from_delivery_data(
-            logfile_delivery_data, grid_resolution=grid_resolution
+    for filepath, filehash in zip(filepaths, filehashes):
+        grid_xx, grid_yy = pymedphys.mudensity.grid(grid_resolution=grid_resolution)
+        calculate = functools.partial(
+            logfile_mu_density, filepath, grid_resolution=grid_resolution
         )
 
-        logfile_results.append(mu_density_results)
+        if filehash is None:
+            mu_density = calculate()
+        else:
+            mu_density = cache.get_or_calculate(
+                filehash, calculate, source="logfile", grid_resolution=grid_resolution
+            )
+
+        logfile_results.append((grid_xx, grid_yy, mu_density))
 
     grid_xx_list = [result[0] for result in logfile_results]
     grid_yy_list = [result[1] for result in logfile_results]
@@ -264,7 +286,7 @@ def calc_and_merge_logfile_mudensity(filepaths, grid_resolution=1):
 
 
 def get_logfile_mosaiq_results(
-    index, config, field_id_key_map, filehash, cursors, grid_resolution=1
+    index, config, filehash, cursors, grid_resolution=1, cache=None
 ):
     file_info = index[filehash]
     delivery_details = file_info["delivery_details"]
@@ -276,17 +298,18 @@ def get_logfile_mosaiq_results(
     mosaiq_delivery_data = pymedphys.Delivery.from_mosaiq(cursors[server], field_id)
 
     mosaiq_results = mu_density_from_delivery_data(
-        mosaiq_delivery_data, grid_resolution=grid_resolution
+        mosaiq_delivery_data, grid_resolution=grid_resolution, cache=cache
     )
 
-    consecutive_keys = find_consecutive_logfiles(
-        field_id_key_map, field_id, filehash, index
-    )
+    consecutive_keys = find_consecutive_logfiles(index, filehash)
 
     logfilepaths = [get_filepath(index, config, key) for key in consecutive_keys]
 
     logfile_results = calc_and_merge_logfile_mudensity(
-        logfilepaths, grid_resolution=grid_resolution
+        logfilepaths,
+        grid_resolution=grid_resolution,
+        cache=cache,
+        filehashes=consecutive_keys,
     )
 
     try:
@@ -16,9 +16,13 @@
 """Index logfiles.
 """
 
-import json
+import collections
+import concurrent.futures
+import hashlib
+import itertools
 import os
 import pathlib
+import time
 import traceback
 from glob import glob
 
@@ -26,11 +30,12 @@ from pymedphys._imports import attr
 
 from pymedphys._mosaiq.connect import multi_mosaiq_connect
 from pymedphys._mosaiq.delivery import NoMosaiqEntries, get_mosaiq_delivery_details
-from pymedphys._trf.header import Header, decode_header_from_file
+from pymedphys._trf.header import Header, decode_header, determine_header_length
 from pymedphys._utilities.filehash import hash_file
 from pymedphys._utilities.filesystem import make_a_valid_directory_name
 
 from .identify import date_convert
+from .store import open_logfile_index
 
 
 def create_logfile_directory_name(
@@ -88,6 +93,20 @@ def create_index_entry(
 
 
 def file_already_in_index(indexed_filepath, to_be_indexed_filepath, filehash):
+    if not os.path.exists(indexed_filepath):
+        # The entries of a chunk are added before its logfiles are moved, so
+        # an interrupted indexing can leave an entry whose logfile is still
+        # to be indexed. That logfile, having the entry's hash, is moved now.
+        pathlib.Path(indexed_filepath).parent.mkdir(parents=True, exist_ok=True)
+        os.rename(to_be_indexed_filepath, indexed_filepath)
+
+        print(
+            "Finished moving logfile into the index:\n    {} -->\n    {}".format(
+                to_be_indexed_filepath, indexed_filepath
+            )
+        )
+        return
+
     try:
         new_hash = hash_file(indexed_filepath)
     except FileNotFoundError:
@@ -127,31 +146,157 @@ def get_logfile_mosaiq_info(
     return attr.asdict(delivery_details)
 
 
-# TODO Split this function up into smaller functions for easier reuse.
+ScannedLogfile = collections.namedtuple(
+    "ScannedLogfile", ["filepath", "filehash", "header", "error", "seconds"]
+)
+
+
+def scan_logfile(filepath):
+    """Hash a logfile and decode its header from a single read of the file.
+
+    Any error in reading the logfile or decoding its header is returned as
+    its formatted traceback, so that one unreadable logfile doesn't stop the
+    indexing of the others. Should the logfile not be read at all its hash
+    is ``None``.
+    """
+    start = time.perf_counter()
+
+    filehash = None
+    header = None
+
+    try:
+        with open(filepath, "rb") as a_file:
+            trf_contents = a_file.read()
+
+        filehash = hashlib.sha1(trf_contents).hexdigest()
+        header = decode_header(trf_contents[0 : determine_header_length(trf_contents)])
+        error = None
+    except Exception:  # pylint: disable = broad-except
+        error = traceback.format_exc()
+
+    return ScannedLogfile(
+        filepath, filehash, header, error, time.perf_counter() - start
+    )
+
+
+class StageThroughput:
+    """The number of logfiles handled by each stage of the indexer, and the
+    time spent within each stage.
+
+    As the stages run concurrently, the stage with the lowest rate is the
+    one which limits the overall throughput.
+    """
+
+    def __init__(self):
+        self._counts = collections.OrderedDict()
+        self._seconds = collections.defaultdict(float)
+
+    def record(self, stage, seconds, count=1):
+        self._counts[stage] = self._counts.get(stage, 0) + count
+        self._seconds[stage] += seconds
+
+    def summary(self):
+        lines = []
+        for stage, count in self._counts.items():
+            seconds = self._seconds[stage]
+            rate = count / seconds if seconds > 0 else float("inf")
+            lines.append(
+                "    {}: {} logfiles in {:.1f} s ({:.1f} logfiles/s)".format(
+                    stage, count, seconds, rate
+                )
+            )
+
+        return "\n".join(lines)
+
+
+def lookup_delivery_details(cursor, pending):
+    """Look up the Mosaiq delivery details of a batch of logfiles from the
+    one Mosaiq server.
+
+    Returns a dictionary mapping each logfile's hash to either its delivery
+    details, or the ``NoMosaiqEntries`` exception raised in its lookup.
+    """
+    delivery_details = {}
+    for filehash, header, mosaiq_string_time in pending:
+        try:
+            delivery_details[filehash] = get_mosaiq_delivery_details(
+                cursor,
+                header.machine,
+                mosaiq_string_time,
+                header.field_label,
+                header.field_name,
+                buffer=240,
+            )
+        except NoMosaiqEntries as e:
+            delivery_details[filehash] = e
+
+    return delivery_details
+
+
+def lookup_delivery_details_by_server(cursors, pending_by_server, throughput):
+    """Look up each server's batch of logfiles at the same time.
+
+    Each server has its own connection, so the servers are queried
+    concurrently while the logfiles for any one server are queried in turn.
+    """
+    if not pending_by_server:
+        return {}
+
+    def lookup(server):
+        start = time.perf_counter()
+        results = lookup_delivery_details(cursors[server], pending_by_server[server])
+
+        return server, results, time.perf_counter() - start
+
+    delivery_details = {}
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(pending_by_server)
+    ) as executor:
+        for server, results, seconds in executor.map(lookup, pending_by_server):
+            throughput.record(
+                "Mosaiq lookups ({})".format(server), seconds, len(results)
+            )
+            delivery_details.update(results)
+
+    return delivery_details
+
+
 def file_ready_to_be_indexed(
     cursors,
-    filehash_list,
-    to_be_indexed_dict,
+    scanned_logfiles,
     unknown_error_in_logfile,
     no_mosaiq_record_found,
     no_field_label_in_logfile,
     indexed_directory,
-    index_filepath,
     index,
     machine_map,
     centre_details,
     centre_server_map,
+    throughput,
 ):
-    for filehash in filehash_list:
-        logfile_basename = os.path.basename(to_be_indexed_dict[filehash])
+    pending_by_server = collections.OrderedDict()
+    to_be_indexed = []
+
+    for scanned in scanned_logfiles:
+        logfile_basename = os.path.basename(scanned.filepath)
+        header = scanned.header
+
+        if header is None:
+            print(scanned.error)
+            new_filepath = os.path.join(unknown_error_in_logfile, logfile_basename)
+            try:
+                rename_and_handle_fileexists(scanned.filepath, new_filepath)
+            except OSError:
+                # An unreadable logfile may not be able to be moved either.
+                traceback.print_exc()
+            continue
 
         try:
-            header = decode_header_from_file(to_be_indexed_dict[filehash])
             print("\n{}".format(header))
             if header.field_label == "":
                 print("No field label in logfile")
                 new_filepath = os.path.join(no_field_label_in_logfile, logfile_basename)
-                rename_and_handle_fileexists(to_be_indexed_dict[filehash], new_filepath)
+                rename_and_handle_fileexists(scanned.filepath, new_filepath)
                 continue
 
             centre = machine_map[header.machine]["centre"]
@@ -160,29 +305,37 @@ def file_ready_to_be_indexed(
             mosaiq_string_time, path_string_time = date_convert(
                 header.date, centre_details[centre]["timezone"]
             )
-        except Exception as e:  # pylint: disable = broad-except
+        except Exception:  # pylint: disable = broad-except
             traceback.print_exc()
             new_filepath = os.path.join(unknown_error_in_logfile, logfile_basename)
-            rename_and_handle_fileexists(to_be_indexed_dict[filehash], new_filepath)
+            rename_and_handle_fileexists(scanned.filepath, new_filepath)
             continue
 
-        try:
-            delivery_details = get_mosaiq_delivery_details(
-                cursors[server],
-                header.machine,
-                mosaiq_string_time,
-                header.field_label,
-                header.field_name,
-                buffer=240,
-            )
-        except NoMosaiqEntries as e:
-            print(e)
+        pending_by_server.setdefault(server, []).append(
+            (scanned.filehash, header, mosaiq_string_time)
+        )
+        to_be_indexed.append((scanned, centre, mosaiq_string_time, path_string_time))
+
+    delivery_details_by_hash = lookup_delivery_details_by_server(
+        cursors, pending_by_server, throughput
+    )
+
+    start = time.perf_counter()
+    new_entries = []
+    renames = []
+
+    for scanned, centre, mosaiq_string_time, path_string_time in to_be_indexed:
+        logfile_basename = os.path.basename(scanned.filepath)
+        delivery_details = delivery_details_by_hash[scanned.filehash]
+
+        if isinstance(delivery_details, NoMosaiqEntries):
+            print(delivery_details)
             new_filepath = os.path.join(no_mosaiq_record_found, logfile_basename)
-            rename_and_handle_fileexists(to_be_indexed_dict[filehash], new_filepath)
+            rename_and_handle_fileexists(scanned.filepath, new_filepath)
             continue
 
         logfile_directory_name = create_logfile_directory_name(
-            centre, delivery_details, header, path_string_time
+            centre, delivery_details, scanned.header, path_string_time
         )
 
         abs_logfile_directory_name = os.path.abspath(
@@ -193,36 +346,47 @@ def file_ready_to_be_indexed(
 
         new_filepath = os.path.join(logfile_directory_name, logfile_basename)
 
-        index[filehash] = create_index_entry(
-            new_filepath, delivery_details, header, mosaiq_string_time
+        new_entries.append(
+            (
+                scanned.filehash,
+                create_index_entry(
+                    new_filepath, delivery_details, scanned.header, mosaiq_string_time
+                ),
+            )
         )
 
         abs_new_filepath = os.path.abspath(
             os.path.join(indexed_directory, new_filepath)
         )
+        renames.append((scanned.filepath, abs_new_filepath))
 
-        index_extension_split = os.path.splitext(index_filepath)
-        temp_index_path = "{}_temp{}".format(
-            index_extension_split[0], index_extension_split[1]
-        )
-
-        with open(temp_index_path, "w") as json_data_file:
-            json.dump(index, json_data_file, indent=2)
+    # The batch's entries are added within a single transaction, before
+    # any of the batch's logfiles are moved into their indexed location.
+    index.insert_many(new_entries)
 
-        os.replace(temp_index_path, index_filepath)
-
-        os.rename(to_be_indexed_dict[filehash], abs_new_filepath)
+    for old_filepath, abs_new_filepath in renames:
+        os.rename(old_filepath, abs_new_filepath)
 
         print(
             "Indexed logfile:\n    {} -->\n    {}".format(
-                to_be_indexed_dict[filehash], abs_new_filepath
+                old_filepath, abs_new_filepath
             )
         )
 
+    throughput.record("Indexing", time.perf_counter() - start, len(to_be_indexed))
+
 
-def index_logfiles(centre_map, machine_map, logfile_data_directory):
+def index_logfiles(centre_map, machine_map, logfile_data_directory, workers=None):
+    """Hash, identify, and move into the index all logfiles found within
+    the ``to_be_indexed`` directory.
+
+    Logfiles are hashed and have their headers decoded by a pool of
+    ``workers`` threads ahead of their Mosaiq lookups, so that reading the
+    logfiles from disk overlaps with the querying of Mosaiq. Within each
+    chunk of logfiles, the lookups for each Mosaiq server are run as a
+    batch on that server's connection, concurrently with the other servers.
+    """
     data_directory = logfile_data_directory
-    index_filepath = os.path.abspath(os.path.join(data_directory, "index.json"))
     to_be_indexed_directory = os.path.abspath(
         os.path.join(data_directory, "to_be_indexed")
     )
@@ -249,13 +413,12 @@ def index_logfiles(centre_map, machine_map, logfile_data_directory):
         for _, details in centre_details.items()
     ]
 
-    with open(index_filepath, "r") as json_data_file:
-        index = json.load(json_data_file)
-
-    indexset = set(index.keys())
+    throughput = StageThroughput()
 
     print("\nConnecting to Mosaiq SQL servers...")
-    with multi_mosaiq_connect(sql_server_and_ports) as cursors:
+    with open_logfile_index(data_directory) as index, multi_mosaiq_connect(
+        sql_server_and_ports
+    ) as cursors:
 
         print("Globbing index directory...")
         to_be_indexed = glob(
@@ -263,48 +426,65 @@ def index_logfiles(centre_map, machine_map, logfile_data_directory):
         )
 
         chunk_size = 50
-        number_to_be_indexed = len(to_be_indexed)
-        to_be_indexed_chunked = [
-            to_be_indexed[i : i + chunk_size]
-            for i in range(0, number_to_be_indexed, chunk_size)
-        ]
-
-        for i, a_to_be_indexed_chunk in enumerate(to_be_indexed_chunked):
-            print(
-                "\nHashing a chunk of logfiles ({}/{})".format(
-                    i + 1, len(to_be_indexed_chunked)
+        number_of_chunks = -(-len(to_be_indexed) // chunk_size)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            # All logfiles are submitted up front, so that the pool keeps
+            # on scanning the upcoming logfiles while each chunk is indexed.
+            scanned_logfiles = executor.map(scan_logfile, to_be_indexed)
+
+            for i in range(number_of_chunks):
+                print(
+                    "\nHashing a chunk of logfiles ({}/{})".format(
+                        i + 1, number_of_chunks
+                    )
                 )
-            )
-            hashlist = [
-                hash_file(filename, dot_feedback=True)
-                for filename in a_to_be_indexed_chunk
-            ]
-
-            print(" ")
-
-            to_be_indexed_dict = dict(zip(hashlist, a_to_be_indexed_chunk))
-
-            hashset = set(hashlist)
-
-            for filehash in list(hashset.intersection(indexset)):
-                file_already_in_index(
-                    os.path.join(indexed_directory, index[filehash]["filepath"]),
-                    to_be_indexed_dict[filehash],
-                    filehash,
+                scanned_chunk = list(itertools.islice(scanned_logfiles, chunk_size))
+                for scanned in scanned_chunk:
+                    throughput.record(
+                        "Hashing and header decoding (per worker)", scanned.seconds
+                    )
+
+                # Logfiles which couldn't be read have no hash, and are
+                # handled along with the other logfiles with errors.
+                unreadable = [
+                    scanned for scanned in scanned_chunk if scanned.filehash is None
+                ]
+                scanned_by_hash = {
+                    scanned.filehash: scanned
+                    for scanned in scanned_chunk
+                    if scanned.filehash is not None
+                }
+                already_indexed = [
+                    filehash for filehash in scanned_by_hash if filehash in index
+                ]
+
+                for filehash in already_indexed:
+                    file_already_in_index(
+                        os.path.join(indexed_directory, index[filehash]["filepath"]),
+                        scanned_by_hash[filehash].filepath,
+                        filehash,
+                    )
+
+                file_ready_to_be_indexed(
+                    cursors,
+                    unreadable
+                    + [
+                        scanned
+                        for filehash, scanned in scanned_by_hash.items()
+                        if filehash not in already_indexed
+                    ],
+                    unknown_error_in_logfile,
+                    no_mosaiq_record_found,
+                    no_field_label_in_logfile,
+                    indexed_directory,
+                    index,
+                    machine_map,
+                    centre_details,
+                    centre_server_map,
+                    throughput,
                 )
 
-            file_ready_to_be_indexed(
-                cursors,
-                list(hashset.difference(indexset)),
-                to_be_indexed_dict,
-                unknown_error_in_logfile,
-                no_mosaiq_record_found,
-                no_field_label_in_logfile,
-                indexed_directory,
-                index_filepath,
-                index,
-                machine_map,
-                centre_details,
-                centre_server_map,
-            )
+                print("\nIndexing throughput:\n{}".format(throughput.summary()))
+
     print("Complete")
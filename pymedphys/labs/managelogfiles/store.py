@@ -0,0 +1,296 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""The logfile index, stored within an SQLite database.
+
+Each index entry is stored as a row keyed by the logfile's hash, with the
+full entry kept as JSON alongside the columns that are queried by. This
+allows entries to be added without rewriting the rest of the index, and
+allows lookups by field ID, machine, and time without loading the whole
+index into memory.
+"""
+
+import collections.abc
+import contextlib
+import datetime
+import json
+import os
+import pathlib
+import sqlite3
+
+from pymedphys._utilities.config import get_data_directory
+
+INDEX_FILENAME = "index.sqlite"
+LEGACY_INDEX_FILENAME = "index.json"
+
+LOCAL_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Deliveries of the same field within this time of each other are treated
+# as parts of the one delivery, such as after an interrupted beam.
+CONSECUTIVE_DELIVERY_WINDOW = datetime.timedelta(hours=4)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS logfiles (
+        filehash TEXT PRIMARY KEY,
+        filepath TEXT NOT NULL,
+        patient_id TEXT,
+        field_id INTEGER,
+        qa_mode INTEGER,
+        field_type TEXT,
+        machine TEXT,
+        local_time TEXT,
+        entry TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS logfiles_field ON logfiles (
+        field_id, qa_mode, local_time
+    );
+    CREATE INDEX IF NOT EXISTS logfiles_machine ON logfiles (machine, local_time);
+    CREATE INDEX IF NOT EXISTS logfiles_local_time ON logfiles (local_time);
+"""
+
+INSERT = """
+    INSERT OR REPLACE INTO logfiles (
+        filehash, filepath, patient_id, field_id, qa_mode, field_type,
+        machine, local_time, entry
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _entry_as_row(filehash, entry):
+    delivery_details = entry["delivery_details"]
+
+    return (
+        filehash,
+        entry["filepath"],
+        delivery_details["patient_id"],
+        delivery_details["field_id"],
+        bool(delivery_details["qa_mode"]),
+        delivery_details["field_type"],
+        entry["logfile_header"]["machine"],
+        entry["local_time"],
+        json.dumps(entry),
+    )
+
+
+class LogfileIndex(collections.abc.Mapping):
+    """A read-only mapping of logfile hashes to their index entries,
+    with entries added by ``insert`` and ``insert_many``.
+
+    Each call to ``insert`` or ``insert_many`` is a single transaction,
+    so an interrupted indexing run never leaves a partially written
+    entry. The default rollback journal is used, rather than a
+    write-ahead log, as logfile data directories are commonly on network
+    shares.
+
+    Examples
+    --------
+    >>> index = open_logfile_index(data_directory)  # doctest: +SKIP
+    >>> entry = index[filehash]  # doctest: +SKIP
+    >>> filehashes = index.filehashes_by_field_id(field_id)  # doctest: +SKIP
+    """
+
+    def __init__(self, filepath):
+        self.filepath = pathlib.Path(filepath)
+        self._connection = sqlite3.connect(str(self.filepath))
+
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def __getitem__(self, filehash):
+        row = self._connection.execute(
+            "SELECT entry FROM logfiles WHERE filehash = ?", (filehash,)
+        ).fetchone()
+
+        if row is None:
+            raise KeyError(filehash)
+
+        return json.loads(row[0])
+
+    def __contains__(self, filehash):
+        row = self._connection.execute(
+            "SELECT 1 FROM logfiles WHERE filehash = ?", (filehash,)
+        ).fetchone()
+
+        return row is not None
+
+    def __iter__(self):
+        for (filehash,) in self._connection.execute("SELECT filehash FROM logfiles"):
+            yield filehash
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM logfiles").fetchone()[0]
+
+    def items(self):
+        for filehash, entry in self._connection.execute(
+            "SELECT filehash, entry FROM logfiles"
+        ):
+            yield filehash, json.loads(entry)
+
+    def values(self):
+        for (entry,) in self._connection.execute("SELECT entry FROM logfiles"):
+            yield json.loads(entry)
+
+    def insert(self, filehash, entry):
+        self.insert_many([(filehash, entry)])
+
+    def insert_many(self, filehashes_and_entries):
+        with self._connection:
+            self._connection.executemany(
+                INSERT,
+                (
+                    _entry_as_row(filehash, entry)
+                    for filehash, entry in filehashes_and_entries
+                ),
+            )
+
+    def filehashes_by_field_id(self, field_id, qa_mode=None):
+        """The hashes of the logfiles delivered for a Mosaiq field ID,
+        ordered by delivery time. Optionally only those which were, or
+        were not, delivered in QA mode."""
+        query = "SELECT filehash FROM logfiles WHERE field_id = ?"
+        parameters = [field_id]
+
+        if qa_mode is not None:
+            query += " AND qa_mode = ?"
+            parameters.append(bool(qa_mode))
+
+        return self._query_filehashes(query + " ORDER BY local_time", parameters)
+
+    def consecutive_filehashes(self, filehash, window=CONSECUTIVE_DELIVERY_WINDOW):
+        """The hashes of the non-QA logfiles of the same field which were
+        delivered within ``window`` of the given logfile, ordered by
+        delivery time."""
+        row = self._connection.execute(
+            "SELECT field_id, local_time FROM logfiles WHERE filehash = ?", (filehash,),
+        ).fetchone()
+
+        if row is None:
+            raise KeyError(filehash)
+
+        field_id, local_time = row
+        local_time = datetime.datetime.strptime(local_time, LOCAL_TIME_FORMAT)
+
+        return self._query_filehashes(
+            """
+            SELECT filehash FROM logfiles
+            WHERE field_id = ? AND qa_mode = ? AND local_time > ? AND local_time < ?
+            ORDER BY local_time
+            """,
+            [
+                field_id,
+                False,
+                (local_time - window).strftime(LOCAL_TIME_FORMAT),
+                (local_time + window).strftime(LOCAL_TIME_FORMAT),
+            ],
+        )
+
+    def filehashes_by_machine(self, machine, start=None, end=None):
+        """The hashes of the logfiles delivered on a machine, ordered by
+        delivery time, optionally within ``start <= local_time < end``."""
+        query = "SELECT filehash FROM logfiles WHERE machine = ?"
+        parameters = [machine]
+
+        query, parameters = _add_time_range(query, parameters, start, end)
+
+        return self._query_filehashes(query + " ORDER BY local_time", parameters)
+
+    def filehashes_by_time(self, start=None, end=None):
+        """The hashes of the logfiles delivered within
+        ``start <= local_time < end``, ordered by delivery time.
+
+        Times are strings of the form ``"YYYY-MM-DD HH:MM:SS"``, the same as
+        the ``local_time`` of each index entry.
+        """
+        query, parameters = _add_time_range(
+            "SELECT filehash FROM logfiles WHERE 1", [], start, end
+        )
+
+        return self._query_filehashes(query + " ORDER BY local_time", parameters)
+
+    def _query_filehashes(self, query, parameters):
+        return [filehash for (filehash,) in self._connection.execute(query, parameters)]
+
+
+def _add_time_range(query, parameters, start, end):
+    if start is not None:
+        query += " AND local_time >= ?"
+        parameters.append(str(start))
+
+    if end is not None:
+        query += " AND local_time < ?"
+        parameters.append(str(end))
+
+    return query, parameters
+
+
+def migrate_legacy_index(legacy_index_filepath, index_filepath):
+    """Create an SQLite logfile index from an ``index.json`` logfile index.
+
+    The new index is built within a temporary file which is then moved into
+    place, so that an interrupted migration is simply run again. The
+    ``index.json`` file is left as it was.
+    """
+    with open(legacy_index_filepath) as json_data_file:
+        legacy_index = json.load(json_data_file)
+
+    index_filepath = pathlib.Path(index_filepath)
+    temp_index_filepath = index_filepath.with_name(index_filepath.name + ".tmp")
+
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(temp_index_filepath)
+
+    with LogfileIndex(temp_index_filepath) as index:
+        index.insert_many(legacy_index.items())
+
+    os.replace(temp_index_filepath, index_filepath)
+
+
+def open_logfile_index(data_directory):
+    """Open the logfile index within a logfile data directory.
+
+    Should the directory only contain a legacy ``index.json`` it is first
+    migrated into a new ``index.sqlite``.
+    """
+    data_directory = pathlib.Path(data_directory)
+    index_filepath = data_directory.joinpath(INDEX_FILENAME)
+    legacy_index_filepath = data_directory.joinpath(LEGACY_INDEX_FILENAME)
+
+    if not index_filepath.exists() and legacy_index_filepath.exists():
+        print(
+            "Migrating the logfile index from {} to {}".format(
+                legacy_index_filepath, index_filepath
+            )
+        )
+        migrate_legacy_index(legacy_index_filepath, index_filepath)
+
+    return LogfileIndex(index_filepath)
+
+
+def get_index(config):
+    """Open the logfile index within the config's logfile data directory.
+
+    The index holds an open database connection, so it is best used as a
+    context manager.
+    """
+    return open_logfile_index(get_data_directory(config))
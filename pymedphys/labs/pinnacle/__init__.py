@@ -43,6 +43,7 @@
    only be used for research purposes and not clinically.
 """
 
+from .batch import batch_export_cli, export_archive
 from .pinnacle import PinnacleExport
 from .pinnacle_cli import export_cli
 from .pinnacle_image import PinnacleImage
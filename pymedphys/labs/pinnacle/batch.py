@@ -0,0 +1,312 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Export every plan of every patient within an archive of raw Pinnacle data.
+
+Each plan is exported by a pool of worker processes into its own directory,
+which is written under a temporary name and only renamed once all of the
+plan's DICOM objects have been exported. The outcome of each plan is
+appended to a manifest, so that a rerun skips the plans which were already
+exported.
+"""
+
+import functools
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from pymedphys._utilities.manifest import ManifestWriter, read_manifest
+
+from .pinnacle import PinnacleExport
+
+MANIFEST_FILENAME = "pinnacle_export_manifest.jsonl"
+PARTIAL_SUFFIX = ".partial"
+
+DEFAULT_MODALITIES = ("CT", "RTSTRUCT", "RTPLAN", "RTDOSE")
+
+# How many plans to export between each report of the throughput.
+PROGRESS_INTERVAL = 50
+
+
+def find_patient_directories(archive_root):
+    """Yield each directory within the archive which holds a 'Patient' file,
+    walking the archive as the directories are yielded."""
+    for root, dirnames, filenames in os.walk(archive_root):
+        if "Patient" in filenames:
+            # The directories of a patient hold that patient's own data
+            # rather than other patients.
+            dirnames[:] = []
+            yield root
+        else:
+            dirnames.sort()
+
+
+def export_archive(
+    archive_root,
+    output_directory,
+    modalities=DEFAULT_MODALITIES,
+    workers=None,
+    manifest_filepath=None,
+    logger=None,
+):
+    """Export every plan of every patient within an archive to DICOM.
+
+    Parameters
+    ----------
+        archive_root : str
+            Directory containing raw Pinnacle patient directories, each a
+            directory containing a 'Patient' file, at any depth.
+        output_directory : str
+            Directory in which each plan's DICOM objects are exported to,
+            under the patient's path relative to ``archive_root`` followed
+            by the plan's directory name, e.g. ``Patient_1/Plan_0``.
+        modalities : sequence of str, optional
+            The DICOM modalities to export for each plan. CT exports the
+            plan's primary image.
+        workers : int, optional
+            The number of processes to export plans across. By default the
+            plans are exported within this process.
+        manifest_filepath : str, optional
+            The file in which the outcome of each plan is recorded. Plans
+            recorded as exported are skipped. Defaults to
+            ``pinnacle_export_manifest.jsonl`` within ``output_directory``.
+        logger : Logger, optional
+            Logger to report progress and throughput to.
+
+    Returns
+    -------
+        failures : dict
+            The error message of each plan, or patient, which failed to be
+            exported, keyed by its path relative to ``archive_root``.
+    """
+
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    os.makedirs(output_directory, exist_ok=True)
+    if manifest_filepath is None:
+        manifest_filepath = os.path.join(output_directory, MANIFEST_FILENAME)
+
+    already_exported = set(
+        record["plan"]
+        for record in read_manifest(manifest_filepath)
+        if record["error"] is None
+    )
+
+    list_plans = functools.partial(_list_plans, archive_root=archive_root)
+    export_plan = functools.partial(
+        _export_plan, output_directory=output_directory, modalities=list(modalities)
+    )
+
+    patient_directories = find_patient_directories(archive_root)
+
+    if workers is None or workers <= 1:
+        tasks = _plan_tasks(map(list_plans, patient_directories), already_exported)
+        records = map(export_plan, tasks)
+        return _record_exports(records, manifest_filepath, logger)
+
+    with multiprocessing.Pool(workers) as pool:
+        tasks = _plan_tasks(
+            pool.imap_unordered(list_plans, patient_directories), already_exported
+        )
+        records = pool.imap_unordered(export_plan, tasks)
+        return _record_exports(records, manifest_filepath, logger)
+
+
+def _list_plans(patient_directory, archive_root):
+    relative_path = os.path.relpath(patient_directory, start=archive_root)
+
+    try:
+        export = PinnacleExport(patient_directory, logging.getLogger(__name__))
+        plan_ids = [plan["PlanID"] for plan in export.patient_info["PlanList"]]
+    except Exception as e:  # pylint: disable = broad-except
+        return patient_directory, relative_path, None, _error_message(e)
+
+    return patient_directory, relative_path, plan_ids, None
+
+
+def _plan_tasks(listed_patients, already_exported):
+    for patient_directory, relative_path, plan_ids, error in listed_patients:
+        if error is not None:
+            yield {"plan": relative_path, "error": error}
+            continue
+
+        for plan_index, plan_id in enumerate(plan_ids):
+            plan = os.path.join(relative_path, f"Plan_{plan_id}")
+
+            yield {
+                "plan": plan,
+                "patient_directory": patient_directory,
+                "plan_index": plan_index,
+                "skip": plan in already_exported,
+                "error": None,
+            }
+
+
+def _export_plan(task, output_directory, modalities):
+    if task["error"] is not None:
+        return {"plan": task["plan"], "files": 0, "seconds": 0, "error": task["error"]}
+
+    if task["skip"]:
+        return None
+
+    start = time.perf_counter()
+
+    plan_output_directory = os.path.join(output_directory, task["plan"])
+    partial_output_directory = plan_output_directory + PARTIAL_SUFFIX
+
+    # Left behind should an earlier export have been interrupted.
+    shutil.rmtree(partial_output_directory, ignore_errors=True)
+    os.makedirs(partial_output_directory)
+
+    logger = logging.getLogger(__name__)
+
+    try:
+        export = PinnacleExport(task["patient_directory"], logger)
+        plan = export.plans[task["plan_index"]]
+        _export_modalities(export, plan, modalities, partial_output_directory)
+
+        shutil.rmtree(plan_output_directory, ignore_errors=True)
+        os.replace(partial_output_directory, plan_output_directory)
+    except Exception as e:  # pylint: disable = broad-except
+        shutil.rmtree(partial_output_directory, ignore_errors=True)
+
+        return {
+            "plan": task["plan"],
+            "files": 0,
+            "seconds": time.perf_counter() - start,
+            "error": _error_message(e),
+        }
+
+    return {
+        "plan": task["plan"],
+        "files": len(os.listdir(plan_output_directory)),
+        "seconds": time.perf_counter() - start,
+        "error": None,
+    }
+
+
+def _export_modalities(export, plan, modalities, export_path):
+    if "CT" in modalities:
+        if plan.primary_image:
+            export.export_image(image=plan.primary_image, export_path=export_path)
+        else:
+            export.logger.warning(
+                "No primary image to export for plan: %s", plan.plan_info["PlanName"]
+            )
+
+    if "RTSTRUCT" in modalities:
+        export.export_struct(plan=plan, export_path=export_path)
+
+    if "RTPLAN" in modalities:
+        export.export_plan(plan=plan, export_path=export_path)
+
+    if "RTDOSE" in modalities:
+        export.export_dose(plan=plan, export_path=export_path)
+
+
+def _error_message(error):
+    return "{}: {}".format(type(error).__name__, error)
+
+
+def _record_exports(records, manifest_filepath, logger):
+    """Append each plan's record to the manifest as it arrives, reporting
+    the throughput as the plans are exported."""
+    failures = {}
+    exported = 0
+    skipped = 0
+    files = 0
+    worker_seconds = 0
+
+    start = time.perf_counter()
+
+    with ManifestWriter(manifest_filepath) as manifest:
+        for record in records:
+            if record is None:
+                skipped += 1
+                continue
+
+            manifest.write(record)
+
+            worker_seconds += record["seconds"]
+            if record["error"] is None:
+                exported += 1
+                files += record["files"]
+            else:
+                failures[record["plan"]] = record["error"]
+                logger.error("Failed to export %s: %s", record["plan"], record["error"])
+
+            if (exported + len(failures)) % PROGRESS_INTERVAL == 0:
+                logger.info(
+                    _throughput(
+                        exported, failures, skipped, files, start, worker_seconds
+                    )
+                )
+
+    logger.info(_throughput(exported, failures, skipped, files, start, worker_seconds))
+
+    return failures
+
+
+def _throughput(exported, failures, skipped, files, start, worker_seconds):
+    seconds = time.perf_counter() - start
+    rate = exported / seconds if seconds > 0 else float("inf")
+    seconds_per_plan = worker_seconds / max(exported + len(failures), 1)
+
+    return (
+        "Exported {} plans ({} DICOM files) in {:.1f} s, {:.2f} plans/s "
+        "({:.1f} s per plan per worker). {} failed, {} already exported.".format(
+            exported, files, seconds, rate, seconds_per_plan, len(failures), skipped,
+        )
+    )
+
+
+def batch_export_cli(args):
+    """
+    expose a cli to export every plan within an archive of raw Pinnacle data
+    """
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(log_level)
+
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    ch.setLevel(log_level)
+    logger.addHandler(ch)
+
+    modalities = args.modality
+    if len(modalities) == 0:
+        modalities = DEFAULT_MODALITIES
+
+    workers = args.workers
+    if workers is None:
+        workers = os.cpu_count()
+
+    failures = export_archive(
+        args.archive_root,
+        args.output_directory,
+        modalities=modalities,
+        workers=workers,
+        manifest_filepath=args.manifest,
+        logger=logger,
+    )
+
+    if failures:
+        sys.exit(1)
@@ -38,13 +38,90 @@
 # SOFTWARE.
 
 
+"""Read the text files of raw Pinnacle data into Python objects.
+
+Pinnacle's ``key = value;`` and ``key ={ ... };`` files are rewritten
+line by line as YAML text. That text is then loaded by a parser for just
+the subset of YAML which the rewritten files make use of: block mappings,
+block sequences, and single line scalars, with scalars resolved by YAML's
+own resolver. Text outside of that subset is loaded by ``yaml.safe_load``
+instead, so the results, and any errors, are the same as loading all of
+the rewritten text with PyYAML.
+
+Parsed files are cached by their path, modification time, and size, so
+that a file which is read many times while exporting is only parsed once.
+"""
+
+import collections
+import copy
+import functools
 import io
+import os
 import re
 
 from pymedphys._imports import yaml
 
+# The number of parsed files to keep within the cache.
+PARSE_CACHE_SIZE = 64
+
+_parse_cache = collections.OrderedDict()
+
+# Characters which YAML either does not allow, or treats differently to
+# how the native parser does. Text containing any of these is loaded by
+# way of YAML.
+_UNSUPPORTED_CHARACTERS = re.compile(
+    "[^\x0a\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]"
+)
+
+# Characters which may not begin a plain (unquoted) YAML scalar.
+_INDICATORS = frozenset("-?:,[]{}#&*!|>'\"%@`")
+
+# The tags of the scalars which a plain scalar may be resolved to.
+_SCALAR_TAGS = frozenset(
+    "tag:yaml.org,2002:" + name
+    for name in ("null", "bool", "int", "float", "str", "timestamp")
+)
+
 
 def pinn_to_dict(filename):
+    """Read a Pinnacle text file, such as 'Patient' or 'plan.Trial'.
+
+    Parameters
+    ----------
+        filename : str
+            Path to the Pinnacle file.
+
+    Returns
+    -------
+        result : dict or list
+            The contents of the file. Files which hold more than one
+            object, such as a 'plan.Trial' file with many trials, are
+            returned as a list of these objects.
+    """
+
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _parse_cache.pop(path, None)
+    if cached is None or cached[0] != signature:
+        cached = (signature, _read_pinnacle_file(path))
+
+    _parse_cache[path] = cached
+    while len(_parse_cache) > PARSE_CACHE_SIZE:
+        _parse_cache.popitem(last=False)
+
+    # A copy, so that changes made by the caller don't make their way into
+    # the cache.
+    return copy.deepcopy(cached[1])
+
+
+def clear_parse_cache():
+    """Remove all parsed files from the cache used by ``pinn_to_dict``."""
+    _parse_cache.clear()
+
+
+def _read_pinnacle_file(filename):
 
     result = None
     with io.open(filename, "r", encoding="ISO-8859-1", errors="ignore") as fp:
@@ -69,68 +146,303 @@ def pinn_to_dict(filename):
             split_data = data[indices[i] : next_index]
 
             if isinstance(result, list):
-                d = yaml.safe_load(convert_to_yaml(split_data))
+                d = parse_pinnacle(split_data)
                 result.append(d[list(d.keys())[0]])
             else:
-                result = yaml.safe_load(convert_to_yaml(split_data))
+                result = parse_pinnacle(split_data)
 
     return result
 
 
+def parse_pinnacle(data):
+    """Parse the lines of a Pinnacle file.
+
+    The result is the same as ``yaml.safe_load(convert_to_yaml(data))``.
+    """
+
+    text = "".join(_yaml_lines(data))
+
+    try:
+        return _PinnacleParser(text).parse()
+    except _UnsupportedSyntax:
+        return yaml.safe_load(text)
+
+
 def convert_to_yaml(data):
+    return "".join(_yaml_lines(data))
+
+
+def pinn_to_yaml(filename):
+
+    with io.open(filename, "r", encoding="ISO-8859-1", errors="ignore") as fp:
+        data = fp.readlines()
+        return convert_to_yaml(data)
+
+
+def _yaml_lines(data):
+    """Rewrite each line of a Pinnacle file as a line of YAML."""
 
-    out = ""
     listIndents = []
     in_comment = False
-    c = 0
-    for _, line in enumerate(data, 0):
+    for line in data:
 
         # Remove comment lines
-        if re.search(r"^\/\*", line) or in_comment:
+        if line.startswith("/*") or in_comment:
             in_comment = True
             continue
 
-        if re.search(r"\*\/", line):
+        if "*/" in line:
             in_comment = False
             continue
 
         # Get the indentation of this line
-        thisIndent = len(re.match(r"^\s*", line).group())
+        stripped_line = line.lstrip()
+        thisIndent = len(line) - len(stripped_line)
 
         # Check for start list/array
-        if re.search("Array ={", line) or re.search("List ={", line):
+        if "Array ={" in line or "List ={" in line:
             listIndents.append(thisIndent)
 
-        # Check for end list/array
-        if re.search("}", line) and thisIndent in listIndents:
-            listIndents.pop()
+        if "}" in line:
+            # Check for end list/array
+            if thisIndent in listIndents:
+                listIndents.pop()
 
-        # If this is the end of an object, discard as not needed for YAML
-        if re.search("}", line):
+            # If this is the end of an object, discard as not needed for YAML
             continue
 
         # If this line is one indentation in from a start of list,
         # add '-' for YAML sequence
         if thisIndent - 2 in listIndents:
             spaces = " " * thisIndent
-            subbed_line = re.sub(r"^\s*", "", line)
-            line = f"{spaces}- {subbed_line}"
+            line = f"{spaces}- {stripped_line}"
 
         # Replace ={ and = with : for assignment
-        line = re.sub(" ={", " :", line)
-        line = re.sub(" = ", " : ", line)
+        line = line.replace(" ={", " :").replace(" = ", " : ")
 
         # Remove semicolons at end of lines
-        line = re.sub(";$", "", line)
+        if line.endswith(";\n"):
+            line = line[:-2] + "\n"
+        elif line.endswith(";"):
+            line = line[:-1]
 
-        out += "" + line
-        c += 1
+        yield line
 
-    return out
 
+class _UnsupportedSyntax(Exception):
+    """YAML syntax which the native parser leaves to YAML."""
 
-def pinn_to_yaml(filename):
 
-    with io.open(filename, "r", encoding="ISO-8859-1", errors="ignore") as fp:
-        data = fp.readlines()
-        return convert_to_yaml(data)
+class _PinnacleParser:
+    """Parse the block mappings, block sequences, and single line scalars
+    of rewritten Pinnacle files, the same as YAML would.
+
+    Each line is held as ``(indent, content, follows_gap)``, where
+    ``follows_gap`` records whether a blank or comment line came before
+    it.
+    """
+
+    def __init__(self, text):
+        if _UNSUPPORTED_CHARACTERS.search(text):
+            raise _UnsupportedSyntax()
+
+        self._lines = []
+        self._position = 0
+
+        follows_gap = False
+        for line in text.split("\n"):
+            content = line.strip(" ")
+            if not content or content.startswith("#"):
+                follows_gap = True
+                continue
+
+            indent = line.index(content[0])
+            if indent == 0 and _is_document_marker(content):
+                raise _UnsupportedSyntax()
+
+            self._lines.append((indent, content, follows_gap))
+            follows_gap = False
+
+    def parse(self):
+        result = self._parse_node(-1)
+        if self._position < len(self._lines):
+            raise _UnsupportedSyntax()
+
+        return result
+
+    def _peek(self):
+        if self._position < len(self._lines):
+            return self._lines[self._position]
+
+        return None
+
+    def _parse_node(self, parent_indent):
+        line = self._peek()
+        if line is None or line[0] <= parent_indent:
+            return None
+
+        indent, content, _ = line
+        if _is_sequence_entry(content):
+            return self._parse_sequence(indent, indentless=False)
+
+        if _split_key(content) is not None:
+            return self._parse_mapping(indent)
+
+        self._position += 1
+        return self._parse_scalar(content, parent_indent)
+
+    def _parse_mapping(self, indent):
+        result = {}
+
+        while True:
+            line = self._peek()
+            if line is None or line[0] < indent:
+                return result
+
+            if line[0] > indent:
+                raise _UnsupportedSyntax()
+
+            key_and_value = _split_key(line[1])
+            if key_and_value is None:
+                raise _UnsupportedSyntax()
+
+            key, value = key_and_value
+            key = _resolve_plain_scalar(key)
+            self._position += 1
+
+            if value:
+                result[key] = self._parse_scalar(value, indent)
+                continue
+
+            line = self._peek()
+            if line is not None and line[0] == indent and _is_sequence_entry(line[1]):
+                result[key] = self._parse_sequence(indent, indentless=True)
+            else:
+                result[key] = self._parse_node(indent)
+
+    def _parse_sequence(self, indent, indentless):
+        result = []
+
+        while True:
+            line = self._peek()
+            if line is None or line[0] < indent:
+                return result
+
+            if line[0] > indent:
+                raise _UnsupportedSyntax()
+
+            content = line[1]
+            if not _is_sequence_entry(content):
+                if indentless:
+                    return result
+                raise _UnsupportedSyntax()
+
+            entry = content[1:].lstrip(" ")
+            if not entry or entry.startswith("#"):
+                self._position += 1
+                result.append(self._parse_node(indent))
+            elif _is_sequence_entry(entry):
+                raise _UnsupportedSyntax()
+            elif _split_key(entry) is not None:
+                # A mapping which begins on the same line as its entry
+                entry_indent = indent + len(content) - len(entry)
+                self._lines[self._position] = (entry_indent, entry, line[2])
+                result.append(self._parse_mapping(entry_indent))
+            else:
+                self._position += 1
+                result.append(self._parse_scalar(entry, indent))
+
+    def _parse_scalar(self, value, indent):
+        """Parse a scalar which may continue over the following lines that
+        are indented further than ``indent``."""
+
+        if value.startswith('"'):
+            inner = value[1:-1]
+            if (
+                len(value) < 2
+                or not value.endswith('"')
+                or '"' in inner
+                or "\\" in inner
+                or self._continues(indent)
+            ):
+                raise _UnsupportedSyntax()
+
+            return inner
+
+        _check_plain_scalar(value)
+
+        lines = [value]
+        while self._continues(indent):
+            _, content, follows_gap = self._lines[self._position]
+            if follows_gap:
+                raise _UnsupportedSyntax()
+
+            _check_plain_scalar(content)
+            lines.append(content)
+            self._position += 1
+
+        return _resolve_plain_scalar(" ".join(lines))
+
+    def _continues(self, indent):
+        line = self._peek()
+        return line is not None and line[0] > indent
+
+
+def _is_document_marker(content):
+    return content[:3] in ("---", "...") and content[3:4] in ("", " ")
+
+
+def _is_sequence_entry(content):
+    return content == "-" or content.startswith("- ")
+
+
+def _split_key(content):
+    """Split a ``key : value`` line into its key and value, or return None
+    should the line not be one."""
+
+    if content.endswith(":"):
+        colon = content.find(": ")
+        if colon == -1:
+            colon = len(content) - 1
+    else:
+        colon = content.find(": ")
+        if colon == -1:
+            return None
+
+    key = content[:colon].rstrip(" ")
+    _check_plain_scalar(key)
+
+    # Keys longer than this are not simple keys within YAML
+    if len(key) >= 1024 or key == "<<":
+        raise _UnsupportedSyntax()
+
+    return key, content[colon + 1 :].lstrip(" ")
+
+
+def _check_plain_scalar(value):
+    if (
+        not value
+        or value[0] in _INDICATORS
+        and not (value[0] == "-" and value[1:2] not in ("", " "))
+        or ": " in value
+        or " #" in value
+        or value.endswith(":")
+    ):
+        raise _UnsupportedSyntax()
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _resolve_plain_scalar(value):
+    """Resolve and construct a plain scalar the same as YAML does."""
+
+    loader = _safe_loader()
+    tag = loader.resolve(yaml.ScalarNode, value, (True, False))
+    if tag not in _SCALAR_TAGS:
+        raise _UnsupportedSyntax()
+
+    return loader.yaml_constructors[tag](loader, yaml.ScalarNode(tag, value))
+
+
+@functools.lru_cache()
+def _safe_loader():
+    return yaml.SafeLoader("")
@@ -38,10 +38,8 @@
 # SOFTWARE.
 
 
-import math
 import os
 import re
-import struct
 import time
 
 from pymedphys._imports import numpy as np
@@ -56,31 +54,81 @@ from .constants import (
     RTPlanSOPClassUID,
 )
 
+# Binary dose files at least this large are memory-mapped rather than read
+# into memory in full.
+MEMMAP_THRESHOLD_BYTES = 64 * 2 ** 20
+
+
+def read_binary_dose(binary_file, dimensions):
+    """
+    Return the dose grid within a Pinnacle binary dose file, indexed by (z, y, x)
+
+    The file holds big-endian floats with the last z slice first. The grid is
+    returned as a read-only view of the file's values with the slices
+    reversed, memory-mapped for grids of at least MEMMAP_THRESHOLD_BYTES.
+    """
+
+    x_dim, y_dim, z_dim = [int(dimension) for dimension in dimensions]
+    shape = (z_dim, y_dim, x_dim)
+    dtype = np.dtype(">f4")
+
+    if z_dim * y_dim * x_dim * dtype.itemsize >= MEMMAP_THRESHOLD_BYTES:
+        file_grid = np.memmap(binary_file, dtype=dtype, mode="r", shape=shape)
+    else:
+        file_grid = np.fromfile(binary_file, dtype=dtype, count=z_dim * y_dim * x_dim)
+        if file_grid.size != z_dim * y_dim * x_dim:
+            raise ValueError(
+                f"Dose file {binary_file} is smaller than its {shape} dose grid"
+            )
+        file_grid = file_grid.reshape(shape)
+        file_grid.flags.writeable = False
+
+    return file_grid[::-1]
+
+
+def add_beam_dose(summed, dose_grid, number_of_fractions, beam_mu):
+    """
+    Add a beam's dose, in cGy/MU, for all of its fractions to the summed grid
+
+    The summed grid is added to in place, one z slice of the beam's dose at a
+    time, so that a memory-mapped dose grid is never copied into memory as a
+    whole.
+    """
+
+    for summed_slice, dose_slice in zip(summed, dose_grid):
+        summed_slice += number_of_fractions * dose_slice.astype(float) * beam_mu / 100
+
 
 def trilinear_interpolation(idx, grid):
     """
     Return trilinear interpolated value for a voxel with index idx within the grid
     """
 
-    int_idx = [math.floor(f) for f in idx]
+    int_idx = [int(np.floor(f)) for f in idx]
     frac_idx = [f % 1 for f in idx]
 
-    l1 = [[[0 for x in range(2)] for x in range(2)] for x in range(2)]
-    for x in range(0, 2):
-        for y in range(0, 2):
-            for z in range(0, 2):
-                l1[x][y][z] = grid[int_idx[0] + x, int_idx[1] + y, int_idx[2] + z]
+    l1 = grid[np.ix_(*[[i, i + 1] for i in int_idx])].astype(float)
+    l2 = l1[0] * (1 - frac_idx[0]) + l1[1] * frac_idx[0]
+    l3 = l2[0] * (1 - frac_idx[1]) + l2[1] * frac_idx[1]
+
+    return l3[0] * (1 - frac_idx[2]) + l3[1] * frac_idx[2]
 
-    l2 = [[0 for x in range(2)] for x in range(2)]
-    for y in range(0, 2):
-        for z in range(0, 2):
-            l2[y][z] = l1[0][y][z] * (1 - frac_idx[0]) + l1[1][y][z] * frac_idx[0]
 
-    l3 = [0 for x in range(2)]
-    for z in range(0, 2):
-        l3[z] = l2[0][z] * (1 - frac_idx[1]) + l2[1][z] * frac_idx[1]
+def dose_to_pixel_data(summed_pixel_values):
+    """
+    Return the DoseGridScaling and PixelData for a dose grid in Gy
 
-    return l3[0] * (1 - frac_idx[2]) + l3[1] * frac_idx[2]
+    The dose is scaled so that its maximum is stored as 16384.
+    """
+
+    scale = np.max(summed_pixel_values) / 16384
+
+    if scale != 0:
+        pixel_values = np.round(summed_pixel_values / scale)
+    else:
+        pixel_values = np.zeros_like(summed_pixel_values)
+
+    return float(scale), pixel_values.astype("<i2").tobytes()
 
 
 def convert_dose(plan, export_path):
@@ -246,8 +294,8 @@ def convert_dose(plan, export_path):
         )
     ds.GridFrameOffsetVector = grid_frame_offset_vector
 
-    # Array in which to sum the dose values of all beams
-    summed_pixel_values = []
+    # Array in which to sum the dose values of all beams, indexed by (z, y, x)
+    summed_pixel_values = None
 
     # For each beam in the trial, convert the dose from the Pinnacle binary
     # file and sum together
@@ -304,13 +352,6 @@ def convert_dose(plan, export_path):
 
         # Read the dose into a grid, so that we can interpolate for the prescription
         # point and determine the MU for the grid
-        dose_grid = np.zeros(
-            (
-                trial_info["DoseGrid .Dimension .X"],
-                trial_info["DoseGrid .Dimension .Y"],
-                trial_info["DoseGrid .Dimension .Z"],
-            )
-        )
         spacing = [
             trial_info["DoseGrid .VoxelSize .X"] * 10,
             trial_info["DoseGrid .VoxelSize .Y"] * 10,
@@ -322,13 +363,14 @@ def convert_dose(plan, export_path):
             ds.ImagePositionPatient[2],
         ]
         if os.path.isfile(binary_file):
-            with open(binary_file, "rb") as b:
-                for z in range(trial_info["DoseGrid .Dimension .Z"] - 1, -1, -1):
-                    for y in range(0, trial_info["DoseGrid .Dimension .Y"]):
-                        for x in range(0, trial_info["DoseGrid .Dimension .X"]):
-                            data_element = b.read(4)
-                            value = struct.unpack(">f", data_element)[0]
-                            dose_grid[x, y, z] = value
+            dose_grid = read_binary_dose(
+                binary_file,
+                (
+                    trial_info["DoseGrid .Dimension .X"],
+                    trial_info["DoseGrid .Dimension .Y"],
+                    trial_info["DoseGrid .Dimension .Z"],
+                ),
+            )
         else:
             plan.logger.warning("Dose file not found")
             plan.logger.error("Skipping generating RTDOSE")
@@ -341,7 +383,7 @@ def convert_dose(plan, export_path):
         plan.logger.debug("Index of prescription point within grid: %s", idx)
 
         # Trilinear interpolation of that point within the dose grid
-        cgy_mu = trilinear_interpolation(idx, dose_grid)
+        cgy_mu = trilinear_interpolation(idx, dose_grid.transpose())
         plan.logger.debug("cgy_mu: %s", cgy_mu)
 
         # Now that we have the cgy/mu value of the dose reference point, we can
@@ -349,71 +391,28 @@ def convert_dose(plan, export_path):
         beam_mu = (total_prescription / cgy_mu) / prescription["NumberOfFractions"]
         plan.logger.debug("Beam MU: %s", beam_mu)
 
-        pixel_data_list = []
-        for z in range(trial_info["DoseGrid .Dimension .Z"] - 1, -1, -1):
-            for y in range(0, trial_info["DoseGrid .Dimension .Y"]):
-                for x in range(0, trial_info["DoseGrid .Dimension .X"]):
-                    value = (
-                        float(prescription["NumberOfFractions"])
-                        * dose_grid[x, y, z]
-                        * beam_mu
-                        / 100
-                    )
-                    pixel_data_list.append(value)
-
         ds.FrameIncrementPointer = ds.data_element("GridFrameOffsetVector").tag
 
-        main_pix_array = []
-        for h in range(0, trial_info["DoseGrid .Dimension .Z"]):
-            pixelsforframe = []
-            for k in range(
-                0,
-                trial_info["DoseGrid .Dimension .X"]
-                * trial_info["DoseGrid .Dimension .Y"],
-            ):
-
-                pixelsforframe.append(
-                    float(
-                        pixel_data_list[
-                            h
-                            * trial_info["DoseGrid .Dimension .Y"]
-                            * trial_info["DoseGrid .Dimension .X"]
-                            + k
-                        ]
-                    )
-                )
-
-            main_pix_array = main_pix_array + list(reversed(pixelsforframe))
-
-        main_pix_array = list(reversed(main_pix_array))
-
         # Add the values from this beam to the summed values
-        if len(summed_pixel_values) == 0:
-            summed_pixel_values = main_pix_array
-        else:
-            for i, values in enumerate(summed_pixel_values):
-                summed_pixel_values[i] = values + main_pix_array[i]
-
-    # Compute the scaling factor
-    scale = max(summed_pixel_values) / 16384
-    ds.DoseGridScaling = scale
-    plan.logger.debug("Dose Grid Scaling: %s", ds.DoseGridScaling)
-
-    pixel_binary_block = bytes()
-
-    # Scale by the scaling factor
-    pixelvaluelist = []
-    for _, element in enumerate(summed_pixel_values, 0):
+        if summed_pixel_values is None:
+            summed_pixel_values = np.zeros(dose_grid.shape, dtype=float)
+
+        add_beam_dose(
+            summed_pixel_values,
+            dose_grid,
+            float(prescription["NumberOfFractions"]),
+            beam_mu,
+        )
 
-        if scale != 0:
-            element = round(element / scale)
-        else:
-            element = 0
-        pixelvaluelist.append(int(element))
+    if summed_pixel_values is None:
+        plan.logger.warning(
+            "No Beam doses could be converted. Unable to generate RTDOSE."
+        )
+        return
 
-    # Set the PixelData
-    pixel_binary_block = struct.pack("%sh" % len(pixelvaluelist), *pixelvaluelist)
-    ds.PixelData = pixel_binary_block
+    # Compute the scaling factor and scale the dose by it
+    ds.DoseGridScaling, ds.PixelData = dose_to_pixel_data(summed_pixel_values)
+    plan.logger.debug("Dose Grid Scaling: %s", ds.DoseGridScaling)
 
     # Save the RTDose Dicom File
     output_file = os.path.join(export_path, RDfilename)
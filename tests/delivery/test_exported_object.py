@@ -1,3 +1,9 @@
+import functools
+
+import numpy as np
+
+import pytest
+
 from pymedphys import Delivery
 
 # pylint: disable = protected-access
@@ -7,7 +13,7 @@ def test_object_consistency():
     empty = Delivery._empty()
     filtered = empty._filter_cps()
 
-    assert isinstance(filtered.monitor_units, tuple)
+    assert isinstance(filtered.monitor_units, np.ndarray)
 
     filtered._metersets(0, 0)
 
@@ -15,8 +21,71 @@ def test_object_consistency():
 def test_base_object():
     empty = Delivery._empty()
 
-    assert empty.monitor_units == tuple()
+    assert len(empty.monitor_units) == 0
 
     collection = {field: getattr(empty, field) for field in empty._fields}
 
     dummy = Delivery(**collection)
+
+    assert dummy == empty
+
+
+def create_delivery(number_of_control_points=50):
+    return Delivery(
+        np.linspace(0, 10, number_of_control_points),
+        np.zeros(number_of_control_points),
+        np.zeros(number_of_control_points),
+        np.random.uniform(-20, 20, size=(number_of_control_points, 80, 2)),
+        np.random.uniform(0, 20, size=(number_of_control_points, 2)),
+    )
+
+
+def test_read_only_arrays():
+    mlc = np.random.uniform(-20, 20, size=(10, 80, 2))
+    delivery = Delivery([0] * 10, [0] * 10, [0] * 10, mlc, [[5, 5]] * 10)
+
+    with pytest.raises(ValueError):
+        delivery.mlc[0, 0, 0] = 1
+
+    # The delivery holds its own copy of the provided arrays.
+    mlc[0, 0, 0] = 100
+    assert delivery.mlc[0, 0, 0] != 100
+
+
+def test_make_and_replace_are_read_only():
+    delivery = create_delivery()
+
+    replaced = delivery._replace(gantry=[10] * len(delivery.gantry))
+    made = Delivery._make([np.array(item) for item in delivery])
+
+    for new_delivery in [replaced, made]:
+        assert isinstance(new_delivery, Delivery)
+        hash(new_delivery)
+
+        for item in new_delivery:
+            assert isinstance(item, np.ndarray)
+            assert not item.flags.writeable
+
+    assert np.array_equal(replaced.gantry, [10] * len(delivery.gantry))
+    assert made == delivery
+    assert hash(made) == hash(delivery)
+
+
+def test_content_hash():
+    delivery = create_delivery()
+    same_delivery = Delivery(*[np.array(item) for item in delivery])
+    different_delivery = delivery._replace(gantry=delivery.gantry + 1)
+
+    assert delivery == same_delivery
+    assert hash(delivery) == hash(same_delivery)
+    assert delivery != different_delivery
+    assert hash(delivery) != hash(different_delivery)
+
+    @functools.lru_cache()
+    def number_of_control_points(delivery):
+        return len(delivery.monitor_units)
+
+    number_of_control_points(delivery)
+    number_of_control_points(same_delivery)
+
+    assert number_of_control_points.cache_info().hits == 1
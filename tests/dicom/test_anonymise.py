@@ -1,3 +1,4 @@
+import glob
 import json
 import os
 import subprocess
@@ -19,6 +20,7 @@ from pymedphys._dicom import create
 from pymedphys._dicom.anonymise import (
     IDENTIFYING_KEYWORDS,
     IDENTIFYING_KEYWORDS_FILEPATH,
+    _iter_dicom_filepaths,
     anonymise_directory,
     anonymise_file,
     get_baseline_keyword_vr_dict,
@@ -274,6 +276,117 @@ def test_anonymise_directory(tmp_path):
         remove_file(temp_anon_filepath)
 
 
+def test_parallel_anonymise_directory_with_manifest(tmp_path):
+    input_dirpath = tmp_path / "input"
+    output_dirpath = tmp_path / "output"
+    manifest_filepath = tmp_path / "manifest.jsonl"
+
+    for subdirectory in ["", "a", "a/b", "c"]:
+        input_dirpath.joinpath(subdirectory).mkdir(parents=True, exist_ok=True)
+        copyfile(TEST_FILEPATH, input_dirpath / subdirectory / "test.dcm")
+
+    # Read as a single element with an unknown tag, which fails to be
+    # anonymised as unknown tags are neither deleted nor ignored.
+    with open(input_dirpath / "c" / "corrupt.dcm", "w") as a_file:
+        a_file.write("not a DICOM file")
+
+    failures = anonymise_directory(
+        input_dirpath,
+        output_dirpath=output_dirpath,
+        anonymise_filenames=False,
+        workers=2,
+        manifest_filepath=manifest_filepath,
+    )
+
+    # A failing file is reported rather than interrupting the others.
+    assert list(failures.keys()) == [os.path.join("c", "corrupt.dcm")]
+    for subdirectory in ["", "a", "a/b", "c"]:
+        assert is_anonymised_file(output_dirpath / subdirectory / "test_Anonymised.dcm")
+
+    # Files recorded as anonymised within the manifest are skipped, even
+    # after an interruption leaves a truncated line within the manifest.
+    with open(manifest_filepath, "a") as manifest_file:
+        manifest_file.write('{"input": "a/te')
+
+    remove_file(output_dirpath / "a" / "test_Anonymised.dcm")
+    failures = anonymise_directory(
+        input_dirpath,
+        output_dirpath=output_dirpath,
+        anonymise_filenames=False,
+        manifest_filepath=manifest_filepath,
+    )
+
+    assert list(failures.keys()) == [os.path.join("c", "corrupt.dcm")]
+    assert not exists(output_dirpath / "a" / "test_Anonymised.dcm")
+
+    with open(manifest_filepath) as manifest_file:
+        records = [json.loads(line) for line in manifest_file if line.endswith("\n")]
+    assert len(records) == 6
+
+
+def test_resume_anonymise_directory_in_place(tmp_path):
+    dicom_dirpath = tmp_path / "dicom"
+    manifest_filepath = tmp_path / "manifest.jsonl"
+
+    for subdirectory in ["a", "b"]:
+        dicom_dirpath.joinpath(subdirectory).mkdir(parents=True)
+        copyfile(TEST_FILEPATH, dicom_dirpath / subdirectory / "test.dcm")
+
+    anonymise_kwargs = dict(
+        anonymise_filenames=True,
+        delete_original_files=True,
+        manifest_filepath=manifest_filepath,
+    )
+
+    failures = anonymise_directory(dicom_dirpath, **anonymise_kwargs)
+    assert not failures
+
+    anonymised_filepaths = sorted(glob.glob(str(dicom_dirpath / "*" / "*.dcm")))
+    assert len(anonymised_filepaths) == 2
+    assert is_anonymised_directory(dicom_dirpath)
+
+    # Resuming finds the anonymised outputs alongside where the originals
+    # were, which are recorded within the manifest and so left untouched.
+    failures = anonymise_directory(dicom_dirpath, **anonymise_kwargs)
+    assert not failures
+    assert sorted(glob.glob(str(dicom_dirpath / "*" / "*.dcm"))) == (
+        anonymised_filepaths
+    )
+
+    # Without a manifest the outputs are anonymised again in place, and
+    # are not deleted even though the originals are to be.
+    failures = anonymise_directory(
+        dicom_dirpath, anonymise_filenames=True, delete_original_files=True
+    )
+    assert not failures
+    assert sorted(glob.glob(str(dicom_dirpath / "*" / "*.dcm"))) == (
+        anonymised_filepaths
+    )
+
+
+def test_iter_dicom_filepaths(tmp_path):
+    for subdirectory in ["a/b", "c", ".hidden"]:
+        tmp_path.joinpath(subdirectory).mkdir(parents=True)
+
+    for filepath in [
+        "1.dcm",
+        "2.txt",
+        ".3.dcm",
+        "a/4.dcm",
+        "a/b/5.dcm",
+        "c/6.dcm",
+        ".hidden/7.dcm",
+    ]:
+        tmp_path.joinpath(filepath).touch()
+
+    assert sorted(_iter_dicom_filepaths(str(tmp_path))) == sorted(
+        glob.glob(str(tmp_path) + "/**/*.dcm", recursive=True)
+    )
+    assert sorted(
+        _iter_dicom_filepaths(str(tmp_path), exclude_dirpath=str(tmp_path / "a"))
+    ) == [str(tmp_path / "1.dcm"), str(tmp_path / "c" / "6.dcm")]
+
+
 @pytest.mark.slow
 @pytest.mark.skipif(
     "SUBPACKAGE" in os.environ, reason="Need to extract CLI out of subpackages"
@@ -0,0 +1,80 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+
+from pymedphys._electronfactors.core import (
+    _looped_calculate_deformability,
+    _single_calculate_deformability,
+    calculate_deformability,
+    convert2_ratio_perim_area,
+)
+
+
+def create_insert_factors(number_of_inserts=30, seed=1):
+    rng = np.random.RandomState(seed)
+
+    width = rng.uniform(4, 9, number_of_inserts)
+    length = width + rng.uniform(0, 5, number_of_inserts)
+    ratio_perim_area = convert2_ratio_perim_area(width, length)
+    factor = (
+        1
+        + 0.01 * width
+        - 0.05 * ratio_perim_area
+        + rng.normal(0, 0.003, number_of_inserts)
+    )
+
+    return width, ratio_perim_area, factor
+
+
+def test_batched_matches_single_point_deformability():
+    width, ratio_perim_area, factor = create_insert_factors()
+
+    width_test, ratio_perim_area_test = np.meshgrid(
+        np.linspace(3, 10, 8), np.linspace(0.3, 0.8, 7)
+    )
+
+    deformability = calculate_deformability(
+        width_test, ratio_perim_area_test, width, ratio_perim_area, factor
+    )
+    assert np.shape(deformability) == np.shape(width_test)
+
+    expected = [
+        _single_calculate_deformability(x, y, width, ratio_perim_area, factor)
+        for x, y in zip(width_test.ravel(), ratio_perim_area_test.ravel())
+    ]
+    assert np.allclose(deformability.ravel(), expected, atol=1e-8)
+
+    single_point = calculate_deformability(5, 0.5, width, ratio_perim_area, factor)
+    assert np.ndim(single_point) == 0
+    assert np.allclose(
+        single_point,
+        _single_calculate_deformability(5, 0.5, width, ratio_perim_area, factor),
+    )
+
+
+def test_parallel_looped_deformability():
+    width, ratio_perim_area, factor = create_insert_factors(number_of_inserts=10)
+    width_test = np.linspace(3, 10, 6)
+    ratio_perim_area_test = np.linspace(0.3, 0.8, 6)
+
+    serial = _looped_calculate_deformability(
+        width_test, ratio_perim_area_test, width, ratio_perim_area, factor
+    )
+    parallel = _looped_calculate_deformability(
+        width_test, ratio_perim_area_test, width, ratio_perim_area, factor, workers=2
+    )
+
+    assert np.array_equal(serial, parallel)
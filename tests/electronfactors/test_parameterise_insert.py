@@ -0,0 +1,103 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import tracemalloc
+
+import numpy as np
+
+import pymedphys.electronfactors
+from pymedphys._electronfactors.core import search_for_centre_of_largest_bounded_circle
+
+
+def create_ellipse(width, length, centre=(0, 0), number_of_points=400):
+    t = np.linspace(0, 2 * np.pi, number_of_points, endpoint=False)
+
+    return (
+        length / 2 * np.cos(t) + centre[0],
+        width / 2 * np.sin(t) + centre[1],
+    )
+
+
+INSERTS = {
+    "ellipse": (create_ellipse(4, 6, centre=(1, -0.5)), 4),
+    "circle": (create_ellipse(5, 5), 5),
+    "rectangle": ((np.array([0, 6, 6, 0, 0]), np.array([0, 0, 3, 3, 0])), 3),
+    # The largest bounded circle touches both outer edges and the inner
+    # corner of the L.
+    "L": (
+        (np.array([0, 6, 6, 2, 2, 0]), np.array([0, 0, 2, 2, 6, 6])),
+        4 * np.sqrt(2) / (1 + np.sqrt(2)),
+    ),
+}
+
+
+def test_parameterise_insert():
+    for (x, y), expected_width in INSERTS.values():
+        width, length, circle_centre = pymedphys.electronfactors.parameterise_insert(
+            x, y
+        )
+
+        assert np.abs(width - expected_width) < 0.01
+        assert np.allclose(length * width * np.pi / 4, _area(x, y))
+        assert np.min(np.hypot(x - circle_centre[0], y - circle_centre[1])) >= (
+            width / 2 - 1e-8
+        )
+
+
+def test_parameterise_inserts():
+    xs, ys = zip(*[insert for insert, _ in INSERTS.values()])
+
+    widths, lengths, circle_centres = pymedphys.electronfactors.parameterise_inserts(
+        xs, ys
+    )
+    assert np.shape(circle_centres) == (len(INSERTS), 2)
+
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        width, length, circle_centre = pymedphys.electronfactors.parameterise_insert(
+            x, y
+        )
+
+        assert widths[i] == width
+        assert lengths[i] == length
+        assert np.array_equal(circle_centres[i], circle_centre)
+
+
+def test_bounded_circle_of_dense_outline():
+    # Every point along the middle of a long rectangle is the centre of a
+    # largest bounded circle, so a great many cells are kept by the search.
+    corners = np.array([[0, 0], [4, 0], [4, 12], [0, 12], [0, 0]])
+    outline = np.concatenate(
+        [
+            np.linspace(start, end, 1000, endpoint=False)
+            for start, end in zip(corners[:-1], corners[1:])
+        ]
+    )
+
+    tracemalloc.start()
+    try:
+        circle_centre = search_for_centre_of_largest_bounded_circle(
+            outline[:, 0], outline[:, 1]
+        )
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert np.abs(circle_centre[0] - 2) < 0.001
+    assert 2 < circle_centre[1] < 10
+    assert peak_memory < 200 * 2 ** 20
+
+
+def _area(x, y):
+    return np.abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1))) / 2
@@ -0,0 +1,86 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the on-disk cache of decoded trf logfiles."""
+
+import pandas as pd
+
+import pytest
+
+import pymedphys._trf.cache
+from pymedphys._trf.cache import read_trf_cached
+from pymedphys._trf.trf2pandas import read_trf
+
+from test_lazy import create_mock_trf
+
+
+@pytest.mark.parametrize("column_adjustment_key", ["integrityv3", "integrityv4"])
+def test_cache_matches_read_trf(tmp_path, column_adjustment_key):
+    filepath = tmp_path / "mock.trf"
+    cache_directory = tmp_path / "cache"
+    create_mock_trf(filepath, column_adjustment_key, 100)
+
+    header, table = read_trf(filepath)
+
+    for _ in range(2):
+        cached_header, cached_table = read_trf_cached(filepath, cache_directory)
+
+        pd.testing.assert_frame_equal(cached_header, header)
+        pd.testing.assert_frame_equal(cached_table, table, check_exact=True)
+
+    assert len(list(cache_directory.glob("*.npz"))) == 1
+
+
+def test_cache_hit_does_not_decode(tmp_path, monkeypatch):
+    filepath = tmp_path / "mock.trf"
+    cache_directory = tmp_path / "cache"
+    create_mock_trf(filepath, "integrityv4", 20)
+
+    _, table = read_trf_cached(filepath, cache_directory)
+
+    def fail_to_decode(filepath):
+        raise AssertionError("Logfile decoded despite a cache entry existing")
+
+    monkeypatch.setattr(pymedphys._trf.cache, "read_trf", fail_to_decode)
+    _, cached_table = read_trf_cached(filepath, cache_directory)
+
+    pd.testing.assert_frame_equal(cached_table, table, check_exact=True)
+
+
+def test_cache_invalidated_by_change(tmp_path):
+    filepath = tmp_path / "mock.trf"
+    cache_directory = tmp_path / "cache"
+
+    create_mock_trf(filepath, "integrityv4", 20)
+    read_trf_cached(filepath, cache_directory)
+
+    create_mock_trf(filepath, "integrityv4", 30)
+    _, table = read_trf_cached(filepath, cache_directory)
+
+    assert len(table) == 30
+    assert len(list(cache_directory.glob("*.npz"))) == 2
+
+
+def test_corrupt_cache_entry(tmp_path):
+    filepath = tmp_path / "mock.trf"
+    cache_directory = tmp_path / "cache"
+    create_mock_trf(filepath, "integrityv3", 20)
+
+    read_trf_cached(filepath, cache_directory)
+    (cache_path,) = cache_directory.glob("*.npz")
+    cache_path.write_bytes(b"not an npz file")
+
+    _, table = read_trf_cached(filepath, cache_directory)
+    pd.testing.assert_frame_equal(table, read_trf(filepath)[1], check_exact=True)
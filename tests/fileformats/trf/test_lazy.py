@@ -0,0 +1,115 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the memory-mapped, lazily decoded trf reader."""
+
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from pymedphys._trf.delivery import DeliveryLogfile
+from pymedphys._trf.lazy import LazyTrf
+from pymedphys._trf.table import get_column_names
+from pymedphys._trf.trf2pandas import read_trf
+
+HEADER = (
+    b"\x14"
+    b"20/05/06 10:00:00 Z"
+    b"\x14"
+    b"+10:00"
+    b"\x14"
+    b"1/Field One"
+    b"\x14"
+    b"2619"
+    b"\x14" + b"\t" * 6 + b"\x00\x00"
+)
+
+
+def create_mock_trf(filepath, column_adjustment_key, number_of_rows):
+    column_names = get_column_names(column_adjustment_key)
+    linac_state_column = 2 if column_adjustment_key == "integrityv3" else 6
+
+    data = np.random.randint(0, 2 ** 16, size=(number_of_rows, len(column_names)))
+    data[0, 0:4] = 1
+    data[:, [2, 6]] = 0
+    data[:, linac_state_column] = np.random.randint(39, 48, size=number_of_rows)
+    data[
+        :, column_names.index("Wedge Position/Actual Value (None)")
+    ] = np.random.randint(0, 3, size=number_of_rows)
+
+    with open(filepath, "wb") as a_file:
+        a_file.write(HEADER + data.astype("<u2").tobytes())
+
+
+@pytest.mark.parametrize("column_adjustment_key", ["integrityv3", "integrityv4"])
+def test_lazy_matches_read_trf(tmp_path, column_adjustment_key):
+    filepath = tmp_path / "mock.trf"
+    create_mock_trf(filepath, column_adjustment_key, 100)
+
+    header, table = read_trf(filepath)
+
+    with LazyTrf(filepath) as logfile:
+        pd.testing.assert_frame_equal(logfile.header_dataframe, header)
+        assert logfile.header.machine == "2619"
+        assert logfile.header.field_label == "1"
+        assert len(logfile) == 100
+
+        pd.testing.assert_frame_equal(logfile.table(), table, check_exact=True)
+
+        columns = [
+            "Step Dose/Actual Value (Mu)",
+            "Step Collimator/Scaled Actual (deg)",
+            "Linac State/Actual Value (None)",
+            "Y2 Leaf 40/Scaled Actual (mm)",
+        ]
+        rows = slice(20, 60)
+
+        pd.testing.assert_frame_equal(
+            logfile.table(columns=columns, rows=rows),
+            table.iloc[rows][columns],
+            check_exact=True,
+        )
+
+
+def test_lazy_unknown_column(tmp_path):
+    filepath = tmp_path / "mock.trf"
+    create_mock_trf(filepath, "integrityv3", 10)
+
+    with LazyTrf(filepath) as logfile:
+        with pytest.raises(ValueError):
+            logfile.table(columns=["Not a column"])
+
+
+def test_undecodable_table_error_is_not_masked(tmp_path):
+    filepath = tmp_path / "mock.trf"
+    create_mock_trf(filepath, "integrityv3", 100)
+
+    # Linac state codes which are not recognised leave no way to decode
+    # the table.
+    with open(filepath, "rb") as a_file:
+        contents = a_file.read()
+
+    data = np.frombuffer(contents[len(HEADER) :], dtype="<u2").reshape(100, -1).copy()
+    data[:, 2] = 1000
+    with open(filepath, "wb") as a_file:
+        a_file.write(HEADER + data.tobytes())
+
+    with pytest.raises(ValueError, match="shape test"):
+        with LazyTrf(filepath) as logfile:
+            logfile.table()
+
+    with pytest.raises(ValueError, match="shape test"):
+        DeliveryLogfile.from_logfile(filepath)
@@ -0,0 +1,101 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the vectorised decoding of the trf table."""
+
+import numpy as np
+
+import pytest
+
+from pymedphys._trf.table import decode_table_data, decode_trf_table, get_column_names
+
+
+def create_random_table(column_adjustment_key, number_of_rows, linac_state_column):
+    column_names = get_column_names(column_adjustment_key)
+
+    data = np.random.randint(0, 2 ** 16, size=(number_of_rows, len(column_names)))
+    data[:, [2, 6]] = 0
+    data[:, linac_state_column] = np.random.randint(39, 48, size=number_of_rows)
+    data[
+        :, column_names.index("Wedge Position/Actual Value (None)")
+    ] = np.random.randint(0, 3, size=number_of_rows)
+
+    return column_names, data, data.astype("<u2").tobytes()
+
+
+def decode_cell_by_cell(trf_table_contents, line_grouping):
+    rows = [
+        trf_table_contents[i : i + line_grouping]
+        for i in range(0, len(trf_table_contents), line_grouping)
+    ]
+
+    return np.array(
+        [
+            [
+                int.from_bytes(row[i : i + 2], byteorder="little")
+                for i in range(0, 2 * (line_grouping // 2), 2)
+            ]
+            for row in rows
+        ]
+    )
+
+
+@pytest.mark.parametrize("line_grouping", [700, 701])
+def test_decode_table_data(line_grouping):
+    trf_table_contents = np.random.bytes(line_grouping * 20)
+
+    assert np.array_equal(
+        decode_table_data(trf_table_contents, line_grouping),
+        decode_cell_by_cell(trf_table_contents, line_grouping),
+    )
+
+
+@pytest.mark.parametrize(
+    "column_adjustment_key,linac_state_column",
+    [("integrityv3", 2), ("integrityv4", 6), ("unity_experimental", 6)],
+)
+def test_decode_trf_table_conversions(column_adjustment_key, linac_state_column):
+    column_names, data, trf_table_contents = create_random_table(
+        column_adjustment_key, 50, linac_state_column
+    )
+
+    table = decode_trf_table(trf_table_contents)
+
+    assert list(table.columns) == column_names
+    assert np.allclose(table.index, np.arange(50) * 0.04)
+
+    signed = np.where(data > 2 ** 15, data - 2 ** 16, data)
+
+    control_point = table["Control point/Actual Value (None)"]
+    control_point_column = column_names.index("Control point/Actual Value (None)")
+    assert control_point.dtype == np.float64
+    assert np.array_equal(control_point, signed[:, control_point_column])
+
+    step_dose = table["Step Dose/Actual Value (Mu)"]
+    step_dose_column = column_names.index("Step Dose/Actual Value (Mu)")
+    assert np.array_equal(step_dose, signed[:, step_dose_column] / 10)
+
+    y2_leaf = table["Y2 Leaf 1/Scaled Actual (mm)"]
+    y2_leaf_column = column_names.index("Y2 Leaf 1/Scaled Actual (mm)")
+    assert np.array_equal(y2_leaf, -(signed[:, y2_leaf_column] / 10))
+
+    dose_rate = table["Actual Dose Rate/Actual Value (Mu/min)"]
+    dose_rate_column = column_names.index("Actual Dose Rate/Actual Value (Mu/min)")
+    assert dose_rate.dtype == np.int64
+    assert np.array_equal(dose_rate, data[:, dose_rate_column])
+
+    assert set(table["Wedge Position/Actual Value (None)"]).issubset(
+        {"Moving", "In", "Out"}
+    )
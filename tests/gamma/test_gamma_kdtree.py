@@ -0,0 +1,173 @@
+# Copyright (C) 2020 Cancer Care Associates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for the KD-tree gamma engine."""
+
+
+import numpy as np
+
+import pytest
+
+import pymedphys
+from pymedphys._gamma.implementation.kdtree import GAMMA_TOLERANCE
+
+
+def get_smooth_gamma_set():
+    grid_y = np.arange(-20, 20, 2)
+    grid_x = np.arange(-24, 24, 2)
+    coords = (grid_y, grid_x)
+
+    mesh_y, mesh_x = np.meshgrid(*coords, indexing="ij")
+    reference = 100 * np.exp(-(mesh_y ** 2 + mesh_x ** 2) / 200)
+    evaluation = 102 * np.exp(-((mesh_y - 1) ** 2 + (mesh_x + 0.5) ** 2) / 210)
+
+    return coords, reference, evaluation
+
+
+def test_kdtree_matches_shell_3d():
+    grid_x = np.arange(0, 1, 0.1)
+    grid_y = np.arange(0, 1.2, 0.1)
+    grid_z = np.arange(0, 1.4, 0.1)
+    dimensions = (len(grid_x), len(grid_y), len(grid_z))
+    coords = (grid_x, grid_y, grid_z)
+
+    reference = np.zeros(dimensions)
+    reference[3:-2:, 4:-2:, 5:-2:] = 1.015
+
+    evaluation = np.zeros(dimensions)
+    evaluation[2:-2:, 2:-2:, 2:-2:] = 1
+
+    kwargs = {"lower_percent_dose_cutoff": 0, "quiet": True}
+    gamma_shell = pymedphys.gamma(
+        coords, reference, coords, evaluation, 3, 0.3, **kwargs
+    )
+    gamma_kdtree = pymedphys.gamma(
+        coords, reference, coords, evaluation, 3, 0.3, method="kdtree", **kwargs
+    )
+
+    assert np.allclose(gamma_kdtree, gamma_shell, atol=0.1)
+
+
+@pytest.mark.parametrize("max_gamma", [None, 1.1])
+def test_kdtree_matches_shell_2d(max_gamma):
+    coords, reference, evaluation = get_smooth_gamma_set()
+
+    results = [
+        pymedphys.gamma(
+            coords,
+            reference,
+            coords,
+            evaluation,
+            [2, 3],
+            [2, 3],
+            max_gamma=max_gamma,
+            quiet=True,
+            method=method,
+        )
+        for method in ["shell", "kdtree"]
+    ]
+
+    for key, gamma_shell in results[0].items():
+        gamma_kdtree = results[1][key]
+
+        # The shell method only samples the evaluation grid at discrete
+        # steps, so it can only ever overestimate gamma.
+        diff = gamma_shell - gamma_kdtree
+
+        assert np.array_equal(np.isnan(gamma_shell), np.isnan(gamma_kdtree))
+        assert np.nanmin(diff) > -1e-6
+        assert np.nanmax(diff) < 0.2
+        assert np.nanmean(diff) < 0.05
+
+
+def test_kdtree_never_exceeds_shell_on_noisy_data():
+    np.random.seed(0)
+
+    coords = tuple(np.arange(size) * 2.0 for size in (15, 15, 10))
+    mesh = np.meshgrid(*coords, indexing="ij")
+    smooth = 100 * np.exp(-sum((item - np.mean(item)) ** 2 for item in mesh) / 400)
+
+    # Noise gives the interpolated evaluation dose many local minima
+    # within each cell.
+    reference = smooth + np.random.normal(0, 3, smooth.shape)
+    evaluation = smooth + np.random.normal(0, 3, smooth.shape)
+
+    results = [
+        pymedphys.gamma(
+            coords,
+            reference,
+            coords,
+            evaluation,
+            [1, 3],
+            2,
+            lower_percent_dose_cutoff=10,
+            quiet=True,
+            method=method,
+        )
+        for method in ["shell", "kdtree"]
+    ]
+
+    for key, gamma_shell in results[0].items():
+        gamma_kdtree = results[1][key]
+
+        # Every gamma the shell method finds is at a point on the evaluation
+        # dose surface, so is never smaller than the true minimum.
+        assert np.array_equal(np.isnan(gamma_shell), np.isnan(gamma_kdtree))
+        assert np.nanmax(gamma_kdtree - gamma_shell) <= GAMMA_TOLERANCE
+
+
+def test_kdtree_skip_once_passed():
+    coords, reference, evaluation = get_smooth_gamma_set()
+
+    kwargs = {"quiet": True, "method": "kdtree"}
+    gamma_all = pymedphys.gamma(coords, reference, coords, evaluation, 1, 1, **kwargs)
+    gamma_skipped = pymedphys.gamma(
+        coords, reference, coords, evaluation, 1, 1, skip_once_passed=True, **kwargs
+    )
+
+    passed = gamma_all < 1
+    assert np.any(passed)
+    assert np.all(gamma_skipped[passed] < 1)
+    assert np.allclose(gamma_skipped[~passed], gamma_all[~passed], equal_nan=True)
+
+
+def test_kdtree_ram_slicing():
+    coords, reference, evaluation = get_smooth_gamma_set()
+
+    kwargs = {"quiet": True, "method": "kdtree"}
+    gamma_unsliced = pymedphys.gamma(
+        coords, reference, coords, evaluation, 3, 2, **kwargs
+    )
+    gamma_sliced = pymedphys.gamma(
+        coords, reference, coords, evaluation, 3, 2, ram_available=2 ** 16, **kwargs
+    )
+
+    assert np.allclose(gamma_unsliced, gamma_sliced, equal_nan=True)
+
+
+def test_kdtree_rejects_local_gamma():
+    coords, reference, evaluation = get_smooth_gamma_set()
+
+    with pytest.raises(ValueError):
+        pymedphys.gamma(
+            coords,
+            reference,
+            coords,
+            evaluation,
+            3,
+            2,
+            local_gamma=True,
+            quiet=True,
+            method="kdtree",
+        )
@@ -0,0 +1,78 @@
+# Copyright (C) 2020 Cancer Care Associates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for gamma calculated across a pool of workers."""
+
+
+import numpy as np
+
+import pytest
+
+import pymedphys
+
+
+def get_synthetic_dose_cube(num_points):
+    grid = np.linspace(-40, 40, num_points)
+    coords = (grid, grid, grid)
+
+    mesh_z, mesh_y, mesh_x = np.meshgrid(*coords, indexing="ij")
+    reference = 100 * np.exp(-(mesh_z ** 2 + mesh_y ** 2 + mesh_x ** 2) / 400)
+    evaluation = 102 * np.exp(
+        -((mesh_z - 1) ** 2 + (mesh_y + 0.5) ** 2 + mesh_x ** 2) / 420
+    )
+
+    return coords, reference, evaluation
+
+
+@pytest.mark.parametrize("method", ["shell", "kdtree"])
+def test_parallel_matches_serial(method):
+    coords, reference, evaluation = get_synthetic_dose_cube(15)
+
+    kwargs = {"quiet": True, "method": method, "max_gamma": 2}
+    gamma_serial = pymedphys.gamma(
+        coords, reference, coords, evaluation, [2, 3], 3, **kwargs
+    )
+    gamma_parallel = pymedphys.gamma(
+        coords, reference, coords, evaluation, [2, 3], 3, workers=2, **kwargs
+    )
+
+    for key, serial in gamma_serial.items():
+        assert np.allclose(gamma_parallel[key], serial, equal_nan=True)
+
+
+def test_parallel_matches_serial_with_multiple_distances():
+    coords, reference, evaluation = get_synthetic_dose_cube(15)
+
+    # The shell method's distance steps are set by the smallest distance
+    # threshold which any reference point is still being searched for.
+    kwargs = {"quiet": True, "max_gamma": 2}
+    gamma_serial = pymedphys.gamma(
+        coords, reference, coords, evaluation, [1, 3], [0.5, 3], **kwargs
+    )
+    gamma_parallel = pymedphys.gamma(
+        coords, reference, coords, evaluation, [1, 3], [0.5, 3], workers=3, **kwargs
+    )
+
+    for key, serial in gamma_serial.items():
+        assert np.array_equal(gamma_parallel[key], serial, equal_nan=True)
+
+
+def test_parallel_random_subset():
+    coords, reference, evaluation = get_synthetic_dose_cube(11)
+
+    gamma = pymedphys.gamma(
+        coords, reference, coords, evaluation, 3, 3, random_subset=20, workers=2
+    )
+
+    assert np.sum(~np.isnan(gamma)) == 20
@@ -0,0 +1,273 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the multi-linac iCOM listener against local stand-in linacs."""
+
+import asyncio
+import lzma
+
+from pymedphys._icom.multilistener import (
+    ConnectionMetrics,
+    IcomWriter,
+    listen_to_linac,
+    listen_to_linacs,
+)
+
+from test_stream import create_icom_frame
+
+CHUNK_SIZE = 256
+TIMEOUT = 30
+
+
+class ReplayLinac:
+    """A stand-in for a linac's iCOM server which replays a list of frames.
+
+    The replay continues on from where it was on each new connection. The
+    first connection is closed by the server after ``disconnect_after``
+    frames, so that the listener has to reconnect.
+    """
+
+    def __init__(self, host, frames, disconnect_after=None):
+        self.host = host
+        self.frames = frames
+        self.disconnect_after = disconnect_after
+
+        self.connections = 0
+        self.port = None
+
+        self._cursor = 0
+        self._server = None
+        self._handlers = []
+
+    async def start(self):
+        def handle_connection(reader, writer):
+            self._handlers.append(asyncio.ensure_future(self._replay(reader, writer)))
+
+        self._server = await asyncio.start_server(handle_connection, self.host, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await cancel(self._handlers)
+
+    async def _replay(self, reader, writer):  # pylint: disable = unused-argument
+        self.connections += 1
+        first_connection = self.connections == 1
+
+        try:
+            frames_sent = 0
+            while self._cursor < len(self.frames):
+                if (
+                    first_connection
+                    and self.disconnect_after is not None
+                    and frames_sent == self.disconnect_after
+                ):
+                    return
+
+                frame = self.frames[self._cursor]
+                for i in range(0, len(frame), CHUNK_SIZE):
+                    writer.write(frame[i : i + CHUNK_SIZE])
+                    await writer.drain()
+                    await asyncio.sleep(0.001)
+
+                self._cursor += 1
+                frames_sent += 1
+
+            # Keep the connection open, the same as an idle linac.
+            await asyncio.sleep(TIMEOUT)
+        finally:
+            writer.close()
+
+
+def create_session(number_of_patient_frames, first_counter=0, first_second=0):
+    patient_frames = [
+        create_icom_frame(
+            first_counter + i,
+            delivered_mu=i * 0.5,
+            patient_id="123456",
+            seconds=first_second + i,
+        )
+        for i in range(number_of_patient_frames)
+    ]
+
+    # The patient's delivery is only saved once the frames after it no
+    # longer have a patient ID. The final frame completes the one prior.
+    after_patient_frames = [
+        create_icom_frame(
+            first_counter + number_of_patient_frames + i,
+            delivered_mu=0,
+            seconds=first_second + number_of_patient_frames + i,
+        )
+        for i in range(3)
+    ]
+
+    return patient_frames, patient_frames + after_patient_frames
+
+
+async def wait_for(condition):
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+
+    while not condition():
+        if loop.time() - start > TIMEOUT:
+            raise TimeoutError("Condition was not met in time")
+        await asyncio.sleep(0.01)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def cancel(tasks):
+    for task in tasks:
+        task.cancel()
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_listen_to_linac_reconnects(tmp_path):
+    _, frames = create_session(20)
+
+    async def main():
+        linac = ReplayLinac("127.0.0.1", frames, disconnect_after=7)
+        await linac.start()
+
+        writer = IcomWriter(tmp_path)
+        metrics = ConnectionMetrics("127.0.0.1")
+
+        tasks = [
+            asyncio.ensure_future(writer.run()),
+            asyncio.ensure_future(
+                listen_to_linac(
+                    "127.0.0.1",
+                    writer,
+                    metrics,
+                    port=linac.port,
+                    min_backoff=0.01,
+                    max_backoff=0.1,
+                )
+            ),
+        ]
+
+        try:
+            await wait_for(lambda: metrics.frames_written == len(frames) - 1)
+        finally:
+            await cancel(tasks)
+            await linac.stop()
+
+        return linac, metrics
+
+    linac, metrics = run(main())
+
+    assert linac.connections == 2
+    assert metrics.connection_attempts == 2
+    assert metrics.frames_received == len(frames) - 1
+    assert metrics.bytes_received == sum(len(frame) for frame in frames)
+    assert metrics.write_lag >= 0
+    assert "127.0.0.1" in metrics.summary()
+
+    live_files = list(tmp_path.joinpath("live", "127.0.0.1").glob("*.txt"))
+    assert live_files
+
+
+def test_listen_to_linacs(tmp_path):
+    sessions = {
+        "127.0.0.1": create_session(15),
+        "127.0.0.2": create_session(10, first_counter=250, first_second=3600),
+    }
+
+    async def main():
+        linacs = []
+        for host, (_, frames) in sessions.items():
+            linac = ReplayLinac(host, frames, disconnect_after=4)
+            await linac.start()
+            linacs.append(linac)
+
+        addresses = ["{}:{}".format(linac.host, linac.port) for linac in linacs]
+        task = asyncio.ensure_future(
+            listen_to_linacs(
+                addresses,
+                tmp_path,
+                metrics_interval=0.05,
+                min_backoff=0.01,
+                max_backoff=0.1,
+            )
+        )
+
+        try:
+            await wait_for(
+                lambda: len(list(tmp_path.glob("patients/*/*.xz"))) == len(sessions)
+            )
+        finally:
+            await cancel([task])
+            for linac in linacs:
+                await linac.stop()
+
+    run(main())
+
+    saved = set()
+    for filepath in tmp_path.glob("patients/123456_DOE, John/*.xz"):
+        with lzma.open(filepath) as f:
+            saved.add(f.read())
+
+    assert saved == {
+        b"".join(patient_frames) for patient_frames, _ in sessions.values()
+    }
+
+
+def test_skipped_counter_starts_a_new_delivery(tmp_path):
+    patient_frames, frames = create_session(10)
+
+    # The linac's stream skips the item with a counter of 3
+    skipped = 3
+    frames = frames[:skipped] + frames[skipped + 1 :]
+
+    async def main():
+        linac = ReplayLinac("127.0.0.1", frames)
+        await linac.start()
+
+        writer = IcomWriter(tmp_path)
+        metrics = ConnectionMetrics("127.0.0.1")
+
+        tasks = [
+            asyncio.ensure_future(writer.run()),
+            asyncio.ensure_future(
+                listen_to_linac("127.0.0.1", writer, metrics, port=linac.port)
+            ),
+        ]
+
+        try:
+            await wait_for(lambda: metrics.frames_written == len(frames) - 1)
+            await wait_for(lambda: len(list(tmp_path.glob("patients/*/*.xz"))) == 2)
+        finally:
+            await cancel(tasks)
+            await linac.stop()
+
+    run(main())
+
+    saved = set()
+    for filepath in tmp_path.glob("patients/123456_DOE, John/*.xz"):
+        with lzma.open(filepath) as f:
+            saved.add(f.read())
+
+    assert saved == {
+        b"".join(patient_frames[:skipped]),
+        b"".join(patient_frames[skipped + 1 :]),
+    }
@@ -0,0 +1,137 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the splitting and decoding of an iCOM stream as it arrives."""
+
+import lzma
+
+import numpy as np
+
+import pymedphys
+from pymedphys._icom import extract, mappings
+from pymedphys._icom.patients import IncrementalIcomDelivery, PatientIcomData
+from pymedphys._icom.stream import IcomStreamParser
+
+IP = "127.0.0.1"
+
+
+def create_icom_field(label, value):
+    key = mappings.ICOM[label][0]
+    return b"0" + key + b"\x04\x00\x00\x00" + value + b"\x00"
+
+
+def create_icom_collimator(label, values):
+    header = b"0\xb8\x00DS\x00R\x04\x00\x00\x00" + label + b"\n"
+    items = [b"0\x1c\x01DS\x00R\x04\x00\x00\x00" + b"%.1f" % value for value in values]
+
+    return header + b"\n".join(items) + b"\x00"
+
+
+def create_icom_frame(counter, delivered_mu, patient_id=None, seconds=0):
+    """A synthetic iCOM frame with just the items that pymedphys reads."""
+    frame = b"\x00" * 8 + b"2020-05-06%02d:%02d:%02d" % (
+        10 + seconds // 3600,
+        (seconds // 60) % 60,
+        seconds % 60,
+    )
+    frame += bytes([counter % 256])
+
+    if patient_id is not None:
+        frame += create_icom_field("Patient ID", patient_id.encode())
+        frame += create_icom_field("Patient Name", b"DOE, John")
+
+    frame += create_icom_field("Machine ID", b"2619")
+    frame += create_icom_field("Delivery MU", b"%.1f" % delivered_mu)
+    frame += create_icom_field("Gantry", b"%.1f" % (counter % 360))
+    frame += create_icom_field("Collimator", b"0.0")
+
+    mlc = np.round(np.random.uniform(-5, 5, 160), 1)
+    frame += create_icom_collimator(b"MLCX", mlc)
+    frame += create_icom_collimator(b"ASYMY", [10.0, 10.0])
+
+    return frame
+
+
+def create_icom_stream(number_of_frames, first_counter=0):
+    return [
+        create_icom_frame(
+            first_counter + i, delivered_mu=i * 0.5, patient_id="123456", seconds=i
+        )
+        for i in range(number_of_frames)
+    ]
+
+
+def test_stream_parser_matches_get_data_points():
+    frames = create_icom_stream(20)
+    stream = b"".join(frames)
+
+    for chunk_size in [1, 7, 256, len(stream)]:
+        parser = IcomStreamParser()
+
+        parsed = []
+        for i in range(0, len(stream), chunk_size):
+            parsed += parser.feed(stream[i : i + chunk_size])
+
+        # The last frame is only complete once the next one begins.
+        assert parsed == frames[:-1]
+        assert parsed == extract.get_data_points(stream)[:-1]
+
+
+def test_stream_parser_is_bounded():
+    parser = IcomStreamParser(max_frame_size=1000)
+
+    for _ in range(100):
+        assert parser.feed(b"no timestamp here " * 10) == []
+        assert len(parser) <= 1000 + 180
+
+    frames = create_icom_stream(3)
+    assert parser.feed(b"".join(frames)) == frames[:-1]
+
+
+def test_incremental_delivery_matches_from_icom():
+    frames = create_icom_stream(30)
+
+    incremental_delivery = IncrementalIcomDelivery()
+    for frame in frames:
+        incremental_delivery.append(frame)
+
+    assert incremental_delivery.delivery == pymedphys.Delivery.from_icom(
+        b"".join(frames)
+    )
+
+
+def test_patient_icom_data(tmp_path):
+    patient_frames = create_icom_stream(10)
+    after_patient_frames = [
+        create_icom_frame(10 + i, delivered_mu=0, seconds=10 + i) for i in range(2)
+    ]
+
+    patient_icom_data = PatientIcomData(tmp_path)
+    assert patient_icom_data.live_delivery(IP) is None
+
+    for frame in patient_frames:
+        patient_icom_data.update_data(IP, frame)
+
+    live_delivery = patient_icom_data.live_delivery(IP)
+    assert live_delivery.mu[-1] == 4.5
+
+    for frame in after_patient_frames:
+        patient_icom_data.update_data(IP, frame)
+
+    assert patient_icom_data.live_delivery(IP) is None
+
+    (saved_filepath,) = tmp_path.glob("123456_DOE, John/*.xz")
+    with lzma.open(saved_filepath) as f:
+        assert f.read() == b"".join(patient_frames)
@@ -23,6 +23,7 @@ from pymedphys.labs.film import (
     interpolated_rotation,
     shift_and_rotate,
 )
+from pymedphys.labs.film.align import align_images_with_basinhopping
 
 
 def test_shift_alignment():
@@ -37,20 +38,77 @@ def test_rotation_and_shift_alignment():
     alignment_assertions((-6, 4, -15))
 
 
-def alignment_assertions(expected):
+def test_high_resolution_alignment():
+    # Large enough for the alignment to be refined over an image pyramid
+    alignment_assertions((3.3, -2.1, 4), pixel_size=0.25)
+
+
+def test_alignment_of_different_resolutions():
+    # The pyramids of these images differ in depth, and the alignment must
+    # still be refined at the full resolution of the reference image.
+    ref_field = create_rectangular_field_function((0, 0), (20, 25), 5, rotation=0)
+    moving_field = create_rectangular_field_function(
+        (-3.3, 2.1), (20, 25), 5, rotation=-4
+    )
+
+    ref_axes = create_mock_axes(0.2)
+    moving_axes = create_mock_axes(0.4)
+
+    ref_image = ref_field(ref_axes[0][:, None], ref_axes[1][None, :])
+    moving_image = moving_field(moving_axes[0][:, None], moving_axes[1][None, :])
+
+    results = align_images(ref_axes, ref_image, moving_axes, moving_image, max_shift=20)
+
+    # The moving field is rotated about its own centre, while the alignment
+    # rotates about the origin.
+    radians = np.radians(4)
+    expected_shifts = [
+        3.3 * np.cos(radians) - 2.1 * np.sin(radians),
+        -3.3 * np.sin(radians) - 2.1 * np.cos(radians),
+    ]
+
+    assert np.allclose(results[0:2], expected_shifts, atol=0.01)
+    assert np.allclose(results[2], 4, atol=0.05)
+
+
+def test_agreement_with_basinhopping():
+    axes, ref_image, moving_image = create_mock_images((-6, 4, -15))
+
+    results = align_images(axes, ref_image, axes, moving_image, max_shift=20)
+    basinhopping_results = align_images_with_basinhopping(
+        axes, ref_image, axes, moving_image, max_shift=20
+    )
+
+    assert np.allclose(results[0:2], basinhopping_results[0:2], atol=0.1)
+    assert np.allclose(results[2], basinhopping_results[2], atol=0.1)
+
+
+def create_mock_images(expected, pixel_size=1):
     ref_field = create_rectangular_field_function((0, 0), (20, 25), 5, rotation=0)
 
     moving_field = create_rectangular_field_function(
         (-expected[0], -expected[1]), (20, 25), 5, rotation=-expected[2]
     )
 
-    x_span = np.arange(-50, 51)
-    y_span = np.arange(-60, 61)
-    axes = (x_span, y_span)
+    axes = create_mock_axes(pixel_size)
+    x_span, y_span = axes
 
     ref_image = ref_field(x_span[:, None], y_span[None, :])
     moving_image = moving_field(x_span[:, None], y_span[None, :])
 
+    return axes, ref_image, moving_image
+
+
+def create_mock_axes(pixel_size):
+    x_span = np.arange(-50, 50 + pixel_size / 2, pixel_size)
+    y_span = np.arange(-60, 60 + pixel_size / 2, pixel_size)
+
+    return x_span, y_span
+
+
+def alignment_assertions(expected, pixel_size=1):
+    axes, ref_image, moving_image = create_mock_images(expected, pixel_size)
+
     results = align_images(axes, ref_image, axes, moving_image, max_shift=20)
     shifted_image = shift_and_rotate(axes, axes, moving_image, *results)
 
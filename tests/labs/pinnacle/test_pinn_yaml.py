@@ -0,0 +1,167 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the native Pinnacle parser against loading the files as YAML."""
+
+import os
+
+import pytest
+
+import yaml
+
+from pymedphys.labs.pinnacle import pinn_yaml
+
+TRIAL = """Trial ={
+  Name = "Trial_1";
+  Comment = "Dose = 2 Gy; Beam #1";
+  PatientRepresentation ={
+    PatientVolumeName = "DOE^JOHN";
+    OutsidePatientIsCtNumber = 1;
+  };
+  DoseGrid .VoxelSize .X = 0.4;
+  DoseGrid .Dimension .Z = 85;
+  UseActualPatientForDoseGrid = yes;
+  DoseStartSlice = ~;
+  PrescriptionList ={
+    Prescription ={
+      Name = "Prescription";
+      PrescriptionDose = 200;
+      NumberOfFractions = 25;
+    };
+  };
+  BeamList ={
+    Beam ={
+      Name = "1 AP";
+      CPManager ={
+        CPManagerObject ={
+          NumberOfControlPoints = 2;
+          ControlPointList ={
+            #0 ={
+              Gantry = 180;
+              MLCLeafPositions ={
+                RawData ={
+                  NumberOfPoints = 2;
+                  Points[] ={
+                    -1.5,1.5,
+                    -2,2.25,
+                  };
+                };
+              };
+            };
+            #1 ={
+              Gantry = 1.8e+2;
+            };
+          };
+        };
+      };
+    };
+  };
+  ObjectVersion ={
+    WriteTimeStamp = "2020-05-06 10:00:00";
+    LastModifiedTimeStamp = 2020-05-06;
+  };
+};
+"""
+
+
+def load_as_yaml(text):
+    return yaml.safe_load(pinn_yaml.convert_to_yaml(text.splitlines(True)))
+
+
+def test_parse_matches_yaml():
+    data = TRIAL.splitlines(True)
+    trial = pinn_yaml.parse_pinnacle(data)
+
+    assert trial == load_as_yaml(TRIAL)
+    assert repr(trial) == repr(load_as_yaml(TRIAL))
+
+    trial = trial["Trial"]
+    assert trial["Comment"] == "Dose : 2 Gy; Beam #1"
+    assert trial["UseActualPatientForDoseGrid"] is True
+    assert trial["DoseStartSlice"] is None
+
+    (beam,) = trial["BeamList"]
+    assert beam["Name"] == "1 AP"
+
+    control_points = beam["CPManager"]["CPManagerObject"]["ControlPointList"]
+    assert [control_point["Gantry"] for control_point in control_points] == [180, 180]
+    assert (
+        control_points[0]["MLCLeafPositions"]["RawData"]["Points[]"]
+        == "-1.5,1.5, -2,2.25,"
+    )
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        'Name = "C:\\\\Patients";\n',
+        "Name = \"it's\";\nValue = 'quoted';\n",
+        "Points[] ={\n  1,2,\n\n  3,4,\n};\n",
+        "Key = a: b;\n",
+        "\tIndented = 1;\n",
+        "",
+    ],
+)
+def test_unsupported_syntax_is_loaded_as_yaml(text):
+    data = text.splitlines(True)
+
+    try:
+        expected = load_as_yaml(text)
+    except yaml.YAMLError as e:
+        with pytest.raises(type(e)):
+            pinn_yaml.parse_pinnacle(data)
+    else:
+        assert pinn_yaml.parse_pinnacle(data) == expected
+
+
+def test_multiple_trials(tmp_path):
+    trial_file = tmp_path.joinpath("plan.Trial")
+    trial_file.write_text(TRIAL + TRIAL.replace("Trial_1", "Trial_2"))
+
+    trials = pinn_yaml.pinn_to_dict(str(trial_file))
+
+    assert [trial["Name"] for trial in trials] == ["Trial_1", "Trial_2"]
+    assert trials[0]["BeamList"] == load_as_yaml(TRIAL)["Trial"]["BeamList"]
+
+
+def test_parse_cache(tmp_path, monkeypatch):
+    patient_file = tmp_path.joinpath("Patient")
+    patient_file.write_text('LastName = "DOE";\nPatientID = 123;\n')
+
+    parsed = []
+    # pylint: disable = protected-access
+    read_pinnacle_file = pinn_yaml._read_pinnacle_file
+
+    def counted_read(filename):
+        parsed.append(filename)
+        return read_pinnacle_file(filename)
+
+    monkeypatch.setattr(pinn_yaml, "_read_pinnacle_file", counted_read)
+    pinn_yaml.clear_parse_cache()
+
+    patient = pinn_yaml.pinn_to_dict(str(patient_file))
+    patient["LastName"] = "SMITH"
+
+    # Changes to the result are not kept within the cache.
+    assert pinn_yaml.pinn_to_dict(str(patient_file))["LastName"] == "DOE"
+    assert len(parsed) == 1
+
+    # A modified file is parsed again.
+    patient_file.write_text('LastName = "ROE";\nPatientID = 123;\n')
+    stat = patient_file.stat()
+    os.utime(str(patient_file), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert pinn_yaml.pinn_to_dict(str(patient_file))["LastName"] == "ROE"
+    assert len(parsed) == 2
@@ -39,6 +39,7 @@
 
 # pylint: disable = redefined-outer-name
 
+import json
 import os
 import tempfile
 from zipfile import ZipFile
@@ -50,7 +51,8 @@ import numpy as np
 import pydicom
 
 from pymedphys._data import download
-from pymedphys.labs.pinnacle import PinnacleExport
+from pymedphys.labs.pinnacle import PinnacleExport, export_archive
+from pymedphys.labs.pinnacle.batch import MANIFEST_FILENAME
 
 working_path = tempfile.mkdtemp()
 data_path = os.path.join(working_path, "data")
@@ -256,3 +258,32 @@ def test_plan(pinn):
 
         # TODO The RTPLAN export isn't fully functional yet, so we need
         # to test more as we add that functionality
+
+
+@pytest.mark.slow
+def test_export_archive(data, pinn):
+    output_directory = os.path.join(working_path, "output", "archive")
+
+    export_archive(data, output_directory, workers=2)
+
+    for p in pinn:
+        # pylint: disable = protected-access
+        relative_path = os.path.relpath(p._path, data)
+        plan_id = p.patient_info["PlanList"][0]["PlanID"]
+        exported = os.listdir(
+            os.path.join(output_directory, relative_path, f"Plan_{plan_id}")
+        )
+
+        for modality in ["CT", "RS", "RP", "RD"]:
+            assert any(f.startswith(modality) for f in exported)
+
+    # Rerunning the export only retries the plans which failed
+    with open(os.path.join(output_directory, MANIFEST_FILENAME)) as manifest_file:
+        failed = sum(json.loads(line)["error"] is not None for line in manifest_file)
+
+    export_archive(data, output_directory)
+
+    with open(os.path.join(output_directory, MANIFEST_FILENAME)) as manifest_file:
+        assert (
+            len(manifest_file.readlines()) == sum(len(p.plans) for p in pinn) + failed
+        )
@@ -0,0 +1,139 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the batch export with the Pinnacle conversions replaced."""
+
+import json
+import os
+import types
+
+import pytest
+
+from pymedphys._utilities.manifest import read_manifest
+from pymedphys.labs.pinnacle import batch
+
+
+class FakePinnacleExport:
+    exported = []
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+
+        with open(os.path.join(path, "Patient")) as patient_file:
+            self.patient_info = json.load(patient_file)
+
+    @property
+    def plans(self):
+        return [
+            types.SimpleNamespace(
+                plan_info=plan,
+                primary_image=None,
+                path=self.path,
+                failing=plan.get("Fail"),
+            )
+            for plan in self.patient_info["PlanList"]
+        ]
+
+    def export_struct(self, plan, export_path):
+        self._export("RS", plan, export_path)
+
+    def export_plan(self, plan, export_path):
+        self._export("RP", plan, export_path)
+
+    def export_dose(self, plan, export_path):
+        if plan.failing:
+            raise ValueError("No dose")
+
+        self._export("RD", plan, export_path)
+
+    def _export(self, modality, plan, export_path):
+        self.exported.append((plan.path, plan.plan_info["PlanID"], modality))
+        with open(os.path.join(export_path, modality + ".dcm"), "w") as a_file:
+            a_file.write(modality)
+
+
+def create_patient(directory, plans):
+    os.makedirs(directory)
+    with open(os.path.join(directory, "Patient"), "w") as patient_file:
+        json.dump({"PlanList": plans}, patient_file)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_export_archive(tmp_path, monkeypatch, workers):
+    # The worker processes are forked, so inherit the replaced export.
+    monkeypatch.setattr(batch, "PinnacleExport", FakePinnacleExport)
+
+    archive_root = tmp_path / "archive"
+    output_directory = tmp_path / "output"
+
+    create_patient(archive_root / "Institution_1" / "Patient_1", [{"PlanID": 0}])
+    create_patient(
+        archive_root / "Institution_1" / "Patient_2",
+        [{"PlanID": 0}, {"PlanID": 1, "Fail": True}],
+    )
+    create_patient(archive_root / "Institution_2" / "Patient_3", [{"PlanID": 2}])
+    os.makedirs(archive_root / "Institution_2" / "Patient_4")
+    with open(archive_root / "Institution_2" / "Patient_4" / "Patient", "w") as a_file:
+        a_file.write("not a Patient file")
+
+    failures = batch.export_archive(
+        str(archive_root),
+        str(output_directory),
+        modalities=["RTPLAN", "RTDOSE"],
+        workers=workers,
+    )
+
+    assert sorted(failures.keys()) == [
+        os.path.join("Institution_1", "Patient_2", "Plan_1"),
+        os.path.join("Institution_2", "Patient_4"),
+    ]
+    for plan in ["Patient_1/Plan_0", "Patient_2/Plan_0"]:
+        assert sorted(os.listdir(output_directory / "Institution_1" / plan)) == [
+            "RD.dcm",
+            "RP.dcm",
+        ]
+    assert os.path.exists(output_directory / "Institution_2" / "Patient_3" / "Plan_2")
+
+    # A failed plan leaves no partially exported directory behind.
+    assert not os.path.exists(
+        output_directory / "Institution_1" / "Patient_2" / "Plan_1"
+    )
+    assert not list(output_directory.glob("**/*" + batch.PARTIAL_SUFFIX))
+
+    # A rerun only retries the plans and patients which failed, even after
+    # an interruption leaves a truncated line within the manifest.
+    with open(output_directory / batch.MANIFEST_FILENAME, "a") as manifest_file:
+        manifest_file.write('{"plan": "Institution_1/Pat')
+
+    FakePinnacleExport.exported = []
+    failures = batch.export_archive(
+        str(archive_root), str(output_directory), modalities=["RTPLAN", "RTDOSE"]
+    )
+
+    assert len(failures) == 2
+    assert [
+        (os.path.basename(path), plan_id)
+        for path, plan_id, _ in FakePinnacleExport.exported
+    ] == [("Patient_2", 1)]
+
+    with open(output_directory / batch.MANIFEST_FILENAME) as manifest_file:
+        lines = manifest_file.readlines()
+    assert all(line.endswith("\n") for line in lines)
+
+    records = read_manifest(output_directory / batch.MANIFEST_FILENAME)
+    assert len(lines) == 8
+    assert len(records) == 7
+    assert sum(record["error"] is None for record in records) == 3
@@ -0,0 +1,214 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the RTDOSE export against the per voxel conversion it replaced."""
+
+import logging
+import math
+import os
+import struct
+import tracemalloc
+import types
+
+import numpy as np
+
+import pydicom
+
+from pymedphys.labs.pinnacle import rtdose
+
+DIMENSIONS = (7, 5, 4)
+NUMBER_OF_FRACTIONS = 25
+PRESCRIPTION_DOSE = 200
+PRESCRIPTION_POINT = (1.3, -2.2, 0.7)
+
+
+def write_binary_dose(binary_file, dose_grid):
+    """Write a dose grid indexed by (x, y, z) as Pinnacle does."""
+    x_dim, y_dim, z_dim = dose_grid.shape
+    with open(binary_file, "wb") as b:
+        for z in range(z_dim - 1, -1, -1):
+            for y in range(0, y_dim):
+                for x in range(0, x_dim):
+                    b.write(struct.pack(">f", dose_grid[x, y, z]))
+
+
+def create_plan(path, number_of_beams=2):
+    trial_info = {
+        "ObjectVersion": {"WriteTimeStamp": "2020-05-06 10:00:00"},
+        "DoseGrid .VoxelSize .X": 0.4,
+        "DoseGrid .VoxelSize .Y": 0.3,
+        "DoseGrid .VoxelSize .Z": 0.5,
+        "DoseGrid .Dimension .X": DIMENSIONS[0],
+        "DoseGrid .Dimension .Y": DIMENSIONS[1],
+        "DoseGrid .Dimension .Z": DIMENSIONS[2],
+        "DoseGrid .Origin .X": -1.2,
+        "DoseGrid .Origin .Y": -0.6,
+        "DoseGrid .Origin .Z": -1.0,
+        "PrescriptionList": [
+            {"Name": "Prescription", "NumberOfFractions": NUMBER_OF_FRACTIONS}
+        ],
+        "BeamList": [
+            {
+                "Name": "Beam {}".format(i),
+                "DoseVolume": "XDR:{}".format(i),
+                "PrescriptionName": "Prescription",
+                "PrescriptionPointName": "Reference",
+                "MonitorUnitInfo": {"PrescriptionDose": PRESCRIPTION_DOSE},
+            }
+            for i in range(number_of_beams)
+        ],
+    }
+
+    return types.SimpleNamespace(
+        primary_image=types.SimpleNamespace(
+            image_info=[{"StudyInstanceUID": "1.2.3", "FrameUID": "1.2.4"}],
+            image={"StudyID": "1"},
+        ),
+        pinnacle=types.SimpleNamespace(
+            patient_info={
+                "RadiationOncologist": "Doctor",
+                "FullName": "Doe^John",
+                "DOB": "19700101",
+                "MedicalRecordNumber": "123456",
+                "Gender": "Male",
+            }
+        ),
+        plan_info={
+            "ObjectVersion": {"WriteTimeStamp": "2020-05-06 09:00:00"},
+            "ToolType": "Pinnacle^3",
+            "PinnacleVersionDescription": "Pinnacle 16.0",
+        },
+        trial_info=trial_info,
+        patient_position="HFS",
+        dose_inst_uid="1.2.5",
+        plan_inst_uid="1.2.6",
+        path=str(path),
+        points=[{"Name": "Reference", "XCoord": 0, "YCoord": 0, "ZCoord": 0}],
+        convert_point=lambda point: list(PRESCRIPTION_POINT),
+        logger=logging.getLogger(__name__),
+    )
+
+
+def reference_pixel_values(plan, dose_grids):
+    """The scaled and summed pixel values, calculated one voxel at a time
+    as ``convert_dose`` once did."""
+    x_dim, y_dim, z_dim = DIMENSIONS
+    origin = [-12.0, 6.0 - 0.3 * 10 * (y_dim - 1), 10.0 - 0.5 * 10 * (z_dim - 1)]
+    spacing = [4.0, 3.0, 5.0]
+    idx = [-(origin[i] - PRESCRIPTION_POINT[i]) / spacing[i] for i in range(3)]
+
+    summed_pixel_values = []
+    for dose_grid in dose_grids:
+        dose_grid = dose_grid.astype(np.float32).astype(float)
+
+        int_idx = [math.floor(f) for f in idx]
+        frac_idx = [f % 1 for f in idx]
+        cgy_mu = 0
+        for corner in np.ndindex(2, 2, 2):
+            weight = 1
+            for i in range(3):
+                weight *= frac_idx[i] if corner[i] else 1 - frac_idx[i]
+            cgy_mu += (
+                weight
+                * dose_grid[
+                    int_idx[0] + corner[0],
+                    int_idx[1] + corner[1],
+                    int_idx[2] + corner[2],
+                ]
+            )
+
+        beam_mu = PRESCRIPTION_DOSE / cgy_mu
+        pixel_values = []
+        for z in range(0, z_dim):
+            for y in range(0, y_dim):
+                for x in range(0, x_dim):
+                    pixel_values.append(
+                        float(NUMBER_OF_FRACTIONS) * dose_grid[x, y, z] * beam_mu / 100
+                    )
+
+        if not summed_pixel_values:
+            summed_pixel_values = pixel_values
+        else:
+            summed_pixel_values = [
+                a + b for a, b in zip(summed_pixel_values, pixel_values)
+            ]
+
+    scale = max(summed_pixel_values) / 16384
+
+    return scale, [int(round(value / scale)) for value in summed_pixel_values]
+
+
+def test_convert_dose(tmp_path):
+    rng = np.random.RandomState(0)
+    plan = create_plan(tmp_path)
+
+    dose_grids = []
+    for i in range(2):
+        dose_grid = rng.uniform(0.5, 1.5, DIMENSIONS)
+        write_binary_dose(
+            os.path.join(tmp_path, "plan.Trial.binary.{}".format(str(i).zfill(3))),
+            dose_grid,
+        )
+        dose_grids.append(dose_grid)
+
+    rtdose.convert_dose(plan, tmp_path)
+
+    (output_file,) = tmp_path.glob("RD.*.dcm")
+    ds = pydicom.dcmread(str(output_file), force=True)
+    ds.file_meta.TransferSyntaxUID = pydicom.uid.ImplicitVRLittleEndian
+
+    scale, pixel_values = reference_pixel_values(plan, dose_grids)
+    assert float(ds.DoseGridScaling) == float(pydicom.valuerep.DSfloat(scale))
+    assert ds.PixelData == struct.pack("<%sh" % len(pixel_values), *pixel_values)
+
+
+def test_read_binary_dose(tmp_path, monkeypatch):
+    dose_grid = np.random.RandomState(1).uniform(0, 1, DIMENSIONS)
+    binary_file = os.path.join(tmp_path, "plan.Trial.binary.000")
+    write_binary_dose(binary_file, dose_grid)
+
+    expected = dose_grid.astype(np.float32).transpose()
+
+    read_dose_grid = rtdose.read_binary_dose(binary_file, DIMENSIONS)
+    assert read_dose_grid.shape == DIMENSIONS[::-1]
+    assert np.array_equal(read_dose_grid, expected)
+
+    monkeypatch.setattr(rtdose, "MEMMAP_THRESHOLD_BYTES", 0)
+    assert np.array_equal(rtdose.read_binary_dose(binary_file, DIMENSIONS), expected)
+
+
+def test_add_beam_dose_memory(tmp_path, monkeypatch):
+    dimensions = (100, 100, 100)
+    binary_file = os.path.join(tmp_path, "plan.Trial.binary.000")
+    np.random.RandomState(2).uniform(0, 1, dimensions).astype(">f4").tofile(binary_file)
+
+    monkeypatch.setattr(rtdose, "MEMMAP_THRESHOLD_BYTES", 0)
+    dose_grid = rtdose.read_binary_dose(binary_file, dimensions)
+
+    tracemalloc.start()
+    try:
+        summed = np.zeros(dose_grid.shape, dtype=float)
+        for _ in range(2):
+            rtdose.add_beam_dose(summed, dose_grid, NUMBER_OF_FRACTIONS, 1.5)
+
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Only the summed grid is ever held in memory as float as a whole.
+    assert peak < 1.1 * summed.nbytes
+
+    expected = 2 * (NUMBER_OF_FRACTIONS * dose_grid.astype(float) * 1.5 / 100)
+    assert np.allclose(summed, expected)
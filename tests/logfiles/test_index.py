@@ -0,0 +1,162 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the logfile indexer with the Mosaiq lookups replaced."""
+
+import contextlib
+import os
+import shutil
+
+from pymedphys._mosaiq.delivery import (
+    NoMosaiqEntries,
+    create_ois_delivery_details_class,
+)
+from pymedphys._utilities.filehash import hash_file
+from pymedphys.labs.managelogfiles import index as pmp_index
+from pymedphys.labs.managelogfiles.store import open_logfile_index
+
+CENTRE_MAP = {
+    "rccc": {"timezone": "Australia/Sydney", "mosaiq_sql_server": "mosaiq-a:1433"},
+    "nbcc": {"timezone": "Australia/Sydney", "mosaiq_sql_server": "mosaiq-b:1433"},
+}
+MACHINE_MAP = {"2619": {"centre": "rccc"}, "2694": {"centre": "nbcc"}}
+
+
+def create_mock_logfile(filepath, machine, minute, field=b"1/Field One"):
+    header = (
+        b"\x14"
+        + b"20/05/06 10:%02d:00 Z" % minute
+        + b"\x14"
+        + b"+10:00"
+        + b"\x14"
+        + field
+        + b"\x14"
+        + machine.encode()
+        + b"\x14"
+        + b"\t" * 6
+        + b"\x00\x00"
+    )
+
+    with open(filepath, "wb") as a_file:
+        a_file.write(header + os.urandom(1000))
+
+
+def test_index_logfiles(tmp_path, monkeypatch):
+    lookups = []
+
+    def get_mosaiq_delivery_details(
+        cursor, machine, delivery_time, field_label, field_name, buffer=0
+    ):
+        lookups.append((cursor, machine))
+        if delivery_time.endswith(":59:00"):
+            raise NoMosaiqEntries("No Mosaiq entries were found")
+
+        OISDeliveryDetails = create_ois_delivery_details_class()
+        return OISDeliveryDetails(
+            "123456", 1, "DOE", "John", False, "Dynamic Arc", True
+        )
+
+    @contextlib.contextmanager
+    def multi_mosaiq_connect(servers):
+        yield {server: "cursor for {}".format(server) for server in servers}
+
+    monkeypatch.setattr(
+        pmp_index, "get_mosaiq_delivery_details", get_mosaiq_delivery_details
+    )
+    monkeypatch.setattr(pmp_index, "multi_mosaiq_connect", multi_mosaiq_connect)
+
+    for directory in [
+        "no_field_label_in_logfile",
+        "no_mosaiq_record_found",
+        "unknown_error_in_logfile",
+    ]:
+        tmp_path.joinpath(directory).mkdir()
+
+    to_be_indexed = tmp_path.joinpath("to_be_indexed")
+    to_be_indexed.mkdir()
+    number_of_logfiles = 120
+    for i in range(number_of_logfiles):
+        create_mock_logfile(
+            to_be_indexed.joinpath("{}.trf".format(i)),
+            ["2619", "2694"][i % 2],
+            minute=i % 59,
+        )
+
+    create_mock_logfile(to_be_indexed.joinpath("no_mosaiq.trf"), "2619", minute=59)
+    create_mock_logfile(
+        to_be_indexed.joinpath("no_label.trf"), "2619", minute=1, field=b"Field One"
+    )
+    with open(to_be_indexed.joinpath("corrupt.trf"), "wb") as a_file:
+        a_file.write(b"not a logfile")
+
+    hashes = {
+        filepath.name: hash_file(filepath) for filepath in to_be_indexed.glob("*.trf")
+    }
+
+    # A logfile which can't be read is recorded as a failure, instead of
+    # stopping the indexing of the others.
+    to_be_indexed.joinpath("unreadable.trf").mkdir()
+
+    pmp_index.index_logfiles(CENTRE_MAP, MACHINE_MAP, tmp_path, workers=4)
+
+    assert not list(to_be_indexed.glob("*.trf"))
+    assert tmp_path.joinpath("unknown_error_in_logfile", "unreadable.trf").exists()
+    assert tmp_path.joinpath("no_mosaiq_record_found", "no_mosaiq.trf").exists()
+    assert tmp_path.joinpath("no_field_label_in_logfile", "no_label.trf").exists()
+    assert tmp_path.joinpath("unknown_error_in_logfile", "corrupt.trf").exists()
+
+    with open_logfile_index(tmp_path) as logfile_index:
+        index = dict(logfile_index.items())
+
+    assert len(index) == number_of_logfiles
+    for i in range(number_of_logfiles):
+        entry = index[hashes["{}.trf".format(i)]]
+        indexed_filepath = tmp_path.joinpath("indexed", entry["filepath"])
+
+        assert indexed_filepath.name == "{}.trf".format(i)
+        assert hash_file(indexed_filepath) == hashes["{}.trf".format(i)]
+        assert entry["logfile_header"]["machine"] == ["2619", "2694"][i % 2]
+        assert entry["delivery_details"]["patient_id"] == "123456"
+
+    # Each lookup is run on the cursor of the machine's own Mosaiq server.
+    for cursor, machine in lookups:
+        server = CENTRE_MAP[MACHINE_MAP[machine]["centre"]]["mosaiq_sql_server"]
+        assert cursor == "cursor for {}".format(server)
+
+    # Logfiles which are already within the index are removed.
+    shutil.copy(
+        tmp_path.joinpath("indexed", index[hashes["0.trf"]]["filepath"]),
+        to_be_indexed.joinpath("copy.trf"),
+    )
+    pmp_index.index_logfiles(CENTRE_MAP, MACHINE_MAP, tmp_path)
+
+    assert not to_be_indexed.joinpath("copy.trf").exists()
+    with open_logfile_index(tmp_path) as logfile_index:
+        assert dict(logfile_index.items()) == index
+
+    # An interruption between adding a chunk's entries and moving its
+    # logfiles leaves entries whose logfiles are still to be indexed. A
+    # rerun finishes moving them.
+    interrupted_filepath = tmp_path.joinpath(
+        "indexed", index[hashes["1.trf"]]["filepath"]
+    )
+    os.rename(interrupted_filepath, to_be_indexed.joinpath("1.trf"))
+
+    pmp_index.index_logfiles(CENTRE_MAP, MACHINE_MAP, tmp_path)
+
+    assert not to_be_indexed.joinpath("1.trf").exists()
+    assert hash_file(interrupted_filepath) == hashes["1.trf"]
+    with open_logfile_index(tmp_path) as logfile_index:
+        assert dict(logfile_index.items()) == index
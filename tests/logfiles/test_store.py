@@ -0,0 +1,118 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+
+import pytest
+
+from pymedphys.labs.managelogfiles.store import open_logfile_index
+
+
+def create_entry(field_id, machine, local_time, qa_mode=False):
+    return {
+        "filepath": "rccc/{}/{}.trf".format(field_id, local_time),
+        "delivery_details": {
+            "patient_id": "123456",
+            "field_id": field_id,
+            "last_name": "DOE",
+            "first_name": "John",
+            "qa_mode": qa_mode,
+            "field_type": "VMAT",
+            "beam_completed": True,
+        },
+        "logfile_header": {
+            "machine": machine,
+            "date": "20/05/06 00:00:00 Z",
+            "timezone": "+10:00",
+            "field_label": "1",
+            "field_name": "Field One",
+        },
+        "local_time": local_time,
+    }
+
+
+LEGACY_INDEX = {
+    "a": create_entry(1, "2619", "2020-05-06 10:00:00"),
+    "b": create_entry(1, "2694", "2020-05-06 09:00:00"),
+    "c": create_entry(2, "2619", "2020-05-07 10:00:00"),
+    "d": create_entry(1, "2619", "2020-05-08 10:00:00", qa_mode=True),
+}
+
+
+def test_migrate_and_query(tmp_path):
+    with open(tmp_path.joinpath("index.json"), "w") as a_file:
+        json.dump(LEGACY_INDEX, a_file)
+
+    with open_logfile_index(tmp_path) as index:
+        assert tmp_path.joinpath("index.sqlite").exists()
+
+        assert len(index) == len(LEGACY_INDEX)
+        assert dict(index.items()) == LEGACY_INDEX
+        assert set(index.keys()) == set(LEGACY_INDEX.keys())
+        assert index["c"] == LEGACY_INDEX["c"]
+        assert "a" in index and "e" not in index
+
+        with pytest.raises(KeyError):
+            index["e"]  # pylint: disable = pointless-statement
+
+        assert index.filehashes_by_field_id(1) == ["b", "a", "d"]
+        assert index.filehashes_by_field_id(1, qa_mode=False) == ["b", "a"]
+        assert index.filehashes_by_machine("2619") == ["a", "c", "d"]
+        assert index.filehashes_by_machine(
+            "2619", start="2020-05-07", end="2020-05-08"
+        ) == ["c"]
+        assert index.filehashes_by_time(end="2020-05-07") == ["b", "a"]
+
+        index.insert("e", create_entry(2, "2694", "2020-05-09 10:00:00"))
+
+    # The legacy index is only migrated the first time.
+    with open(tmp_path.joinpath("index.json"), "w") as a_file:
+        json.dump({}, a_file)
+
+    with open_logfile_index(tmp_path) as index:
+        assert index.filehashes_by_field_id(2) == ["c", "e"]
+        assert len(index) == len(LEGACY_INDEX) + 1
+
+
+def test_insert_many_is_atomic(tmp_path):
+    with open_logfile_index(tmp_path) as index:
+        index.insert("a", LEGACY_INDEX["a"])
+
+        with pytest.raises(KeyError):
+            index.insert_many([("b", LEGACY_INDEX["b"]), ("c", {"filepath": "c"})])
+
+        assert list(index.keys()) == ["a"]
+
+
+def test_consecutive_filehashes(tmp_path):
+    with open_logfile_index(tmp_path) as index:
+        index.insert_many(
+            [
+                ("a", create_entry(1, "2619", "2020-05-06 10:00:00")),
+                ("b", create_entry(1, "2619", "2020-05-06 11:30:00")),
+                ("c", create_entry(1, "2619", "2020-05-06 13:59:59")),
+                ("d", create_entry(1, "2619", "2020-05-06 14:00:00")),
+                ("e", create_entry(1, "2619", "2020-05-06 10:30:00", qa_mode=True)),
+                ("f", create_entry(2, "2619", "2020-05-06 10:00:00")),
+            ]
+        )
+
+        assert index.consecutive_filehashes("a") == ["a", "b", "c"]
+        assert index.consecutive_filehashes("d") == ["b", "c", "d"]
+        assert index.consecutive_filehashes("e") == ["a", "b", "c", "d"]
+        assert index.consecutive_filehashes("f") == ["f"]
+
+        with pytest.raises(KeyError):
+            index.consecutive_filehashes("g")
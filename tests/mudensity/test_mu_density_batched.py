@@ -0,0 +1,97 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the batched MU Density calculation against the sum of single
+control point calculations.
+"""
+
+import numpy as np
+
+import pytest
+
+from pymedphys._mudensity.mudensity import (
+    _convert_to_full_grid,
+    calc_mu_density,
+    calc_single_control_point,
+    get_grid,
+)
+from pymedphys._utilities.constants import AGILITY
+from pymedphys._utilities.controlpoints import remove_irrelevant_control_points
+
+
+def create_delivery(number_of_control_points, seed=0):
+    random_state = np.random.RandomState(seed)
+    time = np.linspace(0, 1, number_of_control_points)
+
+    centre = 30 * np.sin(
+        2 * np.pi * time[:, None] * random_state.uniform(0.5, 3, 80)[None, :]
+        + random_state.uniform(0, 6, 80)
+    )
+    half_gap = 5 + 20 * np.abs(
+        np.sin(4 * np.pi * time[:, None] + random_state.uniform(0, 6, 80))
+    )
+    mlc = np.round(np.stack([half_gap - centre, centre + half_gap], axis=2), 1)
+
+    jaw = np.tile([[60.3, 55.1]], (number_of_control_points, 1))
+    jaw = jaw + np.round(5 * np.sin(7 * time))[:, None]
+
+    mu = np.cumsum(random_state.uniform(0, 0.2, number_of_control_points))
+    mu[5:10] = mu[5]
+
+    return mu, mlc, jaw
+
+
+def calc_mu_density_by_control_point(mu, mlc, jaw, grid_resolution):
+    leaf_pair_widths = np.array(AGILITY)
+    mu, mlc, jaw = remove_irrelevant_control_points(mu, mlc, jaw)
+    full_grid = get_grid(
+        grid_resolution=grid_resolution, leaf_pair_widths=leaf_pair_widths
+    )
+
+    mu_density = np.zeros((len(full_grid["jaw"]), len(full_grid["mlc"])))
+    for i in range(len(mu) - 1):
+        control_point_slice = slice(i, i + 2)
+        grid, mu_density_of_slice = calc_single_control_point(
+            mlc[control_point_slice],
+            jaw[control_point_slice],
+            np.diff(mu[control_point_slice]),
+            leaf_pair_widths=leaf_pair_widths,
+            grid_resolution=grid_resolution,
+        )
+        mu_density += _convert_to_full_grid(grid, full_grid, mu_density_of_slice)
+
+    return mu_density
+
+
+@pytest.mark.parametrize("grid_resolution", [1, 2.5])
+def test_batched_matches_single_control_points(grid_resolution):
+    mu, mlc, jaw = create_delivery(60)
+
+    reference = calc_mu_density_by_control_point(mu, mlc, jaw, grid_resolution)
+    mu_density = calc_mu_density(mu, mlc, jaw, grid_resolution=grid_resolution)
+
+    assert np.allclose(mu_density, reference, atol=1e-10)
+
+
+def test_block_size_independence():
+    mu, mlc, jaw = create_delivery(45, seed=1)
+
+    mu_densities = [
+        calc_mu_density(mu, mlc, jaw, block_size=block_size)
+        for block_size in [1, 7, 100]
+    ]
+
+    for mu_density in mu_densities[1::]:
+        assert np.allclose(mu_density, mu_densities[0], atol=1e-10)
@@ -0,0 +1,118 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the on-disk cache of MU Density grids."""
+
+import io
+import os
+
+import numpy as np
+
+import pymedphys
+from pymedphys._mudensity.cache import MuDensityCache, mu_density_cache_key
+
+from test_mu_density_batched import create_delivery
+
+
+def test_cached_delivery_mudensity(tmp_path):
+    mu, mlc, jaw = create_delivery(20)
+    delivery = pymedphys.Delivery(mu, np.zeros_like(mu), np.zeros_like(mu), mlc, jaw)
+
+    cache = MuDensityCache(tmp_path)
+
+    expected = delivery.mudensity(grid_resolution=2.5)
+    assert np.allclose(cache.mudensity(delivery, grid_resolution=2.5), expected)
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+
+    # An equal delivery, or a different number of workers, uses the cache.
+    same_delivery = pymedphys.Delivery(*[np.copy(item) for item in delivery])
+    assert np.array_equal(
+        cache.mudensity(same_delivery, grid_resolution=2.5, workers=1), expected
+    )
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+
+    # Whereas a change to the delivery or the grid does not.
+    cache.mudensity(delivery, grid_resolution=5)
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+
+    changed_mu = np.copy(mu)
+    changed_mu[-1] += 1
+    changed_delivery = pymedphys.Delivery(
+        changed_mu, np.zeros_like(mu), np.zeros_like(mu), mlc, jaw
+    )
+    cache.mudensity(changed_delivery, grid_resolution=2.5)
+    assert len(list(tmp_path.glob("*.npy"))) == 3
+
+
+def test_cache_key():
+    key = mu_density_cache_key("abc", grid_resolution=1, leaf_pair_widths=(5, 5))
+
+    assert key == mu_density_cache_key(
+        "abc", leaf_pair_widths=np.array([5.0, 5.0]), grid_resolution=1.0
+    )
+    assert key != mu_density_cache_key(
+        "abc", grid_resolution=1, leaf_pair_widths=(5, 10)
+    )
+    assert key != mu_density_cache_key(
+        "abd", grid_resolution=1, leaf_pair_widths=(5, 5)
+    )
+
+
+def test_get_or_calculate_calculates_once(tmp_path):
+    calls = []
+
+    def calculate():
+        calls.append(None)
+        return np.ones((3, 4))
+
+    cache = MuDensityCache(tmp_path)
+    for _ in range(3):
+        result = cache.get_or_calculate("abc", calculate, grid_resolution=1)
+        assert np.array_equal(result, np.ones((3, 4)))
+
+    assert len(calls) == 1
+
+    # A corrupt entry is calculated again.
+    (path,) = tmp_path.glob("*.npy")
+    with open(path, "wb") as a_file:
+        a_file.write(b"not an npy file")
+
+    cache.get_or_calculate("abc", calculate, grid_resolution=1)
+    assert len(calls) == 2
+
+
+def test_least_recently_used_eviction(tmp_path):
+    grid = np.zeros((10, 10))
+    entry_size = len(_npy_bytes(grid))
+
+    cache = MuDensityCache(tmp_path, max_bytes=3 * entry_size)
+    for i, name in enumerate("abc"):
+        cache.put(name, grid)
+        os.utime(tmp_path.joinpath("{}.npy".format(name)), (i, i))
+
+    assert cache.get("a") is not None
+
+    cache.put("d", grid)
+
+    remaining = sorted(path.stem for path in tmp_path.glob("*.npy"))
+    assert remaining == ["a", "c", "d"]
+    assert cache.size() <= 3 * entry_size
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+
+    return buffer.getvalue()
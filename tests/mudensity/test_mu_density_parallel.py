@@ -0,0 +1,45 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the MU Density calculated across a pool of workers and with a
+bound on its memory use.
+"""
+
+import numpy as np
+
+import pymedphys
+
+from test_mu_density_batched import create_delivery
+
+
+def test_parallel_matches_serial():
+    mu, mlc, jaw = create_delivery(80)
+
+    serial = pymedphys.mudensity.calculate(mu, mlc, jaw)
+    parallel = pymedphys.mudensity.calculate(mu, mlc, jaw, workers=2)
+
+    assert np.allclose(parallel, serial, atol=1e-10)
+
+
+def test_max_memory():
+    mu, mlc, jaw = create_delivery(8, seed=2)
+
+    unbounded = pymedphys.mudensity.calculate(mu, mlc, jaw)
+
+    # Small enough that each control point pair is calculated in chunks
+    # of time steps.
+    bounded = pymedphys.mudensity.calculate(mu, mlc, jaw, max_memory=2 ** 20)
+
+    assert np.allclose(bounded, unbounded, atol=1e-10)
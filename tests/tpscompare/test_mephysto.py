@@ -0,0 +1,112 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the single pass Mephysto parser against the scan and data indices."""
+
+import re
+from pathlib import Path
+
+import pytest
+
+import numpy as np
+
+from pymedphys.labs.fileformats.mephysto import core, load_mephysto
+
+HERE = Path(__file__).parent.resolve()
+MEPHYSTO_FILEPATH = HERE.joinpath("data", "measurements", "06MV_10x10.mcc")
+
+
+def find_scan_index(file_contents):
+    """The range of lines spanning each scan, found by searching every line
+    for BEGIN_SCAN and END_SCAN, as the parser did before ``parse_mephysto``."""
+    return _find_index(file_contents, r"^\tBEGIN_SCAN\s\s\d+$", r"^\tEND_SCAN\s\s\d+$")
+
+
+def find_data_index(file_contents):
+    """The range of lines spanning each scan's data, found by searching
+    every line for BEGIN_DATA and END_DATA."""
+    return _find_index(file_contents, r"^\t\tBEGIN_DATA$", r"^\t\tEND_DATA$")
+
+
+def _find_index(file_contents, begin_pattern, end_pattern):
+    begin_index = [
+        i for i, item in enumerate(file_contents) if re.search(begin_pattern, item)
+    ]
+    end_index = [
+        i for i, item in enumerate(file_contents) if re.search(end_pattern, item)
+    ]
+
+    return [range(begin + 1, end) for begin, end in zip(begin_index, end_index)]
+
+
+@pytest.fixture
+def file_contents():
+    with open(MEPHYSTO_FILEPATH) as file_pointer:
+        return np.array(file_pointer.readlines())
+
+
+def test_parse_matches_indices(file_contents):
+    scans = core.parse_mephysto(file_contents)
+
+    scan_index = find_scan_index(file_contents)
+    data_index = find_data_index(file_contents)
+    assert len(scans) == len(scan_index) == len(data_index) == 9
+
+    for scan, index, data in zip(scans, scan_index, data_index):
+        (curvetype_line,) = [
+            line for line in file_contents[index] if "SCAN_CURVETYPE=" in line
+        ]
+        assert scan["parameters"]["SCAN_CURVETYPE"] == curvetype_line.strip()[15:]
+
+        columns = [line.split() for line in file_contents[data]]
+        assert np.array_equal(scan["data"], np.array(columns, dtype=float))
+
+    assert core.pull_mephysto_item("MEAS_DATE", file_contents)[0] == (
+        "27-May-2015 12:06:26"
+    )
+    assert np.all(np.isnan(core.pull_mephysto_number("NOT_A_LABEL", file_contents)))
+
+
+def test_duplicated_label():
+    lines = [
+        "\tBEGIN_SCAN  1\n",
+        "\t\tSCAN_DEPTH=15.00\n",
+        "\t\tSCAN_DEPTH=50.00\n",
+        "\t\tBEGIN_DATA\n",
+        "\t\t\t0.00\t\t1.000E+00\n",
+        "\t\tEND_DATA\n",
+        "\tEND_SCAN  1\n",
+    ]
+
+    assert np.isnan(core.pull_mephysto_number("SCAN_CURVETYPE", lines)[0])
+    with pytest.raises(Exception, match="More than one item"):
+        core.pull_mephysto_item("SCAN_DEPTH", lines)
+
+
+def test_load_mephysto(tmp_path):
+    distance, relative_dose, scan_curvetype, scan_depth = load_mephysto(
+        MEPHYSTO_FILEPATH, output_to_file=True, output_directory=tmp_path
+    )
+
+    assert (
+        list(scan_curvetype)
+        == ["PDD"] + ["INPLANE_PROFILE"] * 4 + ["CROSSPLANE_PROFILE"] * 4
+    )
+    assert np.array_equal(scan_depth[1:5], [15, 50, 100, 200])
+    assert np.isnan(scan_depth[0])
+
+    assert len(distance) == len(relative_dose) == 9
+    assert all(len(d) == len(r) for d, r in zip(distance, relative_dose))
+    assert len(list(tmp_path.glob("*.csv"))) == 9
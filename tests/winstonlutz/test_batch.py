@@ -0,0 +1,69 @@
+# Copyright (C) 2020 Cancer Care Associates
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Test the batch processing of iView images across worker processes."""
+
+
+from pymedphys._imports import imageio
+from pymedphys._imports import numpy as np
+
+import pymedphys._mocks.wlutz as wlutz_mocks
+from pymedphys._wlutz.iview import batch_process
+
+EDGE_LENGTHS = [20, 24]
+BB_DIAMETER = 8
+PENUMBRA = 2
+
+
+def create_iview_images(directory, bb_centres):
+    image_paths = []
+    for i, bb_centre in enumerate(bb_centres):
+        field = wlutz_mocks.create_field_with_bb_func(
+            [1, -2], EDGE_LENGTHS, PENUMBRA, 0, bb_centre, BB_DIAMETER, 0.3
+        )
+        image_path = directory.joinpath("{}.png".format(i))
+        imageio.imwrite(image_path, wlutz_mocks.create_iview_image(field))
+        image_paths.append(image_path)
+
+    return image_paths
+
+
+def test_parallel_batch_process(tmp_path):
+    bb_centres = [[2, 1], [-1, 0.5], [0, -3]]
+    image_paths = create_iview_images(tmp_path, bb_centres)
+
+    results = batch_process(
+        image_paths,
+        EDGE_LENGTHS,
+        bb_diameter=BB_DIAMETER,
+        penumbra=PENUMBRA,
+        display_figure=False,
+        workers=2,
+        pylinac_tol=None,
+    )
+
+    assert list(results.columns) == ["BB x", "BB y", "Field x", "Field y", "Rotation"]
+    assert np.allclose(results[["BB x", "BB y"]], bb_centres, atol=0.01)
+    assert np.allclose(results[["Field x", "Field y"]], [[1, -2]] * 3, atol=0.01)
+
+    serial_results = batch_process(
+        image_paths[:1],
+        EDGE_LENGTHS,
+        bb_diameter=BB_DIAMETER,
+        penumbra=PENUMBRA,
+        display_figure=False,
+        pylinac_tol=None,
+    )
+    assert np.allclose(serial_results, results.iloc[:1])
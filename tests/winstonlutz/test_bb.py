@@ -19,6 +19,7 @@ from pymedphys._imports import numpy as np
 import pymedphys
 import pymedphys._mocks.wlutz as wlutz_mocks
 import pymedphys._wlutz.reporting as reporting
+from pymedphys._wlutz import findbb, imginterp
 
 
 def test_normal_bb():
@@ -144,3 +145,48 @@ def run_test(
             field_penumbra,
         )
         raise
+
+
+def test_bb_search_away_from_field_centre():
+    # Much of this field is flat, which the BB cost alone cannot tell apart
+    # from the BB itself.
+    field_rotation = 19.957
+    bb_centre = [-2.477, -2.879]
+    x, y, img = create_test_image(
+        [0, 0], [20, 24], 2, field_rotation, bb_centre, 8, 0.3
+    )
+    field = imginterp.create_interpolated_field(x, y, img)
+
+    def optimise_bb_centre(initial_bb_centre=None):
+        return findbb.optimise_bb_centre(
+            field,
+            8,
+            [20, 24],
+            2,
+            [0, 0],
+            field_rotation,
+            pylinac_tol=None,
+            initial_bb_centre=initial_bb_centre,
+        )
+
+    determined_bb_centre = optimise_bb_centre()
+    assert np.allclose(bb_centre, determined_bb_centre, atol=0.001)
+    assert optimise_bb_centre() == determined_bb_centre
+
+    # Starting from the BB of a previous image, whether near or far, finds
+    # the same BB.
+    for initial_bb_centre in [[-2, -3], [3, 4]]:
+        assert np.allclose(
+            optimise_bb_centre(initial_bb_centre), determined_bb_centre, atol=0.001
+        )
+
+
+def test_vectorised_bb_cost():
+    x, y, img = create_test_image([0, 0], [20, 24], 2, 20, [2, 2], 8, 0.3)
+    field = imginterp.create_interpolated_field(x, y, img)
+    to_minimise = findbb.create_bb_to_minimise(field, 8)
+
+    centres = np.array([[2, 2], [2.3, 1.8], [-3, 4], [0, 0]])
+    assert np.allclose(
+        to_minimise.many(centres), [to_minimise(centre) for centre in centres]
+    )
@@ -108,3 +108,29 @@ def test_find_initial_field_centre():
     initial_centre = pymedphys._wlutz.findfield.get_centre_of_mass(x, y, zz)
 
     assert np.allclose(initial_centre, centre)
+
+
+def test_optimise_centre_within_bounds():
+    # The field centre lies beyond the one penumbra width which the centre
+    # is searched within, so the minimum is on the edge of the bounds.
+    edge_lengths = [20, 24]
+    penumbra = 2
+    rotation = 10
+
+    field = pymedphys._mocks.profiles.create_rectangular_field_function(
+        [2.5, -1.5], edge_lengths, penumbra, rotation
+    )
+
+    centre = pymedphys._wlutz.findfield.optimise_centre(
+        field, np.array([0.0, 0.0]), edge_lengths, penumbra, rotation
+    )
+
+    to_minimise = pymedphys._wlutz.findfield.create_penumbra_minimiser(
+        field, edge_lengths, penumbra, rotation
+    )
+    grid = np.linspace(-penumbra, penumbra, 201)
+    grid_centres = np.array(np.meshgrid(grid, grid)).reshape(2, -1).T
+    grid_minimum = np.min(to_minimise.many(grid_centres))
+
+    assert np.all(np.abs(centre) <= penumbra)
+    assert to_minimise(centre) <= grid_minimum * (1 + 1e-4)
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import numpy as np
+import scipy.interpolate
 
 import imageio
 
@@ -40,3 +41,24 @@ def test_interp_field():
     )
 
     assert np.all(field(xx, yy) == img)
+
+
+def test_bilinear_matches_spline():
+    rng = np.random.RandomState(0)
+    x = np.arange(-20, 20, 0.25)
+    y = np.arange(-25, 25, 0.25)
+    img = rng.rand(len(y), len(x))
+
+    field = pymedphys._wlutz.imginterp.create_interpolated_field(  # pylint:disable = protected-access
+        x, y, img
+    )
+    spline = scipy.interpolate.RectBivariateSpline(x, y, img.T, kx=1, ky=1)
+
+    # Including points beyond the edges of the image
+    points_x = rng.uniform(-25, 25, (30, 40))
+    points_y = rng.uniform(-30, 30, (30, 40))
+
+    assert np.allclose(
+        field(points_x, points_y),
+        spline.ev(np.ravel(points_x), np.ravel(points_y)).reshape(points_x.shape),
+    )
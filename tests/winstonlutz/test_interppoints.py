@@ -125,3 +125,22 @@ def test_field_interp_at_origin(x_edge, y_edge, penumbra):
 
     assert np.allclose(left_right, x_profile_penumbra, rtol=0.01, atol=0.01)
     assert np.allclose(top_bot, y_profile_penumbra, rtol=0.01, atol=0.01)
+
+
+@given(floats(-20, 20), floats(-20, 20), floats(0, 360))
+def test_transform_points_many(x_centre, y_centre, degrees):
+    points_at_origin = pymedphys._wlutz.interppoints.define_penumbra_points_at_origin(
+        [20, 24], 2
+    )
+    centres = [[x_centre, y_centre], [0, 0]]
+
+    transformed_many = pymedphys._wlutz.interppoints.transform_penumbra_points_many(
+        points_at_origin, centres, degrees
+    )
+
+    for i, centre in enumerate(centres):
+        transformed = pymedphys._wlutz.interppoints.transform_penumbra_points(
+            points_at_origin, centre, degrees
+        )
+        for expected, many in zip(transformed, transformed_many):
+            assert np.allclose(expected, many[i])